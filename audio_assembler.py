@@ -0,0 +1,116 @@
+"""
+Audio Assembler Module
+
+Builds an episode from processed segments in linear time. Segment PCM and the
+silence gaps between segments are appended once into a single growing buffer,
+instead of re-copying the whole episode every time a segment is added.
+
+With a sink (such as a StreamingEncoder) the PCM is passed straight through to
+it instead of being buffered, so the episode can be encoded while later
+segments are still being synthesized.
+"""
+import logging
+from pydub import AudioSegment
+
+from stage_timer import stage
+
+logger = logging.getLogger(__name__)
+
+
+class AudioAssembler:
+    """Append segments and silence gaps into one PCM buffer."""
+
+    def __init__(self, gap_ms: int = 500, lead_ms: int = 0, tail_ms: int = 0, sink=None):
+        """
+        Args:
+            gap_ms (int): Silence between consecutive segments
+            lead_ms (int): Silence before the first segment
+            tail_ms (int): Silence after the last segment
+            sink (optional): Object with start(sample_width, frame_rate, channels),
+                write(pcm) and finish() that receives the PCM instead of the buffer
+        """
+        self.gap_ms = gap_ms
+        self.lead_ms = lead_ms
+        self.tail_ms = tail_ms
+        self.sink = sink
+
+        self.sample_width = None
+        self.frame_rate = None
+        self.channels = None
+        self.segment_count = 0
+        self._buffer = bytearray()
+
+    def _silence(self, duration_ms: int) -> bytes:
+        """PCM silence of the given length in the assembler's format."""
+        frames = int(self.frame_rate * duration_ms / 1000.0)
+        return bytes(frames * self.channels * self.sample_width)
+
+    def _match_format(self, segment: AudioSegment) -> AudioSegment:
+        """Convert a segment to the assembler's format if it differs."""
+        if segment.frame_rate != self.frame_rate:
+            segment = segment.set_frame_rate(self.frame_rate)
+        if segment.channels != self.channels:
+            segment = segment.set_channels(self.channels)
+        if segment.sample_width != self.sample_width:
+            segment = segment.set_sample_width(self.sample_width)
+        return segment
+
+    def add(self, segment) -> None:
+        """
+        Append a segment, preceded by a silence gap if it is not the first.
+
+        Args:
+            segment: AudioSegment, or None for a failed/empty segment (skipped)
+        """
+        if segment is None:
+            return
+
+        if self.segment_count == 0:
+            # The first segment fixes the output format
+            self.sample_width = segment.sample_width
+            self.frame_rate = segment.frame_rate
+            self.channels = segment.channels
+            if self.sink is not None:
+                self.sink.start(self.sample_width, self.frame_rate, self.channels)
+            self._append(self._silence(self.lead_ms))
+        else:
+            with stage('assemble'):
+                segment = self._match_format(segment)
+            self._append(self._silence(self.gap_ms))
+
+        self._append(segment.raw_data)
+        self.segment_count += 1
+
+    def _append(self, pcm: bytes) -> None:
+        """Send PCM to the sink, or to the buffer when there is none."""
+        if self.sink is not None:
+            self.sink.write(pcm)
+        else:
+            with stage('assemble'):
+                self._buffer += pcm
+
+    def build(self):
+        """
+        Finish the episode.
+
+        Returns:
+            AudioSegment, or the sink's finish() result when streaming;
+            None if no segment was added
+        """
+        if self.segment_count == 0:
+            return None
+
+        self._append(self._silence(self.tail_ms))
+        if self.sink is not None:
+            return self.sink.finish()
+
+        with stage('assemble'):
+            audio = AudioSegment(
+                data=self._buffer,
+                sample_width=self.sample_width,
+                frame_rate=self.frame_rate,
+                channels=self.channels
+            )
+        # The segment now owns the buffer
+        self._buffer = bytearray()
+        return audio
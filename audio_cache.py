@@ -0,0 +1,228 @@
+"""
+Audio Cache Module
+
+Disk-backed, content-addressed cache of processed speech. Entries are keyed by a
+hash of the text, voice, speed and processing settings, stored as WAV files, and
+evicted least-recently-used once the cache exceeds its byte quota. Recurring
+phrases such as the intro, outro and fallback lines are then synthesized only once.
+
+The directory may be shared by several processes (the workers of worker.py):
+lookups go to the files on disk, recency is the files' modification time, and
+the quota is enforced from a scan of the directory, so it holds for all of them
+together.
+"""
+import os
+import json
+import wave
+import uuid
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from pydub import AudioSegment
+
+logger = logging.getLogger(__name__)
+
+
+def read_wav(filepath: str) -> AudioSegment:
+    """Load a PCM WAV file without going through ffmpeg."""
+    with wave.open(filepath, 'rb') as wav_file:
+        return AudioSegment(
+            data=wav_file.readframes(wav_file.getnframes()),
+            sample_width=wav_file.getsampwidth(),
+            frame_rate=wav_file.getframerate(),
+            channels=wav_file.getnchannels()
+        )
+
+
+def write_wav(filepath: str, audio: AudioSegment) -> None:
+    """
+    Write audio as a PCM WAV file.
+
+    The file is written under a temporary name and renamed into place, so
+    readers never see a partial file.
+    """
+    temp_path = f"{filepath}.{uuid.uuid4().hex}.tmp"
+    try:
+        with wave.open(temp_path, 'wb') as wav_file:
+            wav_file.setnchannels(audio.channels)
+            wav_file.setsampwidth(audio.sample_width)
+            wav_file.setframerate(audio.frame_rate)
+            wav_file.writeframes(audio.raw_data)
+        os.replace(temp_path, filepath)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+class AudioCache:
+    """LRU cache of processed AudioSegments under a byte quota."""
+
+    def __init__(self, cache_dir: str = "temp/audio_cache", max_bytes: int = 256 * 1024 * 1024):
+        """
+        Args:
+            cache_dir (str): Directory holding the cached WAV files
+            max_bytes (int): Byte quota; 0 disables the cache
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.enabled = max_bytes > 0
+
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> size in bytes, least recently used first
+        self._bytes_used = 0
+
+        if self.enabled:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._load_index()
+
+    def _load_index(self):
+        """Rebuild the LRU order from the files on disk (by modification time)."""
+        entries = []
+        try:
+            with os.scandir(self.cache_dir) as scan:
+                for entry in scan:
+                    if not entry.name.endswith('.wav'):
+                        continue
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, entry.name[:-4], stat.st_size))
+        except FileNotFoundError:
+            pass
+
+        self._entries = OrderedDict()
+        self._bytes_used = 0
+        for _, key, size in sorted(entries):
+            self._entries[key] = size
+            self._bytes_used += size
+
+    @staticmethod
+    def make_key(text: str, voice: str, settings: dict) -> str:
+        """
+        Build a content address for a phrase.
+
+        Args:
+            text (str): Text to be spoken
+            voice (str): Voice or language code
+            settings (dict): Speed and processing settings applied after synthesis
+
+        Returns:
+            str: Hex digest identifying the processed audio
+        """
+        material = json.dumps({'text': text, 'voice': voice, 'settings': settings}, sort_keys=True)
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.wav")
+
+    def get(self, key: str):
+        """
+        Look up processed audio.
+
+        Args:
+            key (str): Key from make_key
+
+        Returns:
+            AudioSegment or None on a miss
+        """
+        if not self.enabled:
+            return None
+
+        # The file, not this process's index, decides: another process may have
+        # cached the phrase or evicted it
+        filepath = self._path(key)
+        try:
+            audio = read_wav(filepath)
+            os.utime(filepath)
+            size = os.path.getsize(filepath)
+        except FileNotFoundError:
+            with self._lock:
+                self._bytes_used -= self._entries.pop(key, 0)
+                self.misses += 1
+            return None
+        except (OSError, EOFError, wave.Error) as e:
+            logger.warning(f"Dropping unreadable audio cache entry {key}: {str(e)}")
+            self._forget(key)
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self._bytes_used += size - self._entries.get(key, 0)
+            self._entries[key] = size
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.bytes_saved += len(audio.raw_data)
+        return audio
+
+    def put(self, key: str, audio: AudioSegment) -> None:
+        """
+        Store processed audio and evict old entries if over quota.
+
+        Args:
+            key (str): Key from make_key
+            audio (AudioSegment): Processed audio
+        """
+        if not self.enabled:
+            return
+
+        filepath = self._path(key)
+        try:
+            write_wav(filepath, audio)
+        except OSError as e:
+            logger.warning(f"Could not write audio cache entry: {str(e)}")
+            return
+
+        with self._lock:
+            # Rescan so files written by other processes count against the quota too
+            self._load_index()
+            evicted = []
+            while self._bytes_used > self.max_bytes and len(self._entries) > 1:
+                old_key, old_size = next(iter(self._entries.items()))
+                if old_key == key:
+                    # Never evict what was just written
+                    self._entries.move_to_end(key)
+                    continue
+                del self._entries[old_key]
+                self._bytes_used -= old_size
+                evicted.append(old_key)
+
+        for old_key in evicted:
+            try:
+                os.remove(self._path(old_key))
+            except OSError:
+                # Another process evicted it first
+                pass
+
+    def _forget(self, key: str) -> None:
+        """Remove an entry from the index and disk."""
+        with self._lock:
+            self._bytes_used -= self._entries.pop(key, 0)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def stats(self) -> dict:
+        """
+        Report cache effectiveness.
+
+        Returns:
+            dict: hits, misses, hit_ratio, bytes_saved, bytes_used, entries
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'bytes_saved': self.bytes_saved,
+                'bytes_used': self._bytes_used,
+                'entries': len(self._entries)
+            }
@@ -0,0 +1,607 @@
+"""
+Offline benchmarks for the TTS audio pipeline.
+
+Speech synthesis is replaced by a fake engine, so these run without network access
+(ffmpeg is still needed for MP3 decoding). Results are printed as JSON.
+
+Usage:
+    python benchmark.py segment-io [--segments 30]
+    python benchmark.py dsp [--seconds 5 20 60]
+    python benchmark.py encode [--segments 40] [--synthesis-delay 0.05]
+    python benchmark.py pipeline [--turns 5 15 30 60] [--engine synthetic|gtts-fake] [--output results.json]
+    python benchmark.py compare BASE.json NEW.json
+    python benchmark.py queue [--workers 1 2 4] [--jobs 40] [--job-seconds 0.2] [--cpu-seconds 0.02]
+"""
+import io
+import os
+import sys
+import json
+import time
+import platform
+import signal
+import asyncio
+import argparse
+import resource
+import tempfile
+import subprocess
+import multiprocessing
+from pydub import AudioSegment
+from pydub.generators import Sine
+
+import audio_dsp
+from audio_output import OUTPUT_FORMATS, StreamingEncoder
+import tts_engines
+from tts_processor import TTSProcessor
+from script_model import COHOST, HOST, Script, Section, Span, Turn
+from stage_timer import StageTimer
+from job_queue import JobQueue
+from worker import Worker
+
+
+def make_fake_gtts(mp3_bytes):
+    """
+    Build a stand-in for gTTS that returns canned MP3 audio.
+
+    Args:
+        mp3_bytes: MP3 data, or a callable mapping the text to MP3 data
+    """
+    clip_for = mp3_bytes if callable(mp3_bytes) else (lambda text: mp3_bytes)
+
+    class FakeGTTS:
+        def __init__(self, text, lang="en", slow=False):
+            self.text = text
+
+        def write_to_fp(self, fp):
+            fp.write(clip_for(self.text))
+
+        def save(self, path):
+            with open(path, 'wb') as f:
+                f.write(clip_for(self.text))
+
+    return FakeGTTS
+
+
+class IOCounter:
+    """
+    Count file opens, file removals and subprocess launches via audit hooks.
+
+    Each counted event is at least one syscall (open/unlink/fork+exec) in the hot path.
+    """
+
+    def __init__(self):
+        self.active = False
+        self.counts = {'open': 0, 'remove': 0, 'subprocess': 0}
+        sys.addaudithook(self._hook)
+
+    def _hook(self, event, args):
+        if not self.active:
+            return
+        if event == 'open' and isinstance(args[0], (str, bytes)):
+            # Integer arguments are pipe descriptors being wrapped, not file opens
+            self.counts['open'] += 1
+        elif event == 'os.remove':
+            self.counts['remove'] += 1
+        elif event == 'subprocess.Popen':
+            self.counts['subprocess'] += 1
+
+    def measure(self, func, *args):
+        """Run func and return (counts, seconds)."""
+        self.counts = dict.fromkeys(self.counts, 0)
+        start = time.perf_counter()
+        self.active = True
+        try:
+            func(*args)
+        finally:
+            self.active = False
+        return dict(self.counts), time.perf_counter() - start
+
+
+def legacy_file_segment(processor, fake_gtts, text):
+    """The previous per-segment path: write a temp MP3, reload it, delete it."""
+    temp_path = os.path.join(processor.audio_dir, f"temp_segment_{time.time()}.mp3")
+    fake_gtts(text=text, lang="en", slow=False).save(temp_path)
+    segment_audio = AudioSegment.from_mp3(temp_path)
+    os.remove(temp_path)
+    return segment_audio
+
+
+def in_memory_segment(processor, fake_gtts, text):
+    """The current per-segment path: synthesize and decode in memory."""
+    return processor._synthesize_raw('HOST', text)
+
+
+def bench_segment_io(args):
+    """Compare file-based and in-memory segment decoding per episode."""
+    mp3_buffer = io.BytesIO()
+    Sine(220).to_audio_segment(duration=2000).set_frame_rate(24000).export(mp3_buffer, format="mp3")
+    fake_gtts = make_fake_gtts(mp3_buffer.getvalue())
+    tts_engines.gTTS = fake_gtts
+
+    processor = TTSProcessor(engine=tts_engines.GTTSEngine())
+    processor.audio_dir = tempfile.mkdtemp(prefix="bench_audio_")
+    counter = IOCounter()
+    texts = [f"Segment number {i} of the benchmark episode." for i in range(args.segments)]
+
+    def run(path):
+        for text in texts:
+            path(processor, fake_gtts, text)
+
+    results = {}
+    for name, path in (('file', legacy_file_segment), ('in_memory', in_memory_segment)):
+        counts, seconds = counter.measure(run, path)
+        results[name] = {
+            'totals': counts,
+            'per_segment': {key: value / args.segments for key, value in counts.items()},
+            'seconds': round(seconds, 4)
+        }
+
+    print(json.dumps({'benchmark': 'segment-io', 'segments': args.segments, 'results': results}, indent=2))
+
+
+def speech_like_audio(seconds):
+    """Concatenate synthetic words of varying pitch into roughly `seconds` of audio."""
+    engine = tts_engines.SyntheticEngine()
+    words = []
+    total_ms = 0
+    while total_ms < seconds * 1000:
+        word = engine.synthesize(f"word{len(words)}", "en")
+        words.append(word)
+        total_ms += len(word)
+    return sum(words[1:], words[0])[:seconds * 1000]
+
+
+def max_sample_difference(first, second):
+    """Largest absolute sample difference between two segments, as a fraction of full scale."""
+    a = audio_dsp.to_float(first)
+    b = audio_dsp.to_float(second)
+    length = min(len(a), len(b))
+    return float(abs(a[:length] - b[:length]).max())
+
+
+def bench_dsp(args):
+    """Compare the pydub effects chain with the NumPy DSP chain."""
+    if not audio_dsp.NUMPY_AVAILABLE:
+        sys.exit("NumPy is not installed")
+
+    processor = TTSProcessor(engine=tts_engines.SyntheticEngine())
+    results = []
+    for seconds in args.seconds:
+        audio = speech_like_audio(seconds)
+        row = {'input_seconds': seconds}
+        for speaker in ('HOST', 'COHOST'):
+            settings = processor._processing_settings(speaker)
+
+            start = time.perf_counter()
+            pydub_output = processor._process_with_pydub(audio, settings)
+            pydub_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            numpy_output = audio_dsp.process_voice(
+                audio, settings['speed'], settings['filter'], settings['cutoff_hz'], settings['normalize']
+            )
+            numpy_seconds = time.perf_counter() - start
+
+            # The EQ alone should match pydub's sample loop up to rounding
+            if settings['filter'] == 'low_pass':
+                reference = audio.low_pass_filter(settings['cutoff_hz'])
+            else:
+                reference = audio.high_pass_filter(settings['cutoff_hz'])
+            filtered = audio_dsp.process_voice(audio, 1.0, settings['filter'], settings['cutoff_hz'], normalize=False)
+
+            row[speaker.lower()] = {
+                'pydub_seconds': round(pydub_seconds, 4),
+                'numpy_seconds': round(numpy_seconds, 4),
+                'speedup': round(pydub_seconds / numpy_seconds, 1) if numpy_seconds else None,
+                'pydub_output_ms': len(pydub_output),
+                'numpy_output_ms': len(numpy_output),
+                'pydub_peak_dbfs': round(pydub_output.max_dBFS, 2),
+                'numpy_peak_dbfs': round(numpy_output.max_dBFS, 2),
+                'filter_max_error': round(max_sample_difference(reference, filtered), 6)
+            }
+        results.append(row)
+
+    print(json.dumps({'benchmark': 'dsp', 'results': results}, indent=2))
+
+
+def bench_encode(args):
+    """
+    Compare exporting a finished episode with streaming it into the encoder.
+
+    Segments arrive one by one with a fixed delay standing in for synthesis; the
+    interesting number is how long the file takes once the last segment is in.
+    """
+    processor = TTSProcessor(engine=tts_engines.SyntheticEngine())
+    engine = processor.engine
+    segments = [
+        processor._process_audio_for_adhd(
+            engine.synthesize(f"Segment {i} of the benchmark episode, long enough to sound like a turn.", "en"),
+            is_host=(i % 2 == 0)
+        )
+        for i in range(args.segments)
+    ]
+    output_dir = tempfile.mkdtemp(prefix="bench_encode_")
+
+    def produce():
+        for segment in segments:
+            time.sleep(args.synthesis_delay)
+            yield segment
+
+    def measure(name, run):
+        start = time.perf_counter()
+        filepath, last_segment_at = run(os.path.join(output_dir, name))
+        finished_at = time.perf_counter()
+        return {
+            'total_seconds': round(finished_at - start, 4),
+            'after_last_segment_seconds': round(finished_at - last_segment_at, 4),
+            'bytes': os.path.getsize(filepath)
+        }
+
+    def export_after_assembly(filepath):
+        assembler = processor._new_assembler()
+        for segment in produce():
+            assembler.add(segment)
+        last_segment_at = time.perf_counter()
+        assembler.build().export(f"{filepath}.mp3", format="mp3")
+        return f"{filepath}.mp3", last_segment_at
+
+    def stream(output_format):
+        def run(filepath):
+            encoder = StreamingEncoder(f"{filepath}.{output_format.extension}", output_format)
+            assembler = processor._new_assembler(sink=encoder)
+            for segment in produce():
+                assembler.add(segment)
+            last_segment_at = time.perf_counter()
+            return assembler.build(), last_segment_at
+        return run
+
+    results = {'mp3_export': measure('export', export_after_assembly)}
+    for name, output_format in OUTPUT_FORMATS.items():
+        results[f"{name}_streaming"] = measure(f"stream_{name}", stream(output_format))
+
+    audio_ms = sum(len(segment) for segment in segments)
+    print(json.dumps({
+        'benchmark': 'encode', 'segments': args.segments, 'audio_seconds': round(audio_ms / 1000, 1),
+        'results': results
+    }, indent=2))
+
+
+# Words used to build deterministic benchmark scripts
+BENCHMARK_WORDS = (
+    "attention focus reading article podcast summary idea research author insight "
+    "productivity memory habit evidence example question answer context detail"
+).split()
+
+
+def build_benchmark_script(turns):
+    """
+    Build a deterministic script with the given number of turns.
+
+    Turn lengths cycle between short reactions and long explanations, like the
+    real dialogue does, and every few turns start a new item section.
+    """
+    script = Script()
+    lengths = (8, 25, 60, 120)  # words per turn
+    for index in range(turns):
+        section = Section(kind='item', index=index // 6, title=f"Item {index // 6}", author="Benchmark")
+        words = [BENCHMARK_WORDS[(index * 7 + i) % len(BENCHMARK_WORDS)] for i in range(lengths[index % len(lengths)])]
+        sentences = [' '.join(words[i:i + 12]).capitalize() + '.' for i in range(0, len(words), 12)]
+        speaker = HOST if index % 2 == 0 else COHOST
+        script.turns.append(Turn(speaker, [Span(' '.join(sentences))], section))
+    return script
+
+
+def make_benchmark_processor(args):
+    """Create a TTSProcessor with an offline engine for the pipeline benchmark."""
+    synthetic = tts_engines.SyntheticEngine(waveform=args.waveform)
+    if args.engine == 'synthetic':
+        return TTSProcessor(engine=synthetic)
+
+    # gTTS path with the network call replaced: MP3 clips are prepared up front so
+    # the measured 'synthesize' stage stays cheap and 'decode' is real ffmpeg work
+    clips = {}
+
+    def clip_for(text):
+        if text not in clips:
+            mp3_buffer = io.BytesIO()
+            synthetic.synthesize(text, "en").export(mp3_buffer, format="mp3")
+            clips[text] = mp3_buffer.getvalue()
+        return clips[text]
+
+    tts_engines.gTTS = make_fake_gtts(clip_for)
+    processor = TTSProcessor(engine=tts_engines.GTTSEngine())
+    for segment in build_benchmark_script(args.turns[0]).to_tts_segments():
+        cleaned = processor._clean_for_tts(segment['text'])
+        for chunk in processor._chunk_text(cleaned, min(processor.max_chunk_size, processor.engine.max_text_length)):
+            clip_for(chunk)
+    return processor
+
+
+def run_pipeline_once(args):
+    """Run one script through generate_audio and measure it (in this process)."""
+    processor = make_benchmark_processor(args)
+    processor.audio_dir = tempfile.mkdtemp(prefix="bench_pipeline_")
+    if not args.cache:
+        processor.audio_cache.enabled = False
+    script = build_benchmark_script(args.turns[0])
+
+    self_before = resource.getrusage(resource.RUSAGE_SELF)
+    children_before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    start = time.perf_counter()
+    with StageTimer() as timer:
+        output_path = processor.generate_audio(script)
+    wall = time.perf_counter() - start
+    self_after = resource.getrusage(resource.RUSAGE_SELF)
+    children_after = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+    output_bytes = os.path.getsize(output_path)
+    os.remove(output_path)
+    return {
+        'turns': args.turns[0],
+        'wall_seconds': round(wall, 4),
+        'cpu_seconds': round(
+            (self_after.ru_utime - self_before.ru_utime) + (self_after.ru_stime - self_before.ru_stime), 4
+        ),
+        # ffmpeg decode/encode processes
+        'child_cpu_seconds': round(
+            (children_after.ru_utime - children_before.ru_utime)
+            + (children_after.ru_stime - children_before.ru_stime), 4
+        ),
+        # ru_maxrss is in kilobytes on Linux
+        'peak_rss_mb': round(self_after.ru_maxrss / 1024, 1),
+        'child_peak_rss_mb': round(children_after.ru_maxrss / 1024, 1),
+        'output_bytes': output_bytes,
+        'stages': timer.report()
+    }
+
+
+def environment_info(processor):
+    """Describe what the results were measured on."""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'tts_workers': processor.max_workers,
+        'dsp_backend': processor.dsp_backend,
+        'output_format': processor.output_format.name,
+        'numpy': audio_dsp.NUMPY_AVAILABLE
+    }
+
+
+def bench_pipeline(args):
+    """
+    Run representative scripts through generate_audio and report per-stage costs.
+
+    Every script size runs in a fresh interpreter so peak RSS is per run.
+    """
+    if args.single:
+        print(json.dumps(run_pipeline_once(args)))
+        return
+
+    runs = []
+    for turns in args.turns:
+        command = [
+            sys.executable, os.path.abspath(__file__), 'pipeline', '--single', '--turns', str(turns),
+            '--engine', args.engine, '--waveform', args.waveform
+        ]
+        if args.cache:
+            command.append('--cache')
+        completed = subprocess.run(command, capture_output=True, text=True)
+        if completed.returncode != 0:
+            sys.exit(f"Benchmark run with {turns} turns failed:\n{completed.stderr}")
+        runs.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+
+    results = {
+        'benchmark': 'pipeline',
+        'engine': args.engine,
+        'waveform': args.waveform,
+        'cache': args.cache,
+        'environment': environment_info(TTSProcessor(engine=tts_engines.SyntheticEngine())),
+        'runs': runs
+    }
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    print(output)
+
+
+def bench_compare(args):
+    """Compare two pipeline result files run by run and stage by stage (new / base)."""
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+
+    def ratio(new_value, base_value):
+        return round(new_value / base_value, 3) if base_value else None
+
+    base_runs = {run['turns']: run for run in base['runs']}
+    comparison = []
+    for run in new['runs']:
+        base_run = base_runs.get(run['turns'])
+        if base_run is None:
+            continue
+        stages = {}
+        for name, totals in run['stages'].items():
+            base_totals = base_run['stages'].get(name)
+            if base_totals:
+                stages[name] = {
+                    'wall_ratio': ratio(totals['wall_seconds'], base_totals['wall_seconds']),
+                    'cpu_ratio': ratio(totals['cpu_seconds'], base_totals['cpu_seconds'])
+                }
+        comparison.append({
+            'turns': run['turns'],
+            'wall_ratio': ratio(run['wall_seconds'], base_run['wall_seconds']),
+            'cpu_ratio': ratio(run['cpu_seconds'], base_run['cpu_seconds']),
+            'peak_rss_ratio': ratio(run['peak_rss_mb'], base_run['peak_rss_mb']),
+            'output_bytes_ratio': ratio(run['output_bytes'], base_run['output_bytes']),
+            'stages': stages
+        })
+
+    print(json.dumps({
+        'benchmark': 'compare',
+        'base_commit': base.get('environment', {}).get('commit'),
+        'new_commit': new.get('environment', {}).get('commit'),
+        'runs': comparison
+    }, indent=2))
+
+
+def queue_benchmark_job(payload):
+    """A stand-in job: mostly waiting (LLM and TTS API calls), with a little CPU work."""
+    time.sleep(payload['job_seconds'])
+    deadline = time.process_time() + payload['cpu_seconds']
+    while time.process_time() < deadline:
+        pass
+
+
+def queue_benchmark_worker(queue_path, lease_seconds):
+    """Body of one benchmark worker process: drain the queue, then exit."""
+    queue = JobQueue(queue_path, lease_seconds=lease_seconds)
+    worker = Worker(queue, {'bench': lambda payload: asyncio.to_thread(queue_benchmark_job, payload)},
+                    poll_seconds=0.05)
+    asyncio.run(worker.run(exit_when_idle=True))
+    queue.close()
+
+
+def run_queue_workers(queue_path, workers, lease_seconds, kill_one=False):
+    """
+    Run worker processes until the queue is drained.
+
+    Args:
+        kill_one (bool): SIGKILL one worker in the middle of a job
+
+    Returns:
+        float: Wall-clock seconds
+    """
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(target=queue_benchmark_worker, args=(queue_path, lease_seconds))
+        for _ in range(workers)
+    ]
+    start = time.perf_counter()
+    for process in processes:
+        process.start()
+    if kill_one:
+        queue = JobQueue(queue_path, lease_seconds=lease_seconds)
+        victim = f":{processes[0].pid}"
+        while not any(job.worker_id.endswith(victim) for job in queue.jobs('leased')):
+            time.sleep(0.01)
+        os.kill(processes[0].pid, signal.SIGKILL)
+        queue.close()
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - start
+
+    if kill_one:
+        # The survivors may have drained the queue before the dead worker's lease ran out
+        queue = JobQueue(queue_path, lease_seconds=lease_seconds)
+        while queue.counts()['leased']:
+            time.sleep(lease_seconds / 4)
+            queue_benchmark_worker(queue_path, lease_seconds)
+        queue.close()
+        elapsed = time.perf_counter() - start
+    return elapsed
+
+
+def bench_queue(args):
+    """
+    Throughput of the job queue with 1..N worker processes, and recovery from a killed worker.
+
+    Each job waits `job_seconds` (standing in for LLM and TTS API calls) and burns
+    `cpu_seconds` of CPU, one job per process at a time.
+    """
+    payload = {'job_seconds': args.job_seconds, 'cpu_seconds': args.cpu_seconds}
+    work_dir = tempfile.mkdtemp(prefix="bench_queue_")
+    results = []
+    for workers in args.workers:
+        queue_path = os.path.join(work_dir, f"queue_{workers}.sqlite3")
+        queue = JobQueue(queue_path, lease_seconds=args.lease_seconds)
+        for _ in range(args.jobs):
+            queue.enqueue('bench', payload)
+        elapsed = run_queue_workers(queue_path, workers, args.lease_seconds)
+        counts = queue.counts()
+        queue.close()
+        results.append({
+            'workers': workers,
+            'seconds': round(elapsed, 3),
+            'jobs_per_second': round(args.jobs / elapsed, 2),
+            'done': counts['done'],
+            'failed': counts['failed']
+        })
+    for row in results:
+        row['speedup'] = round(row['jobs_per_second'] / results[0]['jobs_per_second'], 2)
+
+    # Kill a worker mid-job: its job must be picked up again once the lease runs out
+    queue_path = os.path.join(work_dir, "queue_crash.sqlite3")
+    queue = JobQueue(queue_path, lease_seconds=args.lease_seconds)
+    for _ in range(args.jobs):
+        queue.enqueue('bench', payload)
+    workers = max(2, max(args.workers))
+    elapsed = run_queue_workers(queue_path, workers, args.lease_seconds, kill_one=True)
+    counts = queue.counts()
+    retried = sum(1 for job in queue.jobs() if job.attempts > 1)
+    queue.close()
+    recovery = {
+        'workers': workers, 'seconds': round(elapsed, 3), 'done': counts['done'], 'failed': counts['failed'],
+        'retried_jobs': retried, 'all_done': counts['done'] == args.jobs
+    }
+
+    print(json.dumps({
+        'benchmark': 'queue', 'jobs': args.jobs, 'cpus': os.cpu_count(), 'job': payload,
+        'results': results, 'killed_worker': recovery
+    }, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline TTS pipeline benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    segment_io = subparsers.add_parser("segment-io", help="File vs in-memory segment decoding")
+    segment_io.add_argument("--segments", type=int, default=30)
+    segment_io.set_defaults(func=bench_segment_io)
+
+    dsp = subparsers.add_parser("dsp", help="pydub vs NumPy voice processing")
+    dsp.add_argument("--seconds", type=int, nargs="+", default=[5, 20, 60])
+    dsp.set_defaults(func=bench_dsp)
+
+    encode = subparsers.add_parser("encode", help="Export after assembly vs streaming encode")
+    encode.add_argument("--segments", type=int, default=40)
+    encode.add_argument("--synthesis-delay", type=float, default=0.05)
+    encode.set_defaults(func=bench_encode)
+
+    pipeline = subparsers.add_parser("pipeline", help="Per-stage costs of generate_audio for 5-60 turn scripts")
+    pipeline.add_argument("--turns", type=int, nargs="+", default=[5, 15, 30, 60])
+    pipeline.add_argument("--engine", choices=["synthetic", "gtts-fake"], default="synthetic")
+    pipeline.add_argument("--waveform", choices=["tone", "noise"], default="noise")
+    pipeline.add_argument("--cache", action="store_true", help="Keep the processed audio cache enabled")
+    pipeline.add_argument("--output", help="Also write the JSON results to this file")
+    pipeline.add_argument("--single", action="store_true", help=argparse.SUPPRESS)
+    pipeline.set_defaults(func=bench_pipeline)
+
+    compare = subparsers.add_parser("compare", help="Compare two pipeline result files")
+    compare.add_argument("base")
+    compare.add_argument("new")
+    compare.set_defaults(func=bench_compare)
+
+    queue = subparsers.add_parser("queue", help="Job queue throughput vs worker processes, and crash recovery")
+    queue.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    queue.add_argument("--jobs", type=int, default=40)
+    queue.add_argument("--job-seconds", type=float, default=0.2)
+    queue.add_argument("--cpu-seconds", type=float, default=0.02)
+    queue.add_argument("--lease-seconds", type=float, default=2.0)
+    queue.set_defaults(func=bench_queue)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
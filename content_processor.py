@@ -24,6 +24,8 @@ import json
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
+from stage_timer import stage
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -170,56 +172,58 @@ class ContentProcessor:
             logger.info(f"Processing web URL: {url}")
 
             # Fetch the webpage
-            response = requests.get(url, headers={
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-            }, timeout=10)
-            response.raise_for_status()
-
-            # Parse HTML
-            soup = BeautifulSoup(response.text, 'html.parser')
-
-            # Extract title
-            title = soup.title.string if soup.title else "Article"
-
-            # Extract author (attempt common patterns)
-            author = "Unknown Author"
-            # Try meta tags first
-            author_meta = soup.find('meta', {'name': ['author', 'Author', 'AUTHOR']})
-            if author_meta:
-                author = author_meta.get('content', author)
-
-            # Try common author classes/IDs if meta tag not found
-            if author == "Unknown Author":
-                author_elements = soup.select('.author, .byline, .article-author, [rel="author"]')
-                if author_elements and author_elements[0].text.strip():
-                    author = author_elements[0].text.strip()
-
-            # Extract main content (improved approach)
-            # Remove script, style, and nav elements
-            for element in soup(['script', 'style', 'nav', 'header', 'footer', 'aside']):
-                element.extract()
-
-            # Try to find the main content
-            main_content = None
-
-            # Try common article containers
-            article_containers = soup.select('article, .article, .post, .content, main, #content, #main')
-            if article_containers:
-                main_content = article_containers[0]
-
-            # If no specific container found, use body
-            if not main_content:
-                main_content = soup.body
-
-            # Get visible text
-            if main_content:
-                text = main_content.get_text(separator=' ', strip=True)
-            else:
-                text = soup.get_text(separator=' ', strip=True)
+            with stage('fetch'):
+                response = requests.get(url, headers={
+                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+                }, timeout=10)
+                response.raise_for_status()
+
+            with stage('extract'):
+                # Parse HTML
+                soup = BeautifulSoup(response.text, 'html.parser')
+
+                # Extract title
+                title = soup.title.string if soup.title else "Article"
+
+                # Extract author (attempt common patterns)
+                author = "Unknown Author"
+                # Try meta tags first
+                author_meta = soup.find('meta', {'name': ['author', 'Author', 'AUTHOR']})
+                if author_meta:
+                    author = author_meta.get('content', author)
+
+                # Try common author classes/IDs if meta tag not found
+                if author == "Unknown Author":
+                    author_elements = soup.select('.author, .byline, .article-author, [rel="author"]')
+                    if author_elements and author_elements[0].text.strip():
+                        author = author_elements[0].text.strip()
+
+                # Extract main content (improved approach)
+                # Remove script, style, and nav elements
+                for element in soup(['script', 'style', 'nav', 'header', 'footer', 'aside']):
+                    element.extract()
+
+                # Try to find the main content
+                main_content = None
+
+                # Try common article containers
+                article_containers = soup.select('article, .article, .post, .content, main, #content, #main')
+                if article_containers:
+                    main_content = article_containers[0]
+
+                # If no specific container found, use body
+                if not main_content:
+                    main_content = soup.body
+
+                # Get visible text
+                if main_content:
+                    text = main_content.get_text(separator=' ', strip=True)
+                else:
+                    text = soup.get_text(separator=' ', strip=True)
 
-            # Basic cleaning
-            lines = [line.strip() for line in text.splitlines() if line.strip()]
-            content = ' '.join(lines)
+                # Basic cleaning
+                lines = [line.strip() for line in text.splitlines() if line.strip()]
+                content = ' '.join(lines)
 
             # Check if content is substantial enough
             if len(content) < 200:  # Arbitrary threshold for article content
@@ -267,10 +271,11 @@ class ContentProcessor:
                     youtube = build('youtube', 'v3', developerKey=api_key)
                     
                     # Get video details
-                    video_response = youtube.videos().list(
-                        part='snippet,contentDetails',
-                        id=video_id
-                    ).execute()
+                    with stage('fetch'):
+                        video_response = youtube.videos().list(
+                            part='snippet,contentDetails',
+                            id=video_id
+                        ).execute()
                     
                     if video_response['items']:
                         video = video_response['items'][0]
@@ -291,9 +296,11 @@ class ContentProcessor:
                         'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
                         'Accept-Language': 'en-US,en;q=0.5',
                     }
-                    response = requests.get(url, headers=headers, timeout=10)
+                    with stage('fetch'):
+                        response = requests.get(url, headers=headers, timeout=10)
                     content = response.text
-                    soup = BeautifulSoup(content, 'html.parser')
+                    with stage('extract'):
+                        soup = BeautifulSoup(content, 'html.parser')
                     
                     # Try to get title
                     if not title:
@@ -432,7 +439,7 @@ class ContentProcessor:
 
             # Process PDF
             if file_ext == '.pdf':
-                with open(file_path, 'rb') as file:
+                with stage('extract'), open(file_path, 'rb') as file:
                     pdf_reader = PyPDF2.PdfReader(file)
                     for page_num in range(len(pdf_reader.pages)):
                         page_text = pdf_reader.pages[page_num].extract_text()
@@ -441,8 +448,9 @@ class ContentProcessor:
 
             # Process Word document
             elif file_ext in ['.docx', '.doc']:
-                doc = docx.Document(file_path)
-                content = ' '.join([para.text for para in doc.paragraphs if para.text.strip()])
+                with stage('extract'):
+                    doc = docx.Document(file_path)
+                    content = ' '.join([para.text for para in doc.paragraphs if para.text.strip()])
 
             # Unsupported document type
             else:
@@ -3,12 +3,26 @@ Database Module
 
 This module handles all data persistence for the Onager bot.
 For simplicity in the MVP, we'll use a JSON-based file storage system.
+
+The bot and its worker processes (worker.py) share the files, so every
+read-modify-write holds an exclusive file lock, and files are replaced
+atomically so readers never see a half-written file.
 """
 import os
 import json
+import uuid
 import logging
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 
+from stage_timer import stage
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows; only threads of one process are serialized there
+    fcntl = None
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -21,6 +35,46 @@ class Database:
         self.db_dir = "data"
         self.content_file = os.path.join(self.db_dir, "content.json")
         self.user_prefs_file = os.path.join(self.db_dir, "user_preferences.json")
+        self.lock_file = os.path.join(self.db_dir, ".lock")
+        self._thread_lock = threading.RLock()
+        self._lock_depth = 0
+        self._lock_handle = None
+
+    @contextmanager
+    def _locked(self):
+        """
+        Hold the database lock across a read-modify-write.
+
+        The lock is an flock on data/.lock, shared with other processes, and is
+        reentrant within this process.
+        """
+        with self._thread_lock:
+            if self._lock_depth == 0:
+                os.makedirs(self.db_dir, exist_ok=True)
+                self._lock_handle = open(self.lock_file, 'a')
+                if fcntl is not None:
+                    fcntl.flock(self._lock_handle, fcntl.LOCK_EX)
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0:
+                    if fcntl is not None:
+                        fcntl.flock(self._lock_handle, fcntl.LOCK_UN)
+                    self._lock_handle.close()
+                    self._lock_handle = None
+
+    def _write_json(self, path, data):
+        """Write a JSON file atomically."""
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(temp_path, 'w') as f:
+                json.dump(data, f, indent=2)
+            os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
     
     def initialize(self):
         """Create database files if they don't exist."""
@@ -109,19 +163,20 @@ class Database:
             bool: True if content was added, False if it was a duplicate
         """
         try:
-            # Load existing content
-            content = self._load_content()
-            
-            # Check for duplicates
-            if self.is_duplicate(content_item, content):
-                logger.info(f"Duplicate content detected, skipping: {content_item.get('title')}")
-                return False
-                
-            # Add new content item
-            content.append(content_item)
-            
-            # Save updated content
-            self._save_content(content)
+            with self._locked():
+                # Load existing content
+                content = self._load_content()
+
+                # Check for duplicates
+                if self.is_duplicate(content_item, content):
+                    logger.info(f"Duplicate content detected, skipping: {content_item.get('title')}")
+                    return False
+
+                # Add new content item
+                content.append(content_item)
+
+                # Save updated content
+                self._save_content(content)
             
             logger.info(f"Added content item with ID: {content_item.get('id')}")
             return True
@@ -165,19 +220,20 @@ class Database:
             content_ids (list): List of content IDs to mark as processed
         """
         try:
-            # Load all content
-            content = self._load_content()
-            
-            # Mark specified content as processed
-            for item in content:
-                if (item.get('user_id') == user_id and 
-                    item.get('id') in content_ids and 
-                    not item.get('processed', False)):
-                    item['processed'] = True
-                    item['date_processed'] = datetime.now().isoformat()
-            
-            # Save updated content
-            self._save_content(content)
+            with self._locked():
+                # Load all content
+                content = self._load_content()
+
+                # Mark specified content as processed
+                for item in content:
+                    if (item.get('user_id') == user_id and
+                        item.get('id') in content_ids and
+                        not item.get('processed', False)):
+                        item['processed'] = True
+                        item['date_processed'] = datetime.now().isoformat()
+
+                # Save updated content
+                self._save_content(content)
             
             logger.info(f"Marked {len(content_ids)} items as processed for user {user_id}")
             
@@ -192,17 +248,18 @@ class Database:
             user_id (int): Telegram user ID
         """
         try:
-            # Load all content
-            content = self._load_content()
-            
-            # Filter out user's unprocessed content
-            updated_content = [
-                item for item in content 
-                if not (item.get('user_id') == user_id and not item.get('processed', False))
-            ]
-            
-            # Save updated content
-            self._save_content(updated_content)
+            with self._locked():
+                # Load all content
+                content = self._load_content()
+
+                # Filter out user's unprocessed content
+                updated_content = [
+                    item for item in content
+                    if not (item.get('user_id') == user_id and not item.get('processed', False))
+                ]
+
+                # Save updated content
+                self._save_content(updated_content)
             
             logger.info(f"Cleared unprocessed content for user {user_id}")
             
@@ -245,27 +302,152 @@ class Database:
             language (str): Language code (english, chinese, russian)
         """
         try:
-            # Load user preferences
-            user_prefs = self._load_user_preferences()
-            
-            # Convert user_id to str for JSON dictionary keys
-            user_id_str = str(user_id)
-            
-            # Initialize user preferences if not exists
-            if user_id_str not in user_prefs:
-                user_prefs[user_id_str] = {}
-            
-            # Set language preference
-            user_prefs[user_id_str]['language'] = language
-            
-            # Save updated preferences
-            self._save_user_preferences(user_prefs)
+            with self._locked():
+                # Load user preferences
+                user_prefs = self._load_user_preferences()
+
+                # Convert user_id to str for JSON dictionary keys
+                user_id_str = str(user_id)
+
+                # Initialize user preferences if not exists
+                if user_id_str not in user_prefs:
+                    user_prefs[user_id_str] = {}
+
+                # Set language preference
+                user_prefs[user_id_str]['language'] = language
+
+                # Save updated preferences
+                self._save_user_preferences(user_prefs)
             
             logger.info(f"Set language preference for user {user_id} to {language}")
             
         except Exception as e:
             logger.error(f"Error setting user language: {str(e)}")
     
+    def get_user_tts_engine(self, user_id):
+        """
+        Get a user's preferred TTS engine.
+
+        Args:
+            user_id (int): Telegram user ID
+
+        Returns:
+            str: Engine name (gtts, espeak, synthetic) or None if not set
+        """
+        return self._get_user_preference(user_id, 'tts_engine')
+
+    def set_user_tts_engine(self, user_id, engine_name):
+        """
+        Set a user's preferred TTS engine.
+
+        Args:
+            user_id (int): Telegram user ID
+            engine_name (str): Engine name, or None to use the deployment default
+        """
+        self._set_user_preference(user_id, 'tts_engine', engine_name)
+
+    def get_user_pregenerate(self, user_id):
+        """
+        Check whether a user opted in to pre-generating items as they arrive.
+
+        Args:
+            user_id (int): Telegram user ID
+
+        Returns:
+            bool: True if pre-generation is enabled
+        """
+        return bool(self._get_user_preference(user_id, 'pregenerate'))
+
+    def set_user_pregenerate(self, user_id, enabled):
+        """
+        Turn pre-generation on or off for a user.
+
+        Args:
+            user_id (int): Telegram user ID
+            enabled (bool): Pre-generate items as they arrive
+        """
+        self._set_user_preference(user_id, 'pregenerate', bool(enabled))
+
+    def get_user_digest(self, user_id):
+        """
+        Get a user's daily digest subscription.
+
+        Args:
+            user_id (int): Telegram user ID
+
+        Returns:
+            dict: {'time': 'HH:MM', 'chat_id', 'last_delivered': 'YYYY-MM-DD' or None}, or None
+        """
+        return self._get_user_preference(user_id, 'digest')
+
+    def set_user_digest(self, user_id, digest):
+        """
+        Set or remove a user's daily digest subscription.
+
+        Args:
+            user_id (int): Telegram user ID
+            digest (dict): Subscription (see get_user_digest), or None to unsubscribe
+        """
+        self._set_user_preference(user_id, 'digest', digest)
+
+    def get_digest_subscriptions(self):
+        """
+        Get every daily digest subscription.
+
+        Returns:
+            dict: user_id (int) -> subscription (see get_user_digest)
+        """
+        try:
+            user_prefs = self._load_user_preferences()
+            return {
+                int(user_id): prefs['digest']
+                for user_id, prefs in user_prefs.items()
+                if prefs.get('digest')
+            }
+        except Exception as e:
+            logger.error(f"Error getting digest subscriptions: {str(e)}")
+            return {}
+
+    def _get_user_preference(self, user_id, key):
+        """
+        Get a single user preference.
+
+        Args:
+            user_id (int): Telegram user ID
+            key (str): Preference name
+
+        Returns:
+            The stored value, or None if not set
+        """
+        try:
+            user_prefs = self._load_user_preferences()
+            return user_prefs.get(str(user_id), {}).get(key)
+        except Exception as e:
+            logger.error(f"Error getting user preference {key}: {str(e)}")
+            return None
+
+    def _set_user_preference(self, user_id, key, value):
+        """
+        Set a single user preference (None removes it).
+
+        Args:
+            user_id (int): Telegram user ID
+            key (str): Preference name
+            value: JSON-serializable value
+        """
+        try:
+            with self._locked():
+                user_prefs = self._load_user_preferences()
+                prefs = user_prefs.setdefault(str(user_id), {})
+                if value is None:
+                    prefs.pop(key, None)
+                else:
+                    prefs[key] = value
+                self._save_user_preferences(user_prefs)
+            logger.info(f"Set {key} preference for user {user_id} to {value}")
+        except Exception as e:
+            logger.error(f"Error setting user preference {key}: {str(e)}")
+
     def _load_content(self):
         """
         Load content from the database file.
@@ -274,7 +456,7 @@ class Database:
             list: List of content items
         """
         try:
-            with open(self.content_file, 'r') as f:
+            with stage('db_load'), open(self.content_file, 'r') as f:
                 return json.load(f)
         except Exception as e:
             logger.error(f"Error loading content: {str(e)}")
@@ -288,8 +470,8 @@ class Database:
             content (list): List of content items to save
         """
         try:
-            with open(self.content_file, 'w') as f:
-                json.dump(content, f, indent=2)
+            with stage('db_save'):
+                self._write_json(self.content_file, content)
         except Exception as e:
             logger.error(f"Error saving content: {str(e)}")
     
@@ -301,7 +483,7 @@ class Database:
             dict: User preferences
         """
         try:
-            with open(self.user_prefs_file, 'r') as f:
+            with stage('db_load'), open(self.user_prefs_file, 'r') as f:
                 return json.load(f)
         except Exception as e:
             logger.error(f"Error loading user preferences: {str(e)}")
@@ -315,7 +497,7 @@ class Database:
             user_prefs (dict): User preferences to save
         """
         try:
-            with open(self.user_prefs_file, 'w') as f:
-                json.dump(user_prefs, f, indent=2)
+            with stage('db_save'):
+                self._write_json(self.user_prefs_file, user_prefs)
         except Exception as e:
             logger.error(f"Error saving user preferences: {str(e)}")
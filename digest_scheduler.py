@@ -0,0 +1,335 @@
+"""
+Digest Scheduler Module
+
+Daily digests: a subscribed user (/schedule HH:MM) gets an episode of their
+queued content at that time every day without running /generate. Episodes are
+built ahead of time from the Database queue and held until the delivery time,
+so delivery is instant and the build load moves away from the hours users are
+active:
+
+- a build may start up to DIGEST_LEAD_HOURS before its delivery time
+- builds start during the off-peak hours (DIGEST_OFFPEAK_HOURS, e.g. "1-6")
+  and only while no interactive /generate job is waiting, unless the delivery
+  is less than DIGEST_MIN_LEAD_MINUTES away
+- all builds share a global budget of DIGEST_BUILDS_PER_HOUR, earliest
+  delivery first, and run DIGEST_MAX_CONCURRENT at a time
+
+A user has at most one episode in flight, digest or /generate: builds are not
+started while the user's own /generate job runs, and a /generate sent while a
+digest is being built (or waits for its delivery time) takes that digest and
+gets it delivered as soon as it is ready. Two builds of the same content would
+otherwise share and corrupt one episode checkpoint.
+
+Times are in DIGEST_TIMEZONE (default UTC). Database reads and writes run on
+worker threads so a tick never blocks the event loop.
+"""
+import os
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from generation_jobs import GenerationJob, GenerationJobManager
+from llm_scheduler import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# A digest build that fails this many times is skipped for the day
+MAX_BUILD_ATTEMPTS = 3
+
+
+def parse_time(text: str) -> tuple:
+    """
+    Parse a delivery time.
+
+    Args:
+        text (str): 'HH:MM' (24-hour clock)
+
+    Returns:
+        tuple: (hour, minute)
+
+    Raises:
+        ValueError: If the time is malformed
+    """
+    hour, minute = (int(part) for part in text.strip().split(':'))
+    if not (0 <= hour < 24 and 0 <= minute < 60):
+        raise ValueError(f"Invalid time '{text}'")
+    return hour, minute
+
+
+def parse_hours(text: str) -> set:
+    """
+    Parse off-peak windows such as '1-6' or '22-2,13-14' into a set of hours.
+
+    A window includes its start hour and excludes its end hour and may wrap around midnight.
+    """
+    hours = set()
+    for window in filter(None, (part.strip() for part in text.split(','))):
+        start, end = (int(part) % 24 for part in window.split('-'))
+        hour = start
+        while hour != end:
+            hours.add(hour)
+            hour = (hour + 1) % 24
+    return hours
+
+
+async def _never_busy(*args) -> bool:
+    return False
+
+
+class DigestScheduler:
+    """Build and deliver daily digests for subscribed users."""
+
+    def __init__(self, db, build, deliver, is_busy=None, is_user_busy=None):
+        """
+        Args:
+            db (Database): Holds the subscriptions and content queues
+            build (callable): async build(job) -> built episode; raises on failure
+            deliver (callable): async deliver(job, built) sends a built episode
+            is_busy (callable, optional): async is_busy() returns True while interactive
+                work is waiting
+            is_user_busy (callable, optional): async is_user_busy(user_id) returns True
+                while the user has an interactive generation job in flight
+        """
+        self.db = db
+        self.build = build
+        self.deliver = deliver
+        self.is_busy = is_busy or _never_busy
+        self.is_user_busy = is_user_busy or _never_busy
+        self.timezone = ZoneInfo(os.getenv("DIGEST_TIMEZONE", "UTC"))
+        self.offpeak_hours = parse_hours(os.getenv("DIGEST_OFFPEAK_HOURS", "1-6"))
+        self.lead = timedelta(hours=float(os.getenv("DIGEST_LEAD_HOURS", "18")))
+        self.min_lead = timedelta(minutes=float(os.getenv("DIGEST_MIN_LEAD_MINUTES", "30")))
+        self.tick_seconds = float(os.getenv("DIGEST_TICK_SECONDS", "60"))
+        self.budget = TokenBucket(float(os.getenv("DIGEST_BUILDS_PER_HOUR", "30")) / 60.0)
+        self.jobs = GenerationJobManager(
+            self._run_build, max_concurrent=int(os.getenv("DIGEST_MAX_CONCURRENT", "1"))
+        )
+        self.bot = None
+        self._task = None
+        # user_id -> {'key', 'state', 'job', 'built', 'attempts', 'deliver_now'}
+        self._builds = {}
+
+    def _now(self) -> datetime:
+        return datetime.now(self.timezone)
+
+    def _next_delivery(self, digest: dict, now: datetime) -> tuple:
+        """The next delivery time of a subscription and its date key."""
+        hour, minute = parse_time(digest['time'])
+        target = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if digest.get('last_delivered') == target.date().isoformat():
+            target += timedelta(days=1)
+        return target, target.date().isoformat()
+
+    async def subscribe(self, user_id, chat_id, time_text: str) -> datetime:
+        """
+        Subscribe a user (or change their delivery time).
+
+        Args:
+            user_id: Telegram user ID
+            chat_id: Chat to deliver to
+            time_text (str): 'HH:MM'
+
+        Returns:
+            datetime: The first delivery time
+
+        Raises:
+            ValueError: If the time is malformed
+        """
+        hour, minute = parse_time(time_text)
+        now = self._now()
+        today = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+
+        previous = await asyncio.to_thread(self.db.get_user_digest, user_id) or {}
+        last_delivered = previous.get('last_delivered')
+        if today <= now:
+            # Today's time has passed; the first digest goes out tomorrow
+            last_delivered = now.date().isoformat()
+
+        digest = {'time': f"{hour:02d}:{minute:02d}", 'chat_id': chat_id, 'last_delivered': last_delivered}
+        await asyncio.to_thread(self.db.set_user_digest, user_id, digest)
+        self._builds.pop(user_id, None)
+        return self._next_delivery(digest, now)[0]
+
+    async def unsubscribe(self, user_id) -> bool:
+        """
+        Cancel a user's digest.
+
+        Returns:
+            bool: True if the user was subscribed
+        """
+        subscribed = await asyncio.to_thread(self.db.get_user_digest, user_id) is not None
+        await asyncio.to_thread(self.db.set_user_digest, user_id, None)
+        # A prepared episode is dropped; its audio file is removed by the janitor
+        build = self._builds.pop(user_id, None)
+        if build and build.get('job') is not None and build['job'].task is not None:
+            build['job'].task.cancel()
+        return subscribed
+
+    def _is_offpeak(self, now: datetime) -> bool:
+        return now.hour in self.offpeak_hours
+
+    async def request_now(self, user_id) -> bool:
+        """
+        Hand a digest that is being built or waiting for delivery to an interactive /generate.
+
+        The digest is delivered as soon as it is ready instead of at its delivery time.
+
+        Returns:
+            bool: True if the user's episode is already on its way; False if the caller
+                should start its own job
+        """
+        build = self._builds.get(user_id)
+        if build is None or build['state'] not in ('building', 'ready', 'delivering'):
+            return False
+        if build['state'] == 'delivering':
+            return True
+        build['deliver_now'] = True
+        if build['state'] == 'ready':
+            digest = await asyncio.to_thread(self.db.get_user_digest, user_id)
+            if digest is None:
+                return False
+            # A tick may have started the delivery meanwhile
+            if build['state'] == 'ready' and self._builds.get(user_id) is build:
+                self._finish(user_id, digest, build['key'], build)
+        logger.info(f"Delivering digest {build['key']} to user {user_id} as soon as it is ready")
+        return True
+
+    async def tick(self) -> None:
+        """Start due builds and deliver ready digests."""
+        now = self._now()
+        subscriptions = await asyncio.to_thread(self.db.get_digest_subscriptions)
+
+        for user_id in list(self._builds):
+            if user_id not in subscriptions:
+                self._builds.pop(user_id)
+
+        candidates = []
+        for user_id, digest in subscriptions.items():
+            try:
+                target, key = self._next_delivery(digest, now)
+            except (KeyError, ValueError) as e:
+                logger.warning(f"Ignoring malformed digest subscription of user {user_id}: {str(e)}")
+                continue
+
+            build = self._builds.get(user_id)
+            if build is not None and build['key'] != key:
+                # Delivered, or the delivery time changed
+                self._builds.pop(user_id)
+                build = None
+
+            due = now >= target or (build is not None and build.get('deliver_now'))
+            if build is not None and due and build['state'] in ('ready', 'empty', 'failed'):
+                self._finish(user_id, digest, key, build)
+            elif (build is None or build['state'] in ('retry', 'empty')) and now >= target - self.lead:
+                # An empty queue is checked again, in case items arrive before the delivery time
+                candidates.append((target, user_id, digest, key))
+
+        # Earliest delivery first, within the global build budget
+        for target, user_id, digest, key in sorted(candidates, key=lambda candidate: candidate[0]):
+            if await self.is_user_busy(user_id):
+                # The user's own /generate is building this content; a second build would race it
+                continue
+            urgent = target - now <= self.min_lead or self._builds.get(user_id, {}).get('deliver_now', False)
+            if not urgent and (not self._is_offpeak(now) or await self.is_busy()):
+                continue
+            if self.budget.time_until(1) > 0:
+                break
+            if await self._start_build(user_id, digest, key):
+                self.budget.take(1)
+
+    async def _start_build(self, user_id, digest: dict, key: str) -> bool:
+        """Start a digest build; returns False if there was nothing to build."""
+        current = self._builds.get(user_id)
+        previous = current or {}
+        attempts = previous.get('attempts', 0)
+        items = await asyncio.to_thread(self.db.get_unprocessed_content, user_id)
+        if self._builds.get(user_id) is not current:
+            # Unsubscribed or resubscribed while the queue was read
+            return False
+        if not items:
+            self._builds[user_id] = {'key': key, 'state': 'empty', 'attempts': attempts}
+            return False
+
+        attempts += 1
+
+        job = GenerationJob(user_id=user_id, chat_id=digest['chat_id'], bot=self.bot, content_items=items)
+        self._builds[user_id] = {
+            'key': key, 'state': 'building', 'job': job, 'attempts': attempts,
+            'deliver_now': previous.get('deliver_now', False)
+        }
+        self.jobs.submit(job)
+        logger.info(f"Building digest {key} for user {user_id} ({len(items)} items, attempt {attempts})")
+        return True
+
+    async def _run_build(self, job: GenerationJob) -> None:
+        """GenerationJobManager pipeline: build and hold the episode until its delivery time."""
+        build = self._builds.get(job.user_id)
+        try:
+            built = await self.build(job)
+        except Exception as e:
+            logger.error(f"Digest build for user {job.user_id} failed: {str(e)}")
+            if build is not None and self._builds.get(job.user_id) is build:
+                build['state'] = 'failed' if build['attempts'] >= MAX_BUILD_ATTEMPTS else 'retry'
+            raise
+
+        if build is not None and self._builds.get(job.user_id) is build:
+            build.update(state='ready', built=built)
+            if build.get('deliver_now'):
+                # A /generate is waiting for this episode
+                digest = await asyncio.to_thread(self.db.get_user_digest, job.user_id)
+                if digest is not None and build['state'] == 'ready' and self._builds.get(job.user_id) is build:
+                    self._finish(job.user_id, digest, build['key'], build)
+
+    def _finish(self, user_id, digest: dict, key: str, build: dict) -> None:
+        """Deliver a ready digest (or skip an empty or failed one) and record the day as done."""
+        state = build['state']
+        build['state'] = 'delivering'
+
+        async def finish():
+            try:
+                if state == 'ready':
+                    await self.deliver(build['job'], build['built'])
+                    logger.info(f"Delivered digest {key} to user {user_id}")
+                elif state == 'failed':
+                    logger.warning(f"Skipping digest {key} for user {user_id} after {build['attempts']} failed builds")
+            except Exception as e:
+                logger.error(f"Error delivering digest {key} to user {user_id}: {str(e)}")
+            finally:
+                await asyncio.to_thread(self._record_delivered, user_id, key)
+
+        asyncio.get_running_loop().create_task(finish())
+
+    def _record_delivered(self, user_id, key: str) -> None:
+        """Mark the day of `key` as done in the user's subscription (blocking)."""
+        current = self.db.get_user_digest(user_id)
+        if current is not None:
+            current['last_delivered'] = key
+            self.db.set_user_digest(user_id, current)
+
+    async def run(self) -> None:
+        """Check the subscriptions every tick, until cancelled."""
+        while True:
+            try:
+                await self.tick()
+            except Exception as e:
+                logger.error(f"Digest scheduler tick failed: {str(e)}")
+            await asyncio.sleep(self.tick_seconds)
+
+    def start(self, bot) -> asyncio.Task:
+        """Start the scheduler on the running event loop."""
+        self.bot = bot
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self.run())
+        return self._task
+
+    async def stop(self) -> None:
+        """Stop the scheduler and cancel running builds."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.jobs.shutdown()
@@ -0,0 +1,302 @@
+"""
+Episode Builder Module
+
+Builds an episode section by section (intro, one section per content item,
+outro) on top of EpisodeCheckpoint. Each section's script turns are saved once
+the LLM has produced them, and its processed audio once every turn has been
+synthesized. Running the same build again after a failure reuses whatever was
+saved and only regenerates the missing or failed sections.
+"""
+import os
+import json
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Optional
+
+from audio_assembler import AudioAssembler
+from audio_cache import AudioCache
+from episode_checkpoints import EpisodeCheckpoint
+from script_model import Script
+from tts_engines import TTSEngine
+
+logger = logging.getLogger(__name__)
+
+
+def section_audio_key(processor, engine: TTSEngine, turns: list) -> str:
+    """Fingerprint of everything that determines a section's audio."""
+    settings = {
+        'gap_ms': processor.segment_silence_ms,
+        'voices': {speaker: processor._voice_for(speaker) for speaker in ('HOST', 'COHOST')},
+        'processing': {speaker: processor._processing_settings(speaker) for speaker in ('HOST', 'COHOST')},
+    }
+    text = json.dumps([[turn.speaker, turn.to_tts()] for turn in turns])
+    return AudioCache.make_key(text, engine.name, settings)
+
+
+class EpisodeBuilder:
+    """Start checkpointed episode builds."""
+
+    def __init__(self, script_generator, tts_processor, jobs_dir: Optional[str] = None, pregenerator=None):
+        """
+        Args:
+            script_generator (ScriptGenerator): Produces the script sections
+            tts_processor (TTSProcessor): Synthesizes and encodes the audio
+            jobs_dir (str, optional): Checkpoint root (defaults to EPISODE_JOBS_DIR, then data/jobs)
+            pregenerator (PreGenerator, optional): Source of sections computed ahead of time
+        """
+        self.script_generator = script_generator
+        self.tts_processor = tts_processor
+        self.jobs_dir = jobs_dir or os.getenv("EPISODE_JOBS_DIR", "data/jobs")
+        self.pregenerator = pregenerator
+
+    def start(self, user_id, content_items: list, engine: Optional[TTSEngine] = None) -> "EpisodeBuild":
+        """
+        Open the build for a user's content items, resuming any earlier attempt.
+
+        Args:
+            user_id: Telegram user ID
+            content_items (list): Content item dictionaries, in episode order
+            engine (TTSEngine, optional): Engine for this episode
+
+        Returns:
+            EpisodeBuild: Call generate_script(), then finish_audio(), then complete()
+        """
+        checkpoint = EpisodeCheckpoint(self.jobs_dir, user_id, [item.get('id') for item in content_items])
+        return EpisodeBuild(self, checkpoint, user_id, content_items, engine)
+
+
+class EpisodeBuild:
+    """One (possibly resumed) episode build."""
+
+    def __init__(self, builder: EpisodeBuilder, checkpoint: EpisodeCheckpoint, user_id,
+                 content_items: list, engine: Optional[TTSEngine] = None):
+        self.builder = builder
+        self.checkpoint = checkpoint
+        self.user_id = user_id
+        self.content_items = content_items
+        self.processor = builder.tts_processor
+        self.engine = engine or self.processor.engine
+        self.audio_session = self.processor.start_session(engine=self.engine)
+
+        # Sections served from checkpoints, for logging
+        self.reused_scripts = 0
+        self.reused_audio = 0
+
+    def generate_script(self, on_progress=None) -> Script:
+        """
+        Produce the script, synthesizing each section's turns as soon as they are written.
+
+        Args:
+            on_progress (callable, optional): on_progress(sections_done, sections_total),
+                called after each section
+
+        Returns:
+            Script: The complete structured script
+
+        Raises:
+            Exception: If script generation failed (the audio session is cancelled)
+        """
+        generator = self.builder.script_generator
+        script = Script(labels=dict(generator.speaker_labels))
+        sections_total = len(self.content_items) + 2
+
+        def section_done(sections_done):
+            if on_progress is not None:
+                on_progress(sections_done, sections_total)
+
+        try:
+            self._add_section(script, 'intro', lambda on_turn: self._replay(generator.intro_turns, on_turn))
+            section_done(1)
+
+            for index, item in enumerate(self.content_items):
+                self._seed_from_pregenerated(f"item-{item.get('id', index)}", item, index)
+                self._add_section(
+                    script, f"item-{item.get('id', index)}",
+                    lambda on_turn, item=item, index=index: generator.generate_section(
+                        self.user_id, item, index, on_turn
+                    )
+                )
+                section_done(index + 2)
+
+            self._add_section(script, 'outro', lambda on_turn: self._replay(generator.outro_turns, on_turn))
+            section_done(sections_total)
+        except Exception:
+            self.audio_session.cancel()
+            raise
+
+        logger.info(
+            f"Episode job {self.checkpoint.job_id}: reused {self.reused_scripts} script sections "
+            f"and {self.reused_audio} audio sections from checkpoints"
+        )
+        return script
+
+    @staticmethod
+    def _replay(turns: list, on_turn) -> bool:
+        """Emit fixed turns (intro/outro); they never need a retry."""
+        for turn in turns:
+            on_turn(turn)
+        return True
+
+    def _add_section(self, script: Script, section_key: str, produce) -> None:
+        """
+        Add one section to the script and its audio to the session.
+
+        Args:
+            script (Script): Script being built
+            section_key (str): Checkpoint key of the section
+            produce (callable): produce(on_turn) -> bool; emits the section's turns and
+                returns False if they should be regenerated on a retry
+        """
+        turns = self.checkpoint.get_turns(section_key)
+        if turns is not None:
+            self.reused_scripts += 1
+            script.turns.extend(turns)
+
+            audio_key = self._audio_key(turns)
+            audio = self.checkpoint.get_audio(section_key, audio_key)
+            if audio is not None:
+                self.reused_audio += 1
+                future = Future()
+                future.set_result(audio)
+                self.audio_session.add_future(future)
+                return
+
+            section_audio = SectionAudio(self.processor, self.engine)
+            self.audio_session.add_future(section_audio.result)
+            for turn in turns:
+                section_audio.add_turn(turn)
+            section_audio.close(lambda audio: self.checkpoint.save_audio(section_key, audio_key, audio))
+            return
+
+        # Generate the section; its turns go to TTS while the rest is still being written
+        turns = []
+        section_audio = SectionAudio(self.processor, self.engine)
+        self.audio_session.add_future(section_audio.result)
+
+        def on_turn(turn):
+            turns.append(turn)
+            script.turns.append(turn)
+            section_audio.add_turn(turn)
+
+        try:
+            ok = produce(on_turn)
+        except Exception:
+            section_audio.close(None)
+            raise
+
+        if ok:
+            self.checkpoint.save_turns(section_key, turns)
+            audio_key = self._audio_key(turns)
+            section_audio.close(lambda audio: self.checkpoint.save_audio(section_key, audio_key, audio))
+        else:
+            # A fallback script is sent this time but regenerated on a retry
+            section_audio.close(None)
+
+    def _seed_from_pregenerated(self, section_key: str, item: dict, index: int) -> None:
+        """Checkpoint an item's pre-generated section, if there is one, so _add_section reuses it."""
+        pregenerator = self.builder.pregenerator
+        if pregenerator is None or item.get('id') is None or self.checkpoint.get_turns(section_key) is not None:
+            return
+
+        turns = pregenerator.get_turns(self.user_id, item['id'], index)
+        if turns is None:
+            return
+        self.checkpoint.save_turns(section_key, turns)
+
+        audio_key = self._audio_key(turns)
+        audio = pregenerator.get_audio(self.user_id, item['id'], audio_key)
+        if audio is not None:
+            self.checkpoint.save_audio(section_key, audio_key, audio)
+
+    def _audio_key(self, turns: list) -> str:
+        """Fingerprint of everything that determines a section's audio."""
+        return section_audio_key(self.processor, self.engine, turns)
+
+    def finish_audio(self) -> str:
+        """
+        Wait for the remaining sections and encode the episode.
+
+        Returns:
+            str: Path to the encoded episode
+        """
+        return self.audio_session.finish()
+
+    def complete(self) -> None:
+        """Drop the checkpoints once the episode has been delivered."""
+        self.checkpoint.discard()
+
+
+class SectionAudio:
+    """
+    Collects one section's turns and joins their audio once all are synthesized.
+
+    `result` resolves to the section's AudioSegment (None if nothing was produced).
+    The audio is checkpointed only if every turn produced audio.
+    """
+
+    def __init__(self, processor, engine: TTSEngine):
+        self.processor = processor
+        self.engine = engine
+        self.result = Future()
+        self._futures = []
+        self._on_complete = None
+        self._closed = False
+        self._join_scheduled = False
+        self._lock = threading.Lock()
+
+        # Cancelling the section (e.g. the whole session) drops its queued turns
+        self.result.add_done_callback(
+            lambda future: future.cancelled() and [f.cancel() for f in list(self._futures)]
+        )
+
+    def add_turn(self, turn) -> None:
+        """Submit a turn for synthesis (turns with nothing to say are skipped)."""
+        text = turn.to_tts()
+        if not text:
+            return
+        future = self.processor._submit_segment(turn.speaker, text, self.engine)
+        with self._lock:
+            self._futures.append(future)
+        future.add_done_callback(lambda _: self._maybe_join())
+
+    def close(self, on_complete) -> None:
+        """
+        Mark the section as fully written.
+
+        Args:
+            on_complete (callable): Called with the joined audio to checkpoint it, or None
+        """
+        with self._lock:
+            self._on_complete = on_complete
+            self._closed = True
+        self._maybe_join()
+
+    def _maybe_join(self) -> None:
+        """Schedule the join once the section is closed and every turn is done."""
+        with self._lock:
+            if self._join_scheduled or not self._closed or any(not future.done() for future in self._futures):
+                return
+            self._join_scheduled = True
+        self.processor.executor.submit(self._join, self._on_complete)
+
+    def _join(self, on_complete) -> None:
+        if not self.result.set_running_or_notify_cancel():
+            return
+
+        try:
+            # Turns are separated by the same pause the episode uses between turns
+            assembler = AudioAssembler(gap_ms=self.processor.segment_silence_ms)
+            complete = True
+            for future in self._futures:
+                audio = None if future.cancelled() else future.result()
+                complete = complete and audio is not None
+                assembler.add(audio)
+            section_audio = assembler.build()
+
+            if on_complete is not None and complete and section_audio is not None:
+                on_complete(section_audio)
+            self.result.set_result(section_audio)
+        except Exception as e:
+            logger.error(f"Error assembling section audio: {str(e)}")
+            self.result.set_exception(e)
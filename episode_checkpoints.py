@@ -0,0 +1,158 @@
+"""
+Episode Checkpoints Module
+
+Persists the finished pieces of an episode build so a failed /generate can be
+resumed instead of redone. A job is identified by the user and the ordered list
+of content items; for every section (intro, each item, outro) it stores the
+script turns and the processed section audio:
+
+    data/jobs/{user_id}/{job_id}/manifest.json
+    data/jobs/{user_id}/{job_id}/{section_key}.wav
+"""
+import os
+import json
+import time
+import uuid
+import wave
+import shutil
+import hashlib
+import logging
+import threading
+
+from audio_cache import read_wav, write_wav
+from script_model import Turn
+
+logger = logging.getLogger(__name__)
+
+
+class EpisodeCheckpoint:
+    """Checkpoint store for one episode build."""
+
+    def __init__(self, jobs_dir: str, user_id, content_ids: list):
+        """
+        Open (or start) the job for a user's content items.
+
+        Args:
+            jobs_dir (str): Root directory for all jobs
+            user_id: Telegram user ID
+            content_ids (list): IDs of the episode's content items, in episode order
+        """
+        self.user_id = user_id
+        self.job_id = self.make_job_id(content_ids)
+        self.job_dir = os.path.join(jobs_dir, str(user_id), self.job_id)
+        self._manifest_path = os.path.join(self.job_dir, "manifest.json")
+        self._lock = threading.Lock()
+
+        os.makedirs(self.job_dir, exist_ok=True)
+        self.manifest = self._load_manifest(content_ids)
+
+    @staticmethod
+    def make_job_id(content_ids: list) -> str:
+        """Derive a stable job id from the ordered content ids."""
+        material = json.dumps([str(content_id) for content_id in content_ids])
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()[:16]
+
+    def _load_manifest(self, content_ids: list) -> dict:
+        """Read the job manifest, or create an empty one."""
+        try:
+            with open(self._manifest_path, 'r') as f:
+                manifest = json.load(f)
+            logger.info(
+                f"Resuming episode job {self.job_id} for user {self.user_id} "
+                f"({len(manifest.get('sections', {}))} sections checkpointed)"
+            )
+            return manifest
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable manifest for job {self.job_id}: {str(e)}")
+
+        return {
+            'job_id': self.job_id,
+            'user_id': self.user_id,
+            'content_ids': [str(content_id) for content_id in content_ids],
+            'created_at': time.time(),
+            'sections': {}
+        }
+
+    def _save_manifest(self) -> None:
+        """Write the manifest atomically. Caller holds the lock."""
+        self.manifest['updated_at'] = time.time()
+        temp_path = f"{self._manifest_path}.{uuid.uuid4().hex}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(self.manifest, f)
+        os.replace(temp_path, self._manifest_path)
+
+    def _audio_path(self, section_key: str) -> str:
+        return os.path.join(self.job_dir, f"{section_key}.wav")
+
+    def get_turns(self, section_key: str):
+        """
+        Get a section's checkpointed script turns.
+
+        Returns:
+            list of Turn, or None if the section has not been generated successfully
+        """
+        with self._lock:
+            entry = self.manifest['sections'].get(section_key)
+        if not entry:
+            return None
+        return [Turn.from_dict(turn) for turn in entry['turns']]
+
+    def save_turns(self, section_key: str, turns: list) -> None:
+        """
+        Checkpoint a section's script turns.
+
+        Any audio stored for the section belonged to earlier turns and is dropped.
+        """
+        with self._lock:
+            self.manifest['sections'][section_key] = {'turns': [turn.to_dict() for turn in turns]}
+            self._save_manifest()
+
+    def get_audio(self, section_key: str, audio_key: str):
+        """
+        Get a section's checkpointed audio.
+
+        Args:
+            section_key (str): Section identifier
+            audio_key (str): Fingerprint of the turns, engine and processing the audio must match
+
+        Returns:
+            AudioSegment or None if missing, stale or unreadable
+        """
+        with self._lock:
+            entry = self.manifest['sections'].get(section_key) or {}
+        if entry.get('audio_key') != audio_key:
+            return None
+        try:
+            return read_wav(self._audio_path(section_key))
+        except (OSError, EOFError, wave.Error) as e:
+            logger.warning(f"Dropping unreadable audio checkpoint {section_key} of job {self.job_id}: {str(e)}")
+            return None
+
+    def save_audio(self, section_key: str, audio_key: str, audio) -> None:
+        """
+        Checkpoint a section's processed audio.
+
+        Args:
+            section_key (str): Section identifier (its turns must be checkpointed first)
+            audio_key (str): Fingerprint of the turns, engine and processing
+            audio (AudioSegment): The section's audio
+        """
+        try:
+            write_wav(self._audio_path(section_key), audio)
+        except OSError as e:
+            logger.warning(f"Could not checkpoint audio {section_key} of job {self.job_id}: {str(e)}")
+            return
+
+        with self._lock:
+            entry = self.manifest['sections'].get(section_key)
+            if entry is None:
+                return
+            entry['audio_key'] = audio_key
+            self._save_manifest()
+
+    def discard(self) -> None:
+        """Delete the job once the episode has been delivered."""
+        shutil.rmtree(self.job_dir, ignore_errors=True)
+        logger.info(f"Discarded episode job {self.job_id} for user {self.user_id}")
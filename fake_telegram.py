@@ -0,0 +1,243 @@
+"""
+Fake Telegram Module
+
+A local stand-in for the Telegram Bot API, for exercising the bot end to end
+without Telegram. It answers the Bot API methods the bot uses, records every
+call, and delivers user messages to the bot's registered webhook with the
+secret token, the way Telegram does.
+
+Run the bot against it with TELEGRAM_API_BASE_URL pointing at the fake:
+
+    python fake_telegram.py --port 8081 --token TEST
+    TELEGRAM_BOT_TOKEN=TEST TELEGRAM_API_BASE_URL=http://127.0.0.1:8081 BOT_MODE=webhook \\
+        WEBHOOK_URL=http://127.0.0.1:8443/telegram WEBHOOK_SECRET_TOKEN=secret python main.py
+
+Lines typed into the fake are sent to the bot as messages from a test user.
+"""
+import json
+import time
+import asyncio
+import logging
+import argparse
+from email.parser import BytesParser
+from email.policy import HTTP
+from urllib.parse import parse_qs
+
+import httpx
+
+from http_server import HTTPServer, HTTPRequest, HTTPResponse
+
+logger = logging.getLogger(__name__)
+
+BOT_USER = {'id': 1000, 'is_bot': True, 'first_name': 'triage.fm', 'username': 'triagefm_test_bot'}
+
+
+def _decode_value(value: str):
+    """Bot API parameters are JSON-encoded unless they are plain strings."""
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
+
+
+def parse_parameters(request: HTTPRequest) -> dict:
+    """Decode the parameters of a Bot API call (JSON, form or multipart body)."""
+    content_type = request.headers.get('content-type', '')
+    if not request.body:
+        return {key: _decode_value(value) for key, value in request.query.items()}
+    if content_type.startswith('application/json'):
+        return request.json()
+    if content_type.startswith('multipart/form-data'):
+        message = BytesParser(policy=HTTP).parsebytes(
+            f"Content-Type: {content_type}\r\n\r\n".encode('latin-1') + request.body
+        )
+        params = {}
+        for part in message.iter_parts():
+            name = part.get_param('name', header='content-disposition')
+            if part.get_filename():
+                params[name] = {'filename': part.get_filename(), 'size': len(part.get_payload(decode=True))}
+            else:
+                params[name] = _decode_value(part.get_content())
+        return params
+    return {key: _decode_value(values[-1]) for key, values in parse_qs(request.body.decode('utf-8')).items()}
+
+
+class FakeTelegram:
+    """In-process fake of the Bot API and of Telegram's webhook delivery."""
+
+    def __init__(self, token: str, host: str = "127.0.0.1", port: int = 0):
+        """
+        Args:
+            token (str): Bot token the fake accepts
+            host (str): Interface to listen on
+            port (int): Port to listen on (0 picks a free one)
+        """
+        self.token = token
+        self.server = HTTPServer(host, port)
+        self.calls = []
+        self.webhook_url = None
+        self.webhook_secret = None
+        self._next_message_id = 1
+        self._next_update_id = 1
+        self._changed = asyncio.Condition()
+
+        methods = {
+            'getMe': lambda params: BOT_USER,
+            'setWebhook': self._set_webhook,
+            'deleteWebhook': self._delete_webhook,
+            'getUpdates': self._get_updates,
+            'sendMessage': lambda params: self._message(params, text=params.get('text')),
+            'editMessageText': lambda params: self._message(params, text=params.get('text')),
+            'deleteMessage': lambda params: True,
+            'sendChatAction': lambda params: True,
+            'sendVoice': lambda params: self._message(params, voice=self._file(params.get('voice'))),
+            'sendAudio': lambda params: self._message(params, audio=self._file(params.get('audio'))),
+        }
+        for method, handler in methods.items():
+            self.server.route("POST", f"/bot{token}/{method}", self._api_handler(method, handler))
+
+    @property
+    def base_url(self) -> str:
+        """Value for the bot's TELEGRAM_API_BASE_URL."""
+        return f"http://{self.server.host}:{self.server.port}"
+
+    async def start(self) -> None:
+        await self.server.start()
+
+    async def stop(self) -> None:
+        await self.server.stop()
+
+    def _api_handler(self, method: str, handler):
+        async def handle(request: HTTPRequest) -> HTTPResponse:
+            params = parse_parameters(request)
+            result = handler(params)
+            if asyncio.iscoroutine(result):
+                result = await result
+            async with self._changed:
+                self.calls.append((method, params))
+                self._changed.notify_all()
+            logger.info(f"Bot called {method}: {params}")
+            return HTTPResponse.json({'ok': True, 'result': result})
+        return handle
+
+    async def _get_updates(self, params: dict) -> list:
+        """Long polling: updates are only delivered by webhook, so wait out the timeout."""
+        await asyncio.sleep(min(float(params.get('timeout') or 0), 1.0))
+        return []
+
+    def _set_webhook(self, params: dict) -> bool:
+        self.webhook_url = params.get('url')
+        self.webhook_secret = params.get('secret_token')
+        return True
+
+    def _delete_webhook(self, params: dict) -> bool:
+        self.webhook_url = self.webhook_secret = None
+        return True
+
+    def _message(self, params: dict, **content) -> dict:
+        """A Message object as returned by the send/edit methods."""
+        message_id = params.get('message_id')
+        if message_id is None:
+            message_id = self._next_message_id
+            self._next_message_id += 1
+        message = {
+            'message_id': int(message_id),
+            'date': int(time.time()),
+            'chat': {'id': int(params.get('chat_id', 0)), 'type': 'private'},
+            'from': BOT_USER,
+        }
+        message.update({key: value for key, value in content.items() if value is not None})
+        return message
+
+    def _file(self, upload) -> dict:
+        file_id = f"file{self._next_message_id}"
+        return {'file_id': file_id, 'file_unique_id': file_id, 'duration': 0,
+                'file_size': upload.get('size', 0) if isinstance(upload, dict) else 0}
+
+    def make_update(self, user_id: int, text: str) -> dict:
+        """Build a Telegram update for a private text message from a user."""
+        user = {'id': user_id, 'is_bot': False, 'first_name': f"User{user_id}"}
+        message = {
+            'message_id': self._next_message_id,
+            'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': user,
+            'text': text,
+        }
+        if text.startswith('/'):
+            message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text.split()[0])}]
+        self._next_message_id += 1
+        update = {'update_id': self._next_update_id, 'message': message}
+        self._next_update_id += 1
+        return update
+
+    async def send_message(self, user_id: int, text: str, secret_token: str = None) -> int:
+        """
+        Deliver a user's message to the registered webhook.
+
+        Args:
+            user_id (int): Sending user
+            text (str): Message text (commands get a bot_command entity)
+            secret_token (str, optional): Override the registered secret (to test rejection)
+
+        Returns:
+            int: HTTP status returned by the bot
+        """
+        if self.webhook_url is None:
+            raise RuntimeError("The bot has not registered a webhook")
+        headers = {'X-Telegram-Bot-Api-Secret-Token': secret_token or self.webhook_secret or ''}
+        async with httpx.AsyncClient() as client:
+            response = await client.post(self.webhook_url, json=self.make_update(user_id, text), headers=headers)
+        return response.status_code
+
+    async def wait_for(self, method: str, count: int = 1, timeout: float = 30.0) -> list:
+        """
+        Wait until the bot has called a method `count` times.
+
+        Returns:
+            list: Parameters of those calls
+
+        Raises:
+            asyncio.TimeoutError: If it did not happen in time
+        """
+        def matching():
+            return [params for called, params in self.calls if called == method]
+
+        async with self._changed:
+            await asyncio.wait_for(self._changed.wait_for(lambda: len(matching()) >= count), timeout)
+            return matching()
+
+    async def wait_for_webhook(self, timeout: float = 30.0) -> None:
+        """Wait until the bot has registered its webhook."""
+        async with self._changed:
+            await asyncio.wait_for(self._changed.wait_for(lambda: self.webhook_url is not None), timeout)
+
+
+async def _interactive(token: str, host: str, port: int, user_id: int) -> None:
+    fake = FakeTelegram(token, host, port)
+    await fake.start()
+    print(f"Fake Telegram API at {fake.base_url} (token {token}); waiting for the bot's webhook...")
+    await fake.wait_for_webhook(timeout=3600)
+    print(f"Webhook registered at {fake.webhook_url}. Type messages to send as user {user_id}.")
+
+    loop = asyncio.get_running_loop()
+    while True:
+        line = await loop.run_in_executor(None, input)
+        if line.strip():
+            status = await fake.send_message(user_id, line.strip())
+            print(f"-> delivered ({status})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local fake of the Telegram Bot API")
+    parser.add_argument("--token", default="TEST")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--user-id", type=int, default=42)
+    args = parser.parse_args()
+
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
+    try:
+        asyncio.run(_interactive(args.token, args.host, args.port, args.user_id))
+    except (KeyboardInterrupt, EOFError):
+        pass
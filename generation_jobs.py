@@ -0,0 +1,236 @@
+"""
+Generation Jobs Module
+
+Runs podcast generation outside the Telegram update handlers. A handler creates
+a GenerationJob and submits it to the GenerationJobManager, which returns at
+once; the job's pipeline runs as a background task, its blocking stages (LLM
+calls, speech synthesis, encoding) on the manager's worker threads, so the
+event loop keeps answering other users. At most GENERATION_MAX_CONCURRENT_JOBS
+jobs run at a time; the rest wait their turn. Jobs report progress by editing
+their status message.
+
+Each user has at most one job in flight: a repeated /generate attaches to it.
+Before a new job is created, `admit` checks the queue depth: past
+GENERATION_DEFER_QUEUE_DEPTH waiting jobs the job is still accepted but the user
+is told the estimated wait, past GENERATION_MAX_QUEUE_DEPTH it is rejected with
+a retry estimate.
+"""
+import os
+import math
+import time
+import uuid
+import asyncio
+import logging
+import functools
+from dataclasses import dataclass, field
+from typing import Any, Optional
+from telegram.error import BadRequest, TelegramError
+
+from metrics import ContextThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class GenerationJob:
+    """One /generate request."""
+    user_id: int
+    chat_id: int
+    bot: Any
+    content_items: list
+    status_message_id: Optional[int] = None
+    job_id: str = field(default_factory=lambda: uuid.uuid4().hex[:12])
+    # queued, running, done or failed
+    state: str = 'queued'
+    progress: str = ''
+    # Set once the text summary has reached the user, so a retried job does not send it again
+    summary_sent: bool = False
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    manager: Optional["GenerationJobManager"] = field(default=None, repr=False)
+    task: Optional[asyncio.Task] = field(default=None, repr=False)
+
+    async def run_blocking(self, func, *args, **kwargs):
+        """Run a blocking call on the manager's worker threads."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.manager.executor, functools.partial(func, *args, **kwargs))
+
+    async def report(self, text: str) -> None:
+        """
+        Show progress by editing the job's status message.
+
+        Failures (deleted message, unchanged text, network errors) are logged and ignored;
+        progress is informational only.
+        """
+        if text == self.progress:
+            return
+        self.progress = text
+        if self.status_message_id is None:
+            return
+        try:
+            await self.bot.edit_message_text(text, chat_id=self.chat_id, message_id=self.status_message_id)
+        except BadRequest as e:
+            logger.debug(f"Job {self.job_id}: could not update status message: {str(e)}")
+        except TelegramError as e:
+            logger.warning(f"Job {self.job_id}: could not update status message: {str(e)}")
+
+    def report_threadsafe(self, text: str) -> None:
+        """Report progress from a worker thread."""
+        asyncio.run_coroutine_threadsafe(self.report(text), self.manager.loop)
+
+    async def delete_status_message(self) -> None:
+        """Remove the status message once the job has delivered its output."""
+        if self.status_message_id is None:
+            return
+        try:
+            await self.bot.delete_message(chat_id=self.chat_id, message_id=self.status_message_id)
+        except TelegramError as e:
+            logger.debug(f"Job {self.job_id}: could not delete status message: {str(e)}")
+        self.status_message_id = None
+
+
+@dataclass
+class Admission:
+    """Outcome of GenerationJobManager.admit."""
+    # accept: start now, defer: accepted but queued behind others,
+    # attach: the user already has a job in flight, reject: overloaded
+    decision: str
+    estimated_wait: float = 0.0
+    job: Optional[GenerationJob] = None
+
+
+def format_wait(seconds: float) -> str:
+    """Human-readable wait estimate, e.g. 'about 3 minutes'."""
+    if seconds < 60:
+        return "less than a minute"
+    minutes = math.ceil(seconds / 60)
+    return f"about {minutes} minute{'s' if minutes != 1 else ''}"
+
+
+class GenerationJobManager:
+    """Run generation jobs in the background with a concurrency limit."""
+
+    def __init__(self, pipeline, max_concurrent: Optional[int] = None, worker_threads: Optional[int] = None):
+        """
+        Args:
+            pipeline (callable): async pipeline(job) that builds and delivers the episode
+            max_concurrent (int, optional): Jobs running at once (defaults to
+                GENERATION_MAX_CONCURRENT_JOBS, then 2)
+            worker_threads (int, optional): Threads for blocking stages (defaults to
+                GENERATION_WORKER_THREADS, then two per concurrent job)
+        """
+        self.pipeline = pipeline
+        self.max_concurrent = max_concurrent or int(os.getenv("GENERATION_MAX_CONCURRENT_JOBS", "2"))
+        # Waiting jobs beyond which new jobs are deferred (with a wait estimate) or rejected
+        self.defer_queue_depth = int(os.getenv("GENERATION_DEFER_QUEUE_DEPTH", str(2 * self.max_concurrent)))
+        self.max_queue_depth = int(os.getenv("GENERATION_MAX_QUEUE_DEPTH", str(5 * self.max_concurrent)))
+        # Running average of job durations, seeded with a typical episode
+        self.average_job_seconds = float(os.getenv("GENERATION_EXPECTED_JOB_SECONDS", "90"))
+        worker_threads = worker_threads or int(os.getenv("GENERATION_WORKER_THREADS", str(2 * self.max_concurrent)))
+        # Blocking stages run in the job's context, so they count towards its trace
+        self.executor = ContextThreadPoolExecutor(max_workers=worker_threads, thread_name_prefix="generation")
+        self.loop = None
+        self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        self._jobs = {}
+
+    def admit(self, user_id) -> Admission:
+        """
+        Decide whether a new job for the user can be queued.
+
+        Args:
+            user_id: Telegram user ID
+
+        Returns:
+            Admission: The decision, with the in-flight job for 'attach' and the
+                estimated wait for 'defer' and 'reject'
+        """
+        in_flight = self.jobs_for_user(user_id)
+        if in_flight:
+            return Admission('attach', job=in_flight[0])
+
+        queued = self.queued_count()
+        estimated_wait = self.estimate_wait()
+        if queued >= self.max_queue_depth:
+            logger.warning(f"Rejecting generation job for user {user_id}: {queued} jobs queued")
+            return Admission('reject', estimated_wait=estimated_wait)
+        if queued >= self.defer_queue_depth:
+            return Admission('defer', estimated_wait=estimated_wait)
+        return Admission('accept', estimated_wait=estimated_wait)
+
+    def estimate_wait(self) -> float:
+        """Estimated seconds before a job submitted now would start."""
+        ahead = self.running_count() + self.queued_count()
+        if ahead < self.max_concurrent:
+            return 0.0
+        # Jobs start in waves as slots free up; the running wave is half done on average
+        waves = (ahead - self.max_concurrent) // self.max_concurrent
+        return (waves + 0.5) * self.average_job_seconds
+
+    def submit(self, job: GenerationJob) -> GenerationJob:
+        """
+        Queue a job; returns immediately.
+
+        If the user already has a job in flight, the new one is dropped and the
+        in-flight job is returned instead. Must be called from the event loop.
+
+        Returns:
+            GenerationJob: The job that will deliver the user's episode
+        """
+        in_flight = self.jobs_for_user(job.user_id)
+        if in_flight:
+            return in_flight[0]
+
+        self.loop = asyncio.get_running_loop()
+        job.manager = self
+        self._jobs[job.job_id] = job
+        job.task = self.loop.create_task(self._run(job))
+        logger.info(
+            f"Queued generation job {job.job_id} for user {job.user_id} "
+            f"({self.running_count()} running, {self.queued_count()} queued)"
+        )
+        return job
+
+    async def _run(self, job: GenerationJob) -> None:
+        try:
+            async with self._semaphore:
+                job.state = 'running'
+                job.started_at = time.time()
+                logger.info(f"Starting generation job {job.job_id} after {job.started_at - job.created_at:.1f}s in queue")
+                await self.pipeline(job)
+                job.state = 'done'
+        except asyncio.CancelledError:
+            job.state = 'failed'
+            raise
+        except Exception as e:
+            job.state = 'failed'
+            logger.error(f"Generation job {job.job_id} failed: {str(e)}")
+        finally:
+            job.finished_at = time.time()
+            self._jobs.pop(job.job_id, None)
+            if job.started_at is not None:
+                duration = job.finished_at - job.started_at
+                if job.state == 'done':
+                    self.average_job_seconds = 0.8 * self.average_job_seconds + 0.2 * duration
+                logger.info(f"Generation job {job.job_id} {job.state} in {duration:.1f}s")
+
+    # The counts are also read by the metrics endpoint from a worker thread;
+    # list() copies the jobs without running Python code, so it cannot see
+    # the dict change size
+    def running_count(self) -> int:
+        return sum(1 for job in list(self._jobs.values()) if job.state == 'running')
+
+    def queued_count(self) -> int:
+        return sum(1 for job in list(self._jobs.values()) if job.state == 'queued')
+
+    def jobs_for_user(self, user_id) -> list:
+        """Unfinished jobs of a user."""
+        return [job for job in self._jobs.values() if job.user_id == user_id]
+
+    async def shutdown(self) -> None:
+        """Cancel unfinished jobs and stop the worker threads."""
+        tasks = [job.task for job in self._jobs.values() if job.task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.executor.shutdown(wait=False, cancel_futures=True)
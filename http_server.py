@@ -0,0 +1,195 @@
+"""
+HTTP Server Module
+
+Minimal embedded HTTP/1.1 server on asyncio streams, for the Telegram webhook
+and other small internal endpoints. Handlers are registered per method and
+path and run on the bot's event loop:
+
+    server = HTTPServer("0.0.0.0", 8443)
+    server.route("POST", "/telegram", handle_update)
+    await server.start()
+
+Requests need a Content-Length (no chunked uploads), which is what Telegram and
+load balancers send.
+"""
+import json
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from urllib.parse import urlsplit, parse_qs
+
+logger = logging.getLogger(__name__)
+
+STATUS_TEXT = {
+    200: "OK", 204: "No Content", 400: "Bad Request", 401: "Unauthorized", 403: "Forbidden",
+    404: "Not Found", 405: "Method Not Allowed", 411: "Length Required", 413: "Payload Too Large",
+    500: "Internal Server Error", 503: "Service Unavailable",
+}
+
+
+@dataclass
+class HTTPRequest:
+    """A parsed request."""
+    method: str
+    path: str
+    query: dict
+    # Header names are lower-cased
+    headers: dict
+    body: bytes = b''
+
+    def json(self):
+        """Decode the body as JSON (raises ValueError if it is not)."""
+        return json.loads(self.body.decode('utf-8'))
+
+
+@dataclass
+class HTTPResponse:
+    """A response to send."""
+    status: int = 200
+    body: bytes = b''
+    content_type: str = "text/plain; charset=utf-8"
+    headers: dict = field(default_factory=dict)
+
+    @classmethod
+    def json(cls, data, status: int = 200) -> "HTTPResponse":
+        return cls(status, json.dumps(data).encode('utf-8'), "application/json")
+
+
+class HTTPServer:
+    """Route HTTP requests to async handlers."""
+
+    def __init__(self, host: str = "0.0.0.0", port: int = 8080, max_body_bytes: int = 10 * 1024 * 1024,
+                 idle_timeout: float = 30.0):
+        """
+        Args:
+            host (str): Interface to listen on
+            port (int): Port to listen on (0 picks a free one; see `port` after start)
+            max_body_bytes (int): Larger request bodies are rejected
+            idle_timeout (float): Seconds to wait for the next request on a kept-alive connection
+        """
+        self.host = host
+        self.port = port
+        self.max_body_bytes = max_body_bytes
+        self.idle_timeout = idle_timeout
+        self._routes = {}
+        self._server = None
+        self._connections = set()
+
+    def route(self, method: str, path: str, handler) -> None:
+        """
+        Register a handler.
+
+        Args:
+            method (str): 'GET', 'POST', ...
+            path (str): Exact request path
+            handler (callable): async handler(HTTPRequest) -> HTTPResponse
+        """
+        self._routes[(method.upper(), path)] = handler
+
+    async def start(self) -> None:
+        """Start listening."""
+        self._server = await asyncio.start_server(self._serve_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"HTTP server listening on {self.host}:{self.port}")
+
+    async def stop(self) -> None:
+        """Stop listening and close the server."""
+        if self._server is not None:
+            self._server.close()
+            # Idle kept-alive connections would otherwise hold wait_closed open
+            for task in list(self._connections):
+                task.cancel()
+            await asyncio.gather(*self._connections, return_exceptions=True)
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _serve_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        task = asyncio.current_task()
+        self._connections.add(task)
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(self._read_request(reader), self.idle_timeout)
+                except asyncio.TimeoutError:
+                    break
+                except ValueError as e:
+                    await self._write_response(writer, HTTPResponse(400, str(e).encode('utf-8')), keep_alive=False)
+                    break
+                if request is None:
+                    break
+                if isinstance(request, HTTPResponse):
+                    # The request was rejected while reading it
+                    await self._write_response(writer, request, keep_alive=False)
+                    break
+
+                response = await self._dispatch(request)
+                keep_alive = request.headers.get('connection', '').lower() != 'close'
+                await self._write_response(writer, response, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:
+            # Cancelled by stop(); the connection is simply closed
+            pass
+        finally:
+            self._connections.discard(task)
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+
+    async def _read_request(self, reader: asyncio.StreamReader):
+        """Read one request; None at end of stream, an HTTPResponse if it must be rejected."""
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        try:
+            method, target, _ = request_line.decode('latin-1').split(' ', 2)
+        except ValueError:
+            raise ValueError("Malformed request line")
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            return HTTPResponse(411, b"Content-Length required")
+        length = int(headers.get('content-length', '0') or 0)
+        if length > self.max_body_bytes:
+            return HTTPResponse(413, b"Request body too large")
+        body = await reader.readexactly(length) if length else b''
+
+        url = urlsplit(target)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        return HTTPRequest(method.upper(), url.path, query, headers, body)
+
+    async def _dispatch(self, request: HTTPRequest) -> HTTPResponse:
+        handler = self._routes.get((request.method, request.path))
+        if handler is None:
+            if any(path == request.path for _, path in self._routes):
+                return HTTPResponse(405, b"Method not allowed")
+            return HTTPResponse(404, b"Not found")
+        try:
+            return await handler(request)
+        except Exception as e:
+            logger.error(f"Error handling {request.method} {request.path}: {str(e)}")
+            return HTTPResponse(500, b"Internal server error")
+
+    async def _write_response(self, writer: asyncio.StreamWriter, response: HTTPResponse, keep_alive: bool) -> None:
+        headers = {
+            'Content-Type': response.content_type,
+            'Content-Length': str(len(response.body)),
+            'Connection': 'keep-alive' if keep_alive else 'close',
+            **response.headers
+        }
+        head = f"HTTP/1.1 {response.status} {STATUS_TEXT.get(response.status, 'Unknown')}\r\n"
+        head += ''.join(f"{name}: {value}\r\n" for name, value in headers.items())
+        writer.write(head.encode('latin-1') + b"\r\n" + response.body)
+        await writer.drain()
+
@@ -0,0 +1,229 @@
+"""
+Janitor Module
+
+Background task that keeps the bot's working directories within byte quotas and
+age limits. Each directory has its own policy: files older than the age limit
+are removed, then the least recently used files are evicted until the directory
+fits its quota. Current usage per directory is kept for monitoring.
+"""
+import os
+import time
+import asyncio
+import logging
+import threading
+from dataclasses import dataclass
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+
+@dataclass
+class DirectoryPolicy:
+    """Limits for one directory."""
+    name: str
+    path: str
+    max_bytes: Optional[int] = None  # None: no quota
+    max_age_seconds: Optional[float] = None  # None: no age limit
+    recursive: bool = True
+    # Files touched more recently than this are never evicted (they may be in use)
+    grace_seconds: float = 600
+
+    @classmethod
+    def from_env(cls, name: str, path: str, max_mb: Optional[float], max_age_hours: Optional[float],
+                 recursive: bool = True) -> "DirectoryPolicy":
+        """
+        Build a policy, letting JANITOR_<NAME>_MAX_MB and JANITOR_<NAME>_MAX_AGE_HOURS
+        override the defaults ("0" disables a limit).
+
+        Args:
+            name (str): Policy name, e.g. 'scripts'
+            path (str): Directory
+            max_mb (float, optional): Default quota in megabytes
+            max_age_hours (float, optional): Default age limit in hours
+            recursive (bool): Include subdirectories
+        """
+        prefix = f"JANITOR_{name.upper()}"
+        max_mb = float(os.getenv(f"{prefix}_MAX_MB", max_mb or 0))
+        max_age_hours = float(os.getenv(f"{prefix}_MAX_AGE_HOURS", max_age_hours or 0))
+        return cls(
+            name=name,
+            path=path,
+            max_bytes=int(max_mb * MB) if max_mb > 0 else None,
+            max_age_seconds=max_age_hours * 3600 if max_age_hours > 0 else None,
+            recursive=recursive
+        )
+
+
+class Janitor:
+    """Enforce directory policies periodically."""
+
+    def __init__(self, policies: List[DirectoryPolicy], interval_seconds: float = 600):
+        """
+        Args:
+            policies (list): DirectoryPolicy per managed directory
+            interval_seconds (float): Time between sweeps
+        """
+        self.policies = policies
+        self.interval_seconds = interval_seconds
+        self._lock = threading.Lock()
+        self._usage = {}
+        self._task = None
+
+    @classmethod
+    def from_env(cls, audio_dir: str = "temp/audio", cache_dir: str = "temp/audio_cache",
+                 jobs_dir: str = "data/jobs", scripts_dir: str = "data/scripts",
+                 downloads_dir: str = "temp", pregen_dir: str = "data/pregen") -> "Janitor":
+        """Create the janitor with the default policies, overridable from the environment."""
+        policies = [
+            DirectoryPolicy.from_env("audio", audio_dir, max_mb=512, max_age_hours=24),
+            # Only the downloads directly in temp/; its subdirectories have their own policies
+            DirectoryPolicy.from_env("downloads", downloads_dir, max_mb=256, max_age_hours=6, recursive=False),
+            # The audio cache enforces its own byte quota; the janitor only ages out stale entries
+            DirectoryPolicy.from_env("cache", cache_dir, max_mb=None, max_age_hours=24 * 30),
+            DirectoryPolicy.from_env("scripts", scripts_dir, max_mb=512, max_age_hours=24 * 30),
+            DirectoryPolicy.from_env("jobs", jobs_dir, max_mb=1024, max_age_hours=24 * 7),
+            DirectoryPolicy.from_env("pregen", pregen_dir, max_mb=1024, max_age_hours=24 * 7),
+        ]
+        return cls(policies, interval_seconds=float(os.getenv("JANITOR_INTERVAL_SECONDS", "600")))
+
+    def _scan(self, policy: DirectoryPolicy) -> list:
+        """List (last_used, size, path) for every file under the policy's directory."""
+        files = []
+        pending = [policy.path]
+        while pending:
+            directory = pending.pop()
+            try:
+                entries = list(os.scandir(directory))
+            except FileNotFoundError:
+                continue
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if policy.recursive:
+                            pending.append(entry.path)
+                        continue
+                    stat = entry.stat(follow_symlinks=False)
+                except FileNotFoundError:
+                    continue
+                # Reads bump atime only loosely (relatime), so take whichever is newer
+                files.append((max(stat.st_atime, stat.st_mtime), stat.st_size, entry.path))
+        return files
+
+    def _remove_empty_dirs(self, root: str) -> None:
+        """Remove empty subdirectories below root (never root itself)."""
+        for directory, subdirectories, filenames in os.walk(root, topdown=False):
+            if directory != root and not subdirectories and not filenames:
+                try:
+                    os.rmdir(directory)
+                except OSError:
+                    pass
+
+    def sweep_directory(self, policy: DirectoryPolicy) -> dict:
+        """
+        Apply one policy.
+
+        Returns:
+            dict: bytes, files, evicted_files, evicted_bytes, over_quota
+        """
+        now = time.time()
+        files = sorted(self._scan(policy))  # least recently used first
+        total_bytes = sum(size for _, size, _ in files)
+        evicted_files = evicted_bytes = 0
+
+        kept = []
+        for last_used, size, path in files:
+            expired = policy.max_age_seconds is not None and now - last_used > policy.max_age_seconds
+            over_quota = policy.max_bytes is not None and total_bytes > policy.max_bytes
+            in_grace = now - last_used < policy.grace_seconds
+            if (expired or over_quota) and not in_grace:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    logger.warning(f"Janitor could not remove {path}: {str(e)}")
+                    kept.append(size)
+                    continue
+                total_bytes -= size
+                evicted_files += 1
+                evicted_bytes += size
+            else:
+                kept.append(size)
+
+        if policy.recursive and evicted_files:
+            self._remove_empty_dirs(policy.path)
+
+        return {
+            'bytes': total_bytes,
+            'files': len(kept),
+            'evicted_files': evicted_files,
+            'evicted_bytes': evicted_bytes,
+            'over_quota': policy.max_bytes is not None and total_bytes > policy.max_bytes
+        }
+
+    def sweep(self) -> dict:
+        """
+        Apply every policy once.
+
+        Returns:
+            dict: Usage per policy name (see get_usage)
+        """
+        for policy in self.policies:
+            try:
+                result = self.sweep_directory(policy)
+            except Exception as e:
+                logger.error(f"Janitor sweep of {policy.path} failed: {str(e)}")
+                continue
+
+            result.update({'max_bytes': policy.max_bytes, 'swept_at': time.time()})
+            with self._lock:
+                self._usage[policy.name] = result
+
+            if result['evicted_files']:
+                logger.info(
+                    f"Janitor: evicted {result['evicted_files']} files ({result['evicted_bytes']} bytes) "
+                    f"from {policy.path}"
+                )
+            if result['over_quota']:
+                logger.warning(f"Janitor: {policy.path} is still over quota ({result['bytes']} bytes, files in use)")
+
+        return self.get_usage()
+
+    def get_usage(self) -> dict:
+        """
+        Current usage per managed directory, as of the last sweep.
+
+        Returns:
+            dict: {policy name: {bytes, files, max_bytes, evicted_files, evicted_bytes, over_quota, swept_at}}
+        """
+        with self._lock:
+            return {name: dict(usage) for name, usage in self._usage.items()}
+
+    async def run(self) -> None:
+        """Sweep now and then every interval, until cancelled."""
+        while True:
+            usage = await asyncio.to_thread(self.sweep)
+            logger.info(
+                "Janitor usage: " + ", ".join(
+                    f"{name}={info['bytes'] // MB}MB/{info['files']} files" for name, info in usage.items()
+                )
+            )
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self) -> asyncio.Task:
+        """Start the background task on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self.run())
+        return self._task
+
+    async def stop(self) -> None:
+        """Cancel the background task."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
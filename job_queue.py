@@ -0,0 +1,356 @@
+"""
+Job Queue Module
+
+Durable job queue shared by the Telegram front end and the worker processes
+(worker.py). Jobs live in a SQLite database (JOB_QUEUE_PATH, default
+data/jobs.sqlite3), so any number of processes on the same machine can enqueue
+and take work, and queued jobs survive restarts.
+
+A worker leases a job for JOB_LEASE_SECONDS and keeps the lease alive with
+heartbeats while it works. If the worker dies, the lease runs out and another
+worker picks the job up again. Each job is attempted at most JOB_MAX_ATTEMPTS
+times; after that it is marked failed. A job whose handler raises is failed at
+once, since the handler has already told the user.
+
+Jobs can carry a dedupe key (e.g. one /generate per user): while a job with the
+key is queued or leased, enqueueing another one returns the existing job.
+"""
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    dedupe_key TEXT,
+    -- queued, leased, done or failed
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    worker_id TEXT,
+    lease_expires REAL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_by_state ON jobs (state, created_at);
+CREATE UNIQUE INDEX IF NOT EXISTS jobs_by_dedupe_key ON jobs (dedupe_key)
+    WHERE dedupe_key IS NOT NULL AND state IN ('queued', 'leased');
+"""
+
+
+@dataclass
+class QueuedJob:
+    """A job as stored in the queue."""
+    job_id: str
+    kind: str
+    payload: dict
+    state: str = 'queued'
+    attempts: int = 0
+    max_attempts: int = 3
+    worker_id: Optional[str] = None
+    lease_expires: Optional[float] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    dedupe_key: Optional[str] = None
+    error: Optional[str] = None
+
+    @classmethod
+    def from_row(cls, row: sqlite3.Row) -> "QueuedJob":
+        return cls(
+            job_id=row['id'], kind=row['kind'], payload=json.loads(row['payload']), state=row['state'],
+            attempts=row['attempts'], max_attempts=row['max_attempts'], worker_id=row['worker_id'],
+            lease_expires=row['lease_expires'], created_at=row['created_at'], started_at=row['started_at'],
+            finished_at=row['finished_at'], dedupe_key=row['dedupe_key'], error=row['error']
+        )
+
+
+class JobQueue:
+    """SQLite-backed job queue with leases."""
+
+    def __init__(self, path: Optional[str] = None, lease_seconds: Optional[float] = None,
+                 max_attempts: Optional[int] = None):
+        """
+        Args:
+            path (str, optional): Database file (defaults to JOB_QUEUE_PATH, then data/jobs.sqlite3)
+            lease_seconds (float, optional): Lease length (defaults to JOB_LEASE_SECONDS, then 60)
+            max_attempts (int, optional): Attempts per job (defaults to JOB_MAX_ATTEMPTS, then 3)
+        """
+        self.path = path or os.getenv("JOB_QUEUE_PATH", "data/jobs.sqlite3")
+        self.lease_seconds = lease_seconds or float(os.getenv("JOB_LEASE_SECONDS", "60"))
+        self.max_attempts = max_attempts or int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Autocommit mode; transactions are opened explicitly where needed.
+        # A busy timeout lets concurrent writers from other processes wait their turn.
+        self._conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            # WAL lets readers run alongside the single writer
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def enqueue(self, kind: str, payload: dict, dedupe_key: Optional[str] = None) -> tuple:
+        """
+        Add a job.
+
+        Args:
+            kind (str): Job type; workers pick the kinds they have handlers for
+            payload (dict): JSON-serializable job parameters
+            dedupe_key (str, optional): At most one unfinished job per key
+
+        Returns:
+            tuple: (QueuedJob, created); when the dedupe key is taken, the unfinished job
+                holding it and False
+        """
+        job = QueuedJob(job_id=uuid.uuid4().hex[:12], kind=kind, payload=payload,
+                        max_attempts=self.max_attempts, dedupe_key=dedupe_key)
+        with self._lock:
+            try:
+                self._conn.execute(
+                    "INSERT INTO jobs (id, kind, payload, dedupe_key, state, max_attempts, created_at) "
+                    "VALUES (?, ?, ?, ?, 'queued', ?, ?)",
+                    (job.job_id, kind, json.dumps(payload), dedupe_key, job.max_attempts, job.created_at)
+                )
+            except sqlite3.IntegrityError:
+                row = self._conn.execute(
+                    "SELECT * FROM jobs WHERE dedupe_key = ? AND state IN ('queued', 'leased')", (dedupe_key,)
+                ).fetchone()
+                if row is not None:
+                    return QueuedJob.from_row(row), False
+                raise
+        logger.info(f"Enqueued {kind} job {job.job_id}")
+        return job, True
+
+    def lease(self, worker_id: str, kinds: list) -> Optional[QueuedJob]:
+        """
+        Take the oldest available job of the given kinds.
+
+        Jobs whose lease has expired (their worker died or hung) are available
+        again until they run out of attempts.
+
+        Args:
+            worker_id (str): Identifies the leasing worker
+            kinds (list): Job kinds the worker handles
+
+        Returns:
+            QueuedJob or None if there is no work
+        """
+        now = time.time()
+        placeholders = ', '.join('?' for _ in kinds)
+        with self._lock:
+            # BEGIN IMMEDIATE takes the write lock up front, so two workers can never lease the same job
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                abandoned = self._conn.execute(
+                    "UPDATE jobs SET state = 'failed', finished_at = ?, error = 'abandoned by its workers' "
+                    "WHERE state = 'leased' AND lease_expires < ? AND attempts >= max_attempts",
+                    (now, now)
+                ).rowcount
+                row = self._conn.execute(
+                    f"SELECT * FROM jobs WHERE kind IN ({placeholders}) "
+                    "AND (state = 'queued' OR (state = 'leased' AND lease_expires < ?)) "
+                    "ORDER BY created_at LIMIT 1",
+                    (*kinds, now)
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE jobs SET state = 'leased', worker_id = ?, lease_expires = ?, "
+                        "attempts = attempts + 1, started_at = ? WHERE id = ?",
+                        (worker_id, now + self.lease_seconds, now, row['id'])
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+        if abandoned:
+            logger.warning(f"Gave up on {abandoned} jobs whose workers kept disappearing")
+        if row is None:
+            return None
+
+        job = QueuedJob.from_row(row)
+        if job.state == 'leased':
+            logger.warning(f"Retrying job {job.job_id}: worker {job.worker_id} stopped heartbeating")
+        job.state = 'leased'
+        job.worker_id = worker_id
+        job.attempts += 1
+        job.started_at = now
+        job.lease_expires = now + self.lease_seconds
+        return job
+
+    def heartbeat(self, job: QueuedJob) -> bool:
+        """
+        Extend a job's lease.
+
+        Returns:
+            bool: False if the lease was lost (it expired and another worker took the job)
+        """
+        lease_expires = time.time() + self.lease_seconds
+        with self._lock:
+            updated = self._conn.execute(
+                "UPDATE jobs SET lease_expires = ? WHERE id = ? AND worker_id = ? AND state = 'leased'",
+                (lease_expires, job.job_id, job.worker_id)
+            ).rowcount
+        if updated:
+            job.lease_expires = lease_expires
+        return bool(updated)
+
+    def complete(self, job: QueuedJob) -> bool:
+        """Mark a leased job done; returns False if the lease was lost."""
+        return self._finish(job, 'done', None)
+
+    def fail(self, job: QueuedJob, error: str) -> bool:
+        """Mark a leased job failed; returns False if the lease was lost."""
+        return self._finish(job, 'failed', error)
+
+    def release(self, job: QueuedJob) -> bool:
+        """Hand a leased job back unfinished (e.g. on shutdown), without using up an attempt."""
+        with self._lock:
+            updated = self._conn.execute(
+                "UPDATE jobs SET state = 'queued', worker_id = NULL, lease_expires = NULL, "
+                "attempts = MAX(attempts - 1, 0) WHERE id = ? AND worker_id = ? AND state = 'leased'",
+                (job.job_id, job.worker_id)
+            ).rowcount
+        return bool(updated)
+
+    def _finish(self, job: QueuedJob, state: str, error: Optional[str]) -> bool:
+        finished_at = time.time()
+        with self._lock:
+            updated = self._conn.execute(
+                "UPDATE jobs SET state = ?, finished_at = ?, error = ?, lease_expires = NULL "
+                "WHERE id = ? AND worker_id = ? AND state = 'leased'",
+                (state, finished_at, error, job.job_id, job.worker_id)
+            ).rowcount
+        if updated:
+            job.state = state
+            job.finished_at = finished_at
+            job.error = error
+        else:
+            logger.warning(f"Job {job.job_id} finished after its lease was lost; another worker has it")
+        return bool(updated)
+
+    def update_payload(self, dedupe_key: str, changes: dict) -> bool:
+        """
+        Merge changes into the payload of the unfinished job holding a dedupe key.
+
+        Lets a handler record progress that a retry on another worker must see.
+
+        Returns:
+            bool: False if no unfinished job holds the key
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT id, payload FROM jobs WHERE dedupe_key = ? AND state IN ('queued', 'leased')",
+                    (dedupe_key,)
+                ).fetchone()
+                if row is not None:
+                    payload = json.loads(row['payload'])
+                    payload.update(changes)
+                    self._conn.execute("UPDATE jobs SET payload = ? WHERE id = ?", (json.dumps(payload), row['id']))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return row is not None
+
+    def get(self, job_id: str) -> Optional[QueuedJob]:
+        """Look up a job by ID."""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return QueuedJob.from_row(row) if row is not None else None
+
+    def find_unfinished(self, dedupe_key: str) -> Optional[QueuedJob]:
+        """The queued or leased job holding a dedupe key, if any."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM jobs WHERE dedupe_key = ? AND state IN ('queued', 'leased')", (dedupe_key,)
+            ).fetchone()
+        return QueuedJob.from_row(row) if row is not None else None
+
+    def jobs(self, state: Optional[str] = None, kind: Optional[str] = None) -> list:
+        """
+        List jobs, oldest first.
+
+        Args:
+            state (str, optional): Only jobs in this state
+            kind (str, optional): Only jobs of this kind
+
+        Returns:
+            list: QueuedJob objects
+        """
+        conditions, params = [], []
+        if state is not None:
+            conditions.append("state = ?")
+            params.append(state)
+        if kind is not None:
+            conditions.append("kind = ?")
+            params.append(kind)
+        query = "SELECT * FROM jobs"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        with self._lock:
+            rows = self._conn.execute(f"{query} ORDER BY created_at", params).fetchall()
+        return [QueuedJob.from_row(row) for row in rows]
+
+    def counts(self, kind: Optional[str] = None) -> dict:
+        """
+        Number of jobs per state.
+
+        Args:
+            kind (str, optional): Only count jobs of this kind
+
+        Returns:
+            dict: state -> count (queued, leased, done, failed)
+        """
+        query = "SELECT state, COUNT(*) AS n FROM jobs"
+        params = ()
+        if kind is not None:
+            query += " WHERE kind = ?"
+            params = (kind,)
+        with self._lock:
+            rows = self._conn.execute(f"{query} GROUP BY state", params).fetchall()
+        counts = {'queued': 0, 'leased': 0, 'done': 0, 'failed': 0}
+        counts.update({row['state']: row['n'] for row in rows})
+        return counts
+
+    def purge(self, older_than_seconds: float) -> int:
+        """
+        Delete finished jobs.
+
+        Args:
+            older_than_seconds (float): Keep jobs finished more recently than this
+
+        Returns:
+            int: Number of jobs deleted
+        """
+        cutoff = time.time() - older_than_seconds
+        with self._lock:
+            deleted = self._conn.execute(
+                "DELETE FROM jobs WHERE state IN ('done', 'failed') AND finished_at < ?", (cutoff,)
+            ).rowcount
+        if deleted:
+            logger.info(f"Purged {deleted} finished jobs from the queue")
+        return deleted
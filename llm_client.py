@@ -0,0 +1,409 @@
+"""
+LLM Client Module
+
+This module provides a shared, resilient client for the OpenRouter chat completions API.
+It keeps pooled keep-alive connections, enforces per-request deadlines, retries transient
+failures with jittered exponential backoff, and stops calling the provider while it is down.
+"""
+import os
+import json
+import math
+import time
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import requests
+from requests.adapters import HTTPAdapter
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# HTTP statuses that are worth retrying (rate limits and provider-side errors)
+RETRYABLE_STATUSES = {408, 409, 425, 429, 500, 502, 503, 504}
+
+
+class LLMError(Exception):
+    """Raised when a chat completion could not be obtained."""
+
+
+class CircuitOpenError(LLMError):
+    """Raised when the circuit breaker is open and calls are rejected immediately."""
+
+
+class CircuitBreaker:
+    """
+    Simple three-state circuit breaker.
+
+    closed -> open after `failure_threshold` consecutive failures,
+    open -> half-open after `reset_timeout` seconds,
+    half-open -> closed on the first success, or back to open on failure.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._half_open_probe = False
+        self._lock = threading.Lock()
+
+    def allow_request(self):
+        """
+        Check whether a call may go through.
+
+        Returns:
+            bool: True if the call is allowed, False if it should fail fast
+        """
+        with self._lock:
+            if self.state == "closed":
+                return True
+
+            if self.state == "open":
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    return False
+                # Let exactly one probe request through
+                self.state = "half-open"
+                self._half_open_probe = False
+
+            if self._half_open_probe:
+                return False
+            self._half_open_probe = True
+            return True
+
+    def record_success(self):
+        """Record a successful call and close the circuit."""
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._half_open_probe = False
+
+    def record_failure(self):
+        """Record a failed call and open the circuit if needed."""
+        with self._lock:
+            self.failures += 1
+            if self.state == "half-open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    logger.warning(f"Circuit breaker opened after {self.failures} failures")
+                self.state = "open"
+                self.opened_at = time.monotonic()
+                self._half_open_probe = False
+
+    def release_probe(self):
+        """
+        Give back a half-open probe slot without recording an outcome.
+
+        Called when a call ends in a way that says nothing about the provider's
+        health (for example the caller abandoning a stream), so the next call may probe.
+        """
+        with self._lock:
+            self._half_open_probe = False
+
+
+def _close_response(future):
+    """Close the response of a finished hedge future, ignoring failed requests."""
+    try:
+        future.result().close()
+    except Exception:
+        pass
+
+
+class LLMClient:
+    """Pooled, retrying OpenRouter client shared by all LLM calls."""
+
+    def __init__(self, api_key=None, api_url="https://openrouter.ai/api/v1/chat/completions",
+                 connect_timeout=5.0, read_timeout=45.0, deadline=90.0,
+                 max_retries=3, backoff_base=0.5, backoff_max=8.0,
+                 hedge_after=None, pool_size=10):
+        """
+        Initialize the client.
+
+        Args:
+            api_key (str): OpenRouter API key (defaults to OPENROUTER_API_KEY)
+            api_url (str): Chat completions endpoint
+            connect_timeout (float): Seconds to wait for a connection
+            read_timeout (float): Seconds to wait for response data
+            deadline (float): Total seconds allowed for one completion, retries included
+            max_retries (int): Retries after the first attempt on retryable errors
+            backoff_base (float): Base delay in seconds for exponential backoff
+            backoff_max (float): Maximum delay in seconds between retries
+            hedge_after (float): If set, send a second identical request after this
+                many seconds without a response and use whichever finishes first
+            pool_size (int): Number of pooled keep-alive connections
+        """
+        self.api_key = api_key or os.getenv("OPENROUTER_API_KEY")
+        self.api_url = api_url
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge_after = hedge_after
+
+        # One breaker per model, so a failing model does not block its fallbacks
+        self.breakers = {}
+        self._breakers_lock = threading.Lock()
+
+        # One session with a pooled adapter keeps TLS connections alive between calls
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        # Hedged requests run on a small dedicated pool
+        self._hedge_pool = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="llm-hedge")
+
+    def breaker_for(self, model):
+        """
+        Get the circuit breaker guarding a model.
+
+        Args:
+            model (str): Model name from the request payload
+
+        Returns:
+            CircuitBreaker: The model's breaker
+        """
+        with self._breakers_lock:
+            if model not in self.breakers:
+                self.breakers[model] = CircuitBreaker(
+                    failure_threshold=int(os.getenv("LLM_BREAKER_THRESHOLD", "5")),
+                    reset_timeout=float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+                )
+            return self.breakers[model]
+
+    def _headers(self):
+        """Build request headers."""
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "HTTP-Referer": os.getenv('OPENROUTER_SITE_URL', 'https://github.com'),
+            "Content-Type": "application/json"
+        }
+
+    def _backoff_delay(self, attempt, retry_after=None):
+        """
+        Compute the delay before the next retry using full jitter.
+
+        Args:
+            attempt (int): Zero-based retry number
+            retry_after (str): Value of the Retry-After header, if any
+
+        Returns:
+            float: Seconds to sleep
+        """
+        if retry_after:
+            try:
+                delay = float(retry_after)
+            except ValueError:
+                delay = None
+            # Negative, inf or nan values would make time.sleep fail; fall back to jitter
+            if delay is not None and math.isfinite(delay):
+                return min(max(0.0, delay), self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _post_once(self, payload, timeout):
+        """Send a single request and return the response."""
+        return self.session.post(self.api_url, headers=self._headers(), json=payload, timeout=timeout)
+
+    def _post_hedged(self, payload, timeout):
+        """
+        Send a request and, if it is slow, a duplicate; return the first response.
+
+        Args:
+            payload (dict): Request body
+            timeout (tuple): (connect, read) timeout
+
+        Returns:
+            requests.Response: The first response to arrive
+        """
+        futures = [self._hedge_pool.submit(self._post_once, payload, timeout)]
+        done, _ = wait(futures, timeout=self.hedge_after)
+        if not done:
+            logger.info(f"LLM request slower than {self.hedge_after}s, sending hedged request")
+            futures.append(self._hedge_pool.submit(self._post_once, payload, timeout))
+
+        errors = []
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    response = future.result()
+                except Exception as e:
+                    errors.append(e)
+                    continue
+                # Drop the losing request so its pooled connection is not held until GC
+                for other in futures:
+                    if other is not future and not other.cancel():
+                        other.add_done_callback(_close_response)
+                return response
+        raise errors[0]
+
+    def chat_completion(self, payload, deadline=None):
+        """
+        Send a chat completion request with retries, deadline and circuit breaking.
+
+        Args:
+            payload (dict): OpenRouter request body (model, messages, ...)
+            deadline (float, optional): Overrides the client's total deadline in seconds
+
+        Returns:
+            dict: Parsed JSON response
+
+        Raises:
+            CircuitOpenError: If the provider is considered down
+            LLMError: If no successful response was obtained before the deadline
+        """
+        breaker = self.breaker_for(payload.get('model'))
+        if not breaker.allow_request():
+            raise CircuitOpenError(f"LLM circuit for {payload.get('model')} is open, failing fast")
+        deadline = deadline or self.deadline
+
+        try:
+            return self._chat_completion_attempts(breaker, payload, deadline)
+        finally:
+            # Every exit must free a half-open probe, or the breaker would fail fast forever
+            breaker.release_probe()
+
+    def _chat_completion_attempts(self, breaker, payload, deadline):
+        """Run the retry loop for chat_completion, recording the outcome on the breaker."""
+        start = time.monotonic()
+        last_error = None
+
+        for attempt in range(self.max_retries + 1):
+            remaining = deadline - (time.monotonic() - start)
+            if remaining <= 0:
+                break
+
+            timeout = (self.connect_timeout, min(self.read_timeout, remaining))
+            retry_after = None
+            try:
+                if self.hedge_after is not None:
+                    response = self._post_hedged(payload, timeout)
+                else:
+                    response = self._post_once(payload, timeout)
+
+                if response.status_code in RETRYABLE_STATUSES:
+                    retry_after = response.headers.get("Retry-After")
+                    last_error = LLMError(f"Retryable HTTP {response.status_code} from LLM provider")
+                else:
+                    response.raise_for_status()
+                    try:
+                        result = response.json()
+                    except ValueError as e:
+                        breaker.record_failure()
+                        raise LLMError(f"Malformed response from LLM provider: {str(e)}") from e
+                    breaker.record_success()
+                    return result
+
+            except (requests.ConnectionError, requests.Timeout) as e:
+                last_error = e
+            except requests.HTTPError as e:
+                # Non-retryable HTTP errors (400, 401, ...) are the caller's fault; the provider is up
+                breaker.record_success()
+                raise LLMError(f"LLM request rejected: {str(e)}") from e
+
+            if attempt < self.max_retries:
+                delay = self._backoff_delay(attempt, retry_after)
+                remaining = deadline - (time.monotonic() - start)
+                if delay >= remaining:
+                    break
+                logger.warning(f"LLM request failed ({last_error}), retrying in {delay:.2f}s")
+                time.sleep(delay)
+
+        breaker.record_failure()
+        raise LLMError(f"LLM request failed after retries: {str(last_error)}")
+
+    def stream_chat_completion(self, payload, deadline=None):
+        """
+        Stream a chat completion as server-sent events, yielding text deltas.
+
+        Connection errors and retryable statuses are retried only until the first
+        byte of the body arrives; after that a failure is raised to the caller.
+
+        Args:
+            payload (dict): OpenRouter request body (model, messages, ...)
+            deadline (float, optional): Overrides the client's total deadline for starting the stream
+
+        Yields:
+            str: Pieces of the completion text as they arrive
+
+        Raises:
+            CircuitOpenError: If the provider is considered down
+            LLMError: If the stream could not be started or broke off
+        """
+        breaker = self.breaker_for(payload.get('model'))
+        if not breaker.allow_request():
+            raise CircuitOpenError(f"LLM circuit for {payload.get('model')} is open, failing fast")
+        deadline = deadline or self.deadline
+
+        try:
+            payload = dict(payload, stream=True)
+            start = time.monotonic()
+            last_error = None
+            response = None
+
+            for attempt in range(self.max_retries + 1):
+                remaining = deadline - (time.monotonic() - start)
+                if remaining <= 0:
+                    break
+
+                retry_after = None
+                try:
+                    response = self.session.post(
+                        self.api_url, headers=self._headers(), json=payload, stream=True,
+                        timeout=(self.connect_timeout, min(self.read_timeout, remaining))
+                    )
+                    if response.status_code in RETRYABLE_STATUSES:
+                        retry_after = response.headers.get("Retry-After")
+                        last_error = LLMError(f"Retryable HTTP {response.status_code} from LLM provider")
+                        response.close()
+                        response = None
+                    else:
+                        response.raise_for_status()
+                        break
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    last_error = e
+                except requests.HTTPError as e:
+                    breaker.record_success()
+                    raise LLMError(f"LLM request rejected: {str(e)}") from e
+
+                if attempt < self.max_retries:
+                    delay = self._backoff_delay(attempt, retry_after)
+                    if delay >= deadline - (time.monotonic() - start):
+                        break
+                    logger.warning(f"LLM stream failed to start ({last_error}), retrying in {delay:.2f}s")
+                    time.sleep(delay)
+
+            if response is None:
+                breaker.record_failure()
+                raise LLMError(f"LLM stream failed after retries: {str(last_error)}")
+
+            try:
+                for line in response.iter_lines(decode_unicode=True):
+                    # Blank lines separate events; lines starting with ':' are keep-alive comments
+                    if not line or not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    chunk = json.loads(data)
+                    if chunk.get('error'):
+                        raise LLMError(f"LLM stream error: {chunk['error']}")
+                    choices = chunk.get('choices') or []
+                    if choices:
+                        delta = choices[0].get('delta', {}).get('content')
+                        if delta:
+                            yield delta
+            except (requests.RequestException, ValueError, LLMError) as e:
+                breaker.record_failure()
+                raise LLMError(f"LLM stream broke off: {str(e)}") from e
+            finally:
+                response.close()
+
+            breaker.record_success()
+        finally:
+            # Covers rejected requests, unexpected errors and consumers closing the generator
+            breaker.release_probe()
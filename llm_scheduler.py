@@ -0,0 +1,261 @@
+"""
+LLM Scheduler Module
+
+This module coordinates LLM calls across all users. It enforces a provider-wide
+requests-per-minute and tokens-per-minute budget and hands out call slots using
+weighted fair queuing, so a user with a long queue cannot starve everyone else
+and short jobs are served first.
+"""
+import time
+import heapq
+import logging
+import threading
+import itertools
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from stage_timer import stage
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def estimate_tokens(payload):
+    """
+    Roughly estimate the tokens a chat completion request will consume.
+
+    Args:
+        payload (dict): OpenRouter request body
+
+    Returns:
+        int: Estimated prompt + completion tokens (about 4 characters per token)
+    """
+    prompt_chars = sum(len(message.get('content', '')) for message in payload.get('messages', []))
+    return prompt_chars // 4 + payload.get('max_tokens', 500)
+
+
+class TokenBucket:
+    """Continuously refilling token bucket for a per-minute budget."""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def time_until(self, amount):
+        """
+        Seconds until `amount` can be taken (0 if available now).
+
+        Requests larger than the bucket only need a full bucket, so they cannot block forever.
+        """
+        self._refill()
+        needed = min(amount, self.capacity) - self.tokens
+        return max(0.0, needed / self.rate) if self.rate > 0 else 0.0
+
+    def take(self, amount):
+        """Remove tokens from the bucket (may go negative to carry a debt)."""
+        self._refill()
+        self.tokens -= amount
+
+
+class _Ticket:
+    """A queued request for an LLM call slot."""
+
+    def __init__(self, user_id, cost, finish_tag, start_tag):
+        self.user_id = user_id
+        self.cost = cost
+        self.finish_tag = finish_tag
+        self.start_tag = start_tag
+        self.enqueued_at = time.monotonic()
+        self.actual_tokens = None
+
+    def record_usage(self, usage):
+        """
+        Record the real token usage reported by the provider.
+
+        Args:
+            usage (dict): The `usage` object from the API response, if any
+        """
+        if usage and usage.get('total_tokens'):
+            self.actual_tokens = usage['total_tokens']
+
+
+class LLMScheduler:
+    """Weighted fair-share scheduler for LLM calls across users."""
+
+    def __init__(self, requests_per_minute=60, tokens_per_minute=200000, max_concurrent=4,
+                 stats_max_age=3600.0, stats_max_users=1000):
+        """
+        Initialize the scheduler.
+
+        Args:
+            requests_per_minute (int): Provider-wide request budget
+            tokens_per_minute (int): Provider-wide token budget
+            max_concurrent (int): Maximum number of in-flight calls
+            stats_max_age (float): Forget a user's wait statistics after this many idle seconds
+            stats_max_users (int): Keep wait statistics for at most this many users
+        """
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.max_concurrent = max_concurrent
+
+        self._cond = threading.Condition()
+        self._queue = []  # heap of (finish_tag, seq, ticket)
+        self._seq = itertools.count()
+        self._virtual_time = 0.0
+        self._user_finish = {}
+        self._in_flight = 0
+
+        # Per-user queue wait statistics, least recently used first
+        self.stats_max_age = stats_max_age
+        self.stats_max_users = stats_max_users
+        self._wait_stats = OrderedDict()
+
+    def _enqueue(self, user_id, cost, weight):
+        """Create a ticket with weighted-fair-queuing tags and add it to the heap."""
+        start_tag = max(self._virtual_time, self._user_finish.get(user_id, 0.0))
+        # Shorter jobs get earlier finish tags, so they are served first among equals
+        finish_tag = start_tag + cost / max(weight, 1e-6)
+        self._user_finish[user_id] = finish_tag
+
+        ticket = _Ticket(user_id, cost, finish_tag, start_tag)
+        heapq.heappush(self._queue, (finish_tag, next(self._seq), ticket))
+        return ticket
+
+    def _wait_for_turn(self, ticket):
+        """Block until the ticket is at the head of the queue and the budget allows it."""
+        dispatched = False
+        try:
+            while True:
+                if self._queue[0][2] is ticket and self._in_flight < self.max_concurrent:
+                    delay = max(self.request_bucket.time_until(1), self.token_bucket.time_until(ticket.cost))
+                    if delay <= 0:
+                        heapq.heappop(self._queue)
+                        self.request_bucket.take(1)
+                        self.token_bucket.take(ticket.cost)
+                        self._advance_virtual_time(ticket.start_tag)
+                        self._in_flight += 1
+                        dispatched = True
+                        # The next ticket may be dispatchable as well
+                        self._cond.notify_all()
+                        return
+                    self._cond.wait(timeout=delay)
+                else:
+                    self._cond.wait()
+        finally:
+            if not dispatched:
+                # An interrupted waiter must not stay at the head and block everyone behind it
+                self._remove(ticket)
+
+    def _advance_virtual_time(self, start_tag):
+        """Move virtual time forward and forget users whose work it has caught up with."""
+        if start_tag <= self._virtual_time:
+            return
+        self._virtual_time = start_tag
+        # A finish tag at or before virtual time no longer affects a user's next start tag
+        caught_up = [user_id for user_id, finish in self._user_finish.items() if finish <= start_tag]
+        for user_id in caught_up:
+            del self._user_finish[user_id]
+
+    def _forget_if_idle(self):
+        """
+        Once nothing is queued or in flight, jump virtual time past every finish tag.
+
+        Start tags are max(virtual time, user's last finish tag), so this gives the
+        same tags as before while the per-user table starts empty again.
+        """
+        if self._queue or self._in_flight or not self._user_finish:
+            return
+        self._virtual_time = max(self._virtual_time, max(self._user_finish.values()))
+        self._user_finish.clear()
+
+    def _remove(self, ticket):
+        """Drop a ticket that gave up waiting."""
+        self._queue = [entry for entry in self._queue if entry[2] is not ticket]
+        heapq.heapify(self._queue)
+        self._forget_if_idle()
+        self._cond.notify_all()
+
+    def _record_wait(self, user_id, waited):
+        """Update per-user wait statistics."""
+        now = time.monotonic()
+        stats = self._wait_stats.setdefault(user_id, {'calls': 0, 'total_wait': 0.0, 'max_wait': 0.0})
+        stats['calls'] += 1
+        stats['total_wait'] += waited
+        stats['max_wait'] = max(stats['max_wait'], waited)
+        stats['last_call'] = now
+        self._wait_stats.move_to_end(user_id)
+        self._prune_wait_stats(now)
+
+    def _prune_wait_stats(self, now):
+        """Drop statistics of users who have been idle too long, and the oldest beyond the cap."""
+        while self._wait_stats:
+            user_id, stats = next(iter(self._wait_stats.items()))
+            if len(self._wait_stats) <= self.stats_max_users and now - stats['last_call'] <= self.stats_max_age:
+                break
+            del self._wait_stats[user_id]
+
+    @contextmanager
+    def slot(self, user_id, estimated_tokens, weight=1.0):
+        """
+        Wait for a fair-share slot and hold it for the duration of one LLM call.
+
+        Args:
+            user_id: Key used for fair sharing (normally the Telegram user ID)
+            estimated_tokens (int): Expected token usage of the call
+            weight (float): Relative share; lower values give lower priority
+
+        Yields:
+            _Ticket: Use `record_usage` to reconcile the token budget with real usage
+        """
+        with stage('llm_wait'), self._cond:
+            ticket = self._enqueue(user_id, estimated_tokens, weight)
+            self._wait_for_turn(ticket)
+            waited = time.monotonic() - ticket.enqueued_at
+            self._record_wait(user_id, waited)
+
+        if waited > 1.0:
+            logger.info(f"LLM call for user {user_id} waited {waited:.1f}s in the scheduler queue")
+
+        try:
+            yield ticket
+        finally:
+            with self._cond:
+                self._in_flight -= 1
+                if ticket.actual_tokens is not None:
+                    # Refund or charge the difference between the estimate and real usage
+                    self.token_bucket.take(ticket.actual_tokens - ticket.cost)
+                self._forget_if_idle()
+                self._cond.notify_all()
+
+    def get_wait_stats(self):
+        """
+        Get queue wait statistics per user.
+
+        Returns:
+            dict: user_id -> {'calls', 'avg_wait', 'max_wait', 'queued'}, for users with
+                calls in the last `stats_max_age` seconds or calls still queued
+        """
+        with self._cond:
+            self._prune_wait_stats(time.monotonic())
+            queued = {}
+            for _, _, ticket in self._queue:
+                queued[ticket.user_id] = queued.get(ticket.user_id, 0) + 1
+
+            result = {}
+            for user_id in set(self._wait_stats) | set(queued):
+                stats = self._wait_stats.get(user_id, {'calls': 0, 'total_wait': 0.0, 'max_wait': 0.0})
+                result[user_id] = {
+                    'calls': stats['calls'],
+                    'avg_wait': stats['total_wait'] / stats['calls'] if stats['calls'] else 0.0,
+                    'max_wait': stats['max_wait'],
+                    'queued': queued.get(user_id, 0)
+                }
+            return result
@@ -2,6 +2,7 @@
 triage.fm - A Telegram bot for generating podcast scripts and audio from read-it-later content
 """
 import os
+import asyncio
 import logging
 import textwrap
 from datetime import datetime
@@ -15,6 +16,18 @@ from content_processor import ContentProcessor
 from script_generator import ScriptGenerator
 from database import Database
 from tts_processor import TTSProcessor
+from episode_builder import EpisodeBuilder
+from pregeneration import PreGenerator
+from janitor import Janitor
+from generation_jobs import Admission, GenerationJob, GenerationJobManager, format_wait
+from job_queue import JobQueue
+from digest_scheduler import DigestScheduler
+from webhook import run_webhook
+import metrics
+from metrics import span, timed, trace
+import profiling
+from profiling import profile, profiled
+from tts_engines import ENGINES, get_engine
 
 # Set up logging
 logging.basicConfig(
@@ -31,6 +44,58 @@ db = Database()
 content_processor = ContentProcessor()
 script_generator = ScriptGenerator()
 tts_processor = TTSProcessor()
+# Opt-in per user (/pregen): items are pre-generated in the background as they arrive
+pregenerator = PreGenerator(script_generator, tts_processor)
+episode_builder = EpisodeBuilder(script_generator, tts_processor, pregenerator=pregenerator)
+janitor = Janitor.from_env(
+    audio_dir=tts_processor.audio_dir,
+    cache_dir=tts_processor.audio_cache.cache_dir,
+    jobs_dir=episode_builder.jobs_dir,
+    pregen_dir=pregenerator.pregen_dir
+)
+# /generate runs as a background job; run_generation_job is defined below
+generation_jobs = GenerationJobManager(lambda job: run_generation_job(job))
+# Daily digests are built off-peak and delivered at each subscriber's chosen time
+digest_scheduler = DigestScheduler(
+    db,
+    build=lambda job: build_digest(job),
+    deliver=lambda job, built: deliver_digest(job, built),
+    is_busy=lambda: generation_busy(),
+    is_user_busy=lambda user_id: user_generation_busy(user_id)
+)
+# With JOB_BACKEND=queue, content fetching and /generate run in worker processes
+# (worker.py) that take their jobs from a shared durable queue
+job_queue = JobQueue() if os.getenv("JOB_BACKEND", "local").lower() == "queue" else None
+# Serves /metrics when METRICS_PORT is set; started in post_init
+metrics_server = None
+
+# Gauges read when the metrics endpoint is scraped
+metrics.gauge(
+    'triagefm_storage_bytes', 'Bytes in each janitor-managed directory as of the last sweep',
+    lambda: {(name,): usage['bytes'] for name, usage in janitor.get_usage().items()}, labels=('directory',)
+)
+metrics.gauge(
+    'triagefm_storage_files', 'Files in each janitor-managed directory as of the last sweep',
+    lambda: {(name,): usage['files'] for name, usage in janitor.get_usage().items()}, labels=('directory',)
+)
+metrics.gauge(
+    'triagefm_generation_jobs', 'Generation jobs in this process',
+    lambda: {('running',): generation_jobs.running_count(), ('queued',): generation_jobs.queued_count()},
+    labels=('state',)
+)
+metrics.gauge(
+    'triagefm_llm_queued_calls', 'LLM calls waiting for a scheduler slot',
+    lambda: sum(stats['queued'] for stats in script_generator.scheduler.get_wait_stats().values())
+)
+metrics.gauge(
+    'triagefm_llm_max_wait_seconds', 'Longest scheduler wait of any recent LLM call',
+    lambda: max((stats['max_wait'] for stats in script_generator.scheduler.get_wait_stats().values()), default=0.0)
+)
+if job_queue:
+    metrics.gauge(
+        'triagefm_job_queue_jobs', 'Jobs in the shared job queue',
+        lambda: {(state,): count for state, count in job_queue.counts().items()}, labels=('state',)
+    )
 
 # Constants
 MAX_MESSAGE_LENGTH = 4000  # Telegram's limit is 4096, but we'll use a smaller value to be safe
@@ -52,10 +117,20 @@ HELP_MESSAGE = (
     "/help - Show this help message\n"
     "/generate - Create a podcast from your content\n"
     "/queue - See what's in your content queue\n"
-    "/clear - Clear your content queue"
+    "/clear - Clear your content queue\n"
+    "/engine - Show or change the voice engine\n"
+    "/pregen - Prepare items in the background as they arrive (on/off)\n"
+    "/schedule HH:MM - Get a daily podcast of your queue at that time\n"
+    "/unschedule - Stop the daily podcast"
 )
 
 GENERATING_MESSAGE = "I'm creating your audio podcast now. This may take a minute..."
+GENERATING_SCRIPT_MESSAGE = "✍️ Writing the script... ({done}/{total} items)"
+GENERATING_AUDIO_MESSAGE = "🎧 Finishing the audio..."
+SENDING_AUDIO_MESSAGE = "📤 Sending your podcast..."
+ALREADY_GENERATING_MESSAGE = "Your podcast is already being created, I'll send it as soon as it's ready.\n{progress}"
+GENERATION_QUEUED_MESSAGE = "Lots of podcasts are being created right now. Yours is queued and should start in {wait}."
+GENERATION_BUSY_MESSAGE = "I'm very busy right now. Please try /generate again in {wait}."
 EMPTY_QUEUE_MESSAGE = "You don't have any new content to process. Send me some links or documents first!"
 ERROR_MESSAGE = "Sorry, I encountered an error while generating your podcast. Please try again later."
 AUDIO_ERROR_MESSAGE = "Sorry, I couldn't generate the audio podcast at this time. Please try again later."
@@ -69,6 +144,17 @@ UNKNOWN_CONTENT_TYPE_MESSAGE = "Sorry, I can't process this type of content yet.
 COMMAND_CORRECTION_MESSAGE = "It looks like you're trying to use a command. Please use /{command} instead."
 PODCAST_SENT_MESSAGE = "Here's your podcast! Enjoy listening."
 SCRIPT_PART_MESSAGE = "Script (Part {part_number}/{total_parts}):"
+ENGINE_STATUS_MESSAGE = "Current voice engine: {current}\nAvailable engines: {available}\n\nUse /engine <name> to switch, or /engine default."
+ENGINE_SET_MESSAGE = "Voice engine set to {engine}."
+SCHEDULE_USAGE_MESSAGE = "Use /schedule HH:MM (24-hour clock, {timezone}) to get a daily podcast of your queue."
+SCHEDULE_SET_MESSAGE = "Daily podcast scheduled for {time} {timezone}. The first one arrives {when}."
+SCHEDULE_STATUS_MESSAGE = "Your daily podcast arrives at {time} {timezone}. Use /unschedule to stop it."
+UNSCHEDULED_MESSAGE = "Your daily podcast has been stopped."
+NOT_SCHEDULED_MESSAGE = "You don't have a daily podcast scheduled."
+DIGEST_READY_MESSAGE = "🌅 Here's your daily podcast!"
+PREGEN_STATUS_MESSAGE = "Background preparation is {state}. Use /pregen on or /pregen off to change it."
+PREGEN_SET_MESSAGE = "Background preparation is now {state}."
+ENGINE_UNKNOWN_MESSAGE = "Unknown voice engine '{engine}'. Available engines: {available}"
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Send a message when the command /start is issued."""
@@ -114,117 +200,361 @@ async def send_long_message(update: Update, text: str) -> None:
 
         await update.message.reply_text(message_text, parse_mode=ParseMode.HTML)
 
+def get_user_engine(user_id):
+    """Get the user's chosen TTS engine, or None for the deployment default."""
+    engine_name = db.get_user_tts_engine(user_id)
+    if engine_name:
+        try:
+            return get_engine(engine_name)
+        except ValueError as e:
+            logger.warning(f"Ignoring TTS engine preference for user {user_id}: {str(e)}")
+    return None
+
 async def generate_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Generate a podcast from the user's content queue."""
+    """Queue a podcast generation job for the user's content queue."""
     user_id = update.effective_user.id
 
     # Check if there's content in the queue
-    content_queue = db.get_unprocessed_content(user_id)
+    content_queue = await asyncio.to_thread(db.get_unprocessed_content, user_id)
     if not content_queue:
         await update.message.reply_text(EMPTY_QUEUE_MESSAGE)
         return
 
-    # Send generating message
-    status_message = await update.message.reply_text(GENERATING_MESSAGE)
+    # A daily digest already being built from this queue is sent now instead of at its time
+    if await digest_scheduler.request_now(user_id):
+        await update.message.reply_text(ALREADY_GENERATING_MESSAGE.format(progress="").strip())
+        return
+
+    # One job per user; under heavy load new jobs are deferred or turned away
+    admission = await admit_queued_generation(user_id) if job_queue else generation_jobs.admit(user_id)
+    if admission.decision == 'attach':
+        progress = admission.job.progress if admission.job else ""
+        await update.message.reply_text(ALREADY_GENERATING_MESSAGE.format(progress=progress).strip())
+        return
+    if admission.decision == 'reject':
+        await update.message.reply_text(GENERATION_BUSY_MESSAGE.format(wait=format_wait(admission.estimated_wait)))
+        return
+
+    # Send generating message; the job edits it to show progress
+    if admission.decision == 'defer':
+        status_text = GENERATION_QUEUED_MESSAGE.format(wait=format_wait(admission.estimated_wait))
+    else:
+        status_text = GENERATING_MESSAGE
+    status_message = await update.message.reply_text(status_text)
+
+    if job_queue:
+        # A worker process picks the job up and reports progress on the status message
+        _, created = await asyncio.to_thread(job_queue.enqueue, 'generate', {
+            'user_id': user_id,
+            'chat_id': update.effective_chat.id,
+            'status_message_id': status_message.message_id,
+            'progress': status_text
+        }, dedupe_key=f"generate:{user_id}")
+        if not created:
+            await status_message.edit_text(ALREADY_GENERATING_MESSAGE.format(progress="").strip())
+        return
+
+    # The job runs in the background so the bot keeps answering other users
+    job = GenerationJob(
+        user_id=user_id,
+        chat_id=update.effective_chat.id,
+        bot=context.bot,
+        content_items=content_queue,
+        status_message_id=status_message.message_id,
+        progress=status_text
+    )
+    if generation_jobs.submit(job) is not job:
+        # Another /generate got in first while the status message was being sent
+        await status_message.edit_text(ALREADY_GENERATING_MESSAGE.format(progress="").strip())
+
+async def generation_busy() -> bool:
+    """Whether interactive /generate jobs are waiting (digest builds yield to them)."""
+    if generation_jobs.queued_count() > 0:
+        return True
+    return bool(job_queue and (await asyncio.to_thread(job_queue.counts, 'generate'))['queued'])
+
+async def user_generation_busy(user_id) -> bool:
+    """Whether the user has a /generate job in flight, here or in the job queue."""
+    if generation_jobs.jobs_for_user(user_id):
+        return True
+    return bool(job_queue and await asyncio.to_thread(job_queue.find_unfinished, f"generate:{user_id}"))
+
+async def admit_queued_generation(user_id) -> Admission:
+    """Admission control for /generate against the shared job queue (JOB_BACKEND=queue)."""
+    in_flight = await asyncio.to_thread(job_queue.find_unfinished, f"generate:{user_id}")
+    if in_flight:
+        # The job's progress is tracked by its worker, on the status message
+        return Admission('attach')
+
+    counts = await asyncio.to_thread(job_queue.counts, 'generate')
+    queued = counts['queued']
+    # Every busy worker stands for one slot; assume at least one is running
+    estimated_wait = 0.0
+    if queued:
+        estimated_wait = (queued // max(counts['leased'], 1) + 0.5) * generation_jobs.average_job_seconds
+    if queued >= generation_jobs.max_queue_depth:
+        logger.warning(f"Rejecting generation job for user {user_id}: {queued} jobs queued")
+        return Admission('reject', estimated_wait=estimated_wait)
+    if queued >= generation_jobs.defer_queue_depth:
+        return Admission('defer', estimated_wait=estimated_wait)
+    return Admission('accept', estimated_wait=estimated_wait)
+
+async def run_generate_job(bot, payload: dict) -> None:
+    """
+    Worker handler for a queued /generate: run the generation job in this process.
+
+    Raises:
+        RuntimeError: If the job failed (the user has been told already)
+    """
+    user_id = payload['user_id']
+    # The queue may have changed while the job waited; the database lock is shared
+    # with other processes, so it is taken off the worker's event loop
+    content_queue = await asyncio.to_thread(db.get_unprocessed_content, user_id)
+    job = GenerationJob(
+        user_id=user_id,
+        chat_id=payload['chat_id'],
+        bot=bot,
+        content_items=content_queue,
+        status_message_id=payload.get('status_message_id'),
+        progress=payload.get('progress', ''),
+        summary_sent=payload.get('summary_sent', False)
+    )
+    if not content_queue:
+        await job.delete_status_message()
+        return
+
+    job = generation_jobs.submit(job)
+    await job.task
+    if job.state != 'done':
+        raise RuntimeError(f"Generation job {job.job_id} {job.state}")
+
+async def run_generation_job(job: GenerationJob) -> None:
+    """Build the episode for a queued job and deliver it."""
+    # The trace logs where the job's time went, across the worker threads; flagged
+    # users' jobs are also profiled (PROFILE_USER_IDS)
+    with profile('generate', job.user_id, job_id=job.job_id), \
+            trace('generate', user_id=job.user_id, job_id=job.job_id, items=len(job.content_items)):
+        # The summary only needs the content items, so it is built while the episode
+        # is generated and sent as soon as it is ready; a retried job already sent it
+        summary_task = None if job.summary_sent else asyncio.create_task(send_summary(job))
+        try:
+            _, episode, audio_path = await build_episode(job)
+
+            # The summary always arrives before the audio
+            if summary_task:
+                await summary_task
+            await deliver_episode(job, episode, audio_path)
+        except Exception as e:
+            if summary_task:
+                summary_task.cancel()
+            logger.error(f"Error generating podcast: {str(e)}")
+            await job.bot.send_message(job.chat_id, ERROR_MESSAGE)
+            await job.delete_status_message()
+            raise
+        except asyncio.CancelledError:
+            if summary_task:
+                summary_task.cancel()
+            raise
+
+async def build_episode(job: GenerationJob):
+    """
+    Generate the script and audio of a job's episode on the job worker threads.
+
+    Returns:
+        tuple: (script, episode build, audio path or None if the audio failed)
+    """
+    user_id = job.user_id
+    content_queue = job.content_items
+
+    # The build is checkpointed per section, so a retry after a failure resumes it.
+    # Speech synthesis starts on each speaker turn as soon as the LLM finishes it.
+    engine = await job.run_blocking(get_user_engine, user_id)
+    episode = episode_builder.start(user_id, content_queue, engine=engine)
+
+    # Generate script
+    await job.report(GENERATING_SCRIPT_MESSAGE.format(done=0, total=len(content_queue)))
+    script = await job.run_blocking(
+        episode.generate_script,
+        on_progress=lambda done, total: job.report_threadsafe(
+            # Progress counts content items, not the fixed intro/outro sections
+            GENERATING_SCRIPT_MESSAGE.format(done=max(0, min(done - 1, total - 2)), total=total - 2)
+        )
+    )
+
+    await job.run_blocking(save_scripts, user_id, script)
 
     try:
-        # Generate script
-        formatted_script, plain_script, tts_script = script_generator.generate_script(user_id, content_queue)
-
-        # Save scripts to files
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        script_dir = f"data/scripts/{user_id}"
-        os.makedirs(script_dir, exist_ok=True)
-
-        # Save all versions of the script
-        with open(f"{script_dir}/formatted_{timestamp}.html", 'w') as f:
-            f.write(formatted_script)
-        with open(f"{script_dir}/plain_{timestamp}.txt", 'w') as f:
-            f.write(plain_script)
-        with open(f"{script_dir}/tts_{timestamp}.txt", 'w') as f:
-            f.write(tts_script)
-
-        audio_generated = False
+        # Wait for the remaining turns and encode the episode
+        await job.report(GENERATING_AUDIO_MESSAGE)
+        audio_path = await job.run_blocking(episode.finish_audio)
+    except Exception as e:
+        logger.error(f"Error generating audio: {str(e)}")
+        audio_path = None
+
+    return script, episode, audio_path
+
+def save_scripts(user_id, script) -> None:
+    """Archive all versions of a script under data/scripts/{user_id}/."""
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    script_dir = f"data/scripts/{user_id}"
+    os.makedirs(script_dir, exist_ok=True)
+
+    with open(f"{script_dir}/formatted_{timestamp}.html", 'w') as f:
+        f.write(script.to_html())
+    with open(f"{script_dir}/plain_{timestamp}.txt", 'w') as f:
+        f.write(script.to_plain())
+    with open(f"{script_dir}/tts_{timestamp}.txt", 'w') as f:
+        f.write(script.to_tts_text())
+
+async def deliver_episode(job: GenerationJob, episode, audio_path) -> None:
+    """Send a job's audio, then mark its content as processed."""
+    user_id = job.user_id
+    content_queue = job.content_items
+
+    audio_generated = False
+    if audio_path:
+        await job.report(SENDING_AUDIO_MESSAGE)
         try:
-            # Generate and send only the audio
-            audio_path = tts_processor.generate_audio(tts_script)
-
-            with open(audio_path, 'rb') as audio_file:
-                await update.message.reply_audio(
-                    audio=audio_file,
-                    caption="Your podcast is ready! Enjoy listening.",
-                    title=f"triage.fm podcast - {datetime.now().strftime('%Y-%m-%d')}"
-                )
+            with span('upload'), open(audio_path, 'rb') as audio_file:
+                if tts_processor.output_format.voice_note:
+                    # Opus/OGG plays inline as a voice note
+                    await job.bot.send_voice(
+                        job.chat_id,
+                        voice=audio_file,
+                        caption="Your podcast is ready! Enjoy listening."
+                    )
+                else:
+                    await job.bot.send_audio(
+                        job.chat_id,
+                        audio=audio_file,
+                        caption="Your podcast is ready! Enjoy listening.",
+                        title=f"triage.fm podcast - {datetime.now().strftime('%Y-%m-%d')}"
+                    )
             audio_generated = True
+        except Exception as e:
+            logger.error(f"Error sending audio: {str(e)}")
 
-            # Clean up the audio file after sending
-            try:
-                os.remove(audio_path)
-                logger.info(f"Deleted temporary audio file: {audio_path}")
-            except Exception as e:
-                logger.error(f"Error deleting audio file: {str(e)}")
-
+        # Clean up the audio file after sending
+        try:
+            os.remove(audio_path)
+            logger.info(f"Deleted temporary audio file: {audio_path}")
         except Exception as e:
-            logger.error(f"Error generating audio: {str(e)}")
-            warning = ("Note: Due to high server load, the audio version couldn't be generated this time. "
-                      "You can try generating it again in a few minutes using the /generate command.")
-            await update.message.reply_text(warning)
-
-        # Generate content summaries with ADHD-friendly formatting
-        summary_message = "🎙️ PODCAST SUMMARY\n━━━━━━━━━━━━━━━\n\n"
-        for i, item in enumerate(content_queue, 1):
-            title = item.get('title', 'Untitled')
-            author = item.get('author', 'Unknown Author')
-            source_url = item.get('source_url', '')
-            message_id = item.get('message_id', '')
-
-            # Generate a focused 1-2 sentence summary for each item
-            try:
-                summary = script_generator.generate_content_summary(item)
-            except Exception:
-                content = item.get('content', '')
-                summary = content[:200] + '...' if len(content) > 200 else content
-
-            # Format the item link
-            if source_url:
-                link = source_url
-            elif message_id:
-                link = f"t.me/c/{abs(user_id)}/{message_id}"
-            else:
-                link = "No link available"
-
-            # Create visually structured item summary with emojis and clear sections
-            summary_message += f"📎 ITEM {i}\n"
-            summary_message += f"━━━━━━━━━━━━━━━\n"
-            summary_message += f"📗 Title: {title}\n"
-            summary_message += f"✍️ Author: {author}\n"
-            summary_message += f"💡 Insights: {summary}\n"
-            summary_message += f"🔗 Link: {link}\n\n"
-
-        # Add audio status to summary if there was an error
-        if not audio_generated:
-            summary_message += "\n⚠️ Audio version not available at this time. Try /generate again in a few minutes."
-
-        # Send summary message
-        await update.message.reply_text(summary_message, disable_web_page_preview=True)
-
-        # Mark content as processed
+            logger.error(f"Error deleting audio file: {str(e)}")
+
+    if not audio_generated:
+        warning = ("Note: Due to high server load, the audio version couldn't be generated this time. "
+                  "You can try generating it again in a few minutes using the /generate command.")
+        await job.bot.send_message(job.chat_id, warning)
+
+    # Mark content as processed once the episode is delivered; otherwise the
+    # items stay queued and the next /generate resumes from the checkpoints
+    if audio_generated:
         content_ids = [item['id'] for item in content_queue]
-        db.mark_content_as_processed(user_id, content_ids)
+        await job.run_blocking(db.mark_content_as_processed, user_id, content_ids)
+        await job.run_blocking(episode.complete)
+        await job.run_blocking(pregenerator.discard, user_id, content_ids)
+
+    # Delete the status message
+    await job.delete_status_message()
+
+async def build_digest(job: GenerationJob):
+    """
+    Build a daily digest ahead of its delivery time.
+
+    Returns:
+        tuple: (episode build, audio path, summary message)
+
+    Raises:
+        RuntimeError: If the audio could not be generated (the scheduler retries)
+    """
+    with trace('digest', user_id=job.user_id, job_id=job.job_id, items=len(job.content_items)):
+        _, episode, audio_path = await build_episode(job)
+        if audio_path is None:
+            raise RuntimeError("Digest audio could not be generated")
+        summary_message = await build_summary_message(job)
+    return episode, audio_path, summary_message
+
+async def deliver_digest(job: GenerationJob, built) -> None:
+    """Send a prepared daily digest."""
+    episode, audio_path, summary_message = built
+
+    # Items generated or cleared since the build must not be sent again
+    queued_ids = {item['id'] for item in await job.run_blocking(db.get_unprocessed_content, job.user_id)}
+    if any(item['id'] not in queued_ids for item in job.content_items):
+        logger.info(f"Dropping digest for user {job.user_id}: its queue changed since the build")
+        try:
+            os.remove(audio_path)
+        except OSError:
+            pass
+        return
 
-        # Delete the status message
-        await status_message.delete()
+    await job.bot.send_message(job.chat_id, DIGEST_READY_MESSAGE)
+    await job.bot.send_message(job.chat_id, summary_message, disable_web_page_preview=True)
+    await deliver_episode(job, episode, audio_path)
 
+async def send_summary(job: GenerationJob) -> None:
+    """Build and send a job's summary message; failures are logged, not raised."""
+    try:
+        summary_message = await build_summary_message(job)
+        await job.bot.send_message(job.chat_id, summary_message, disable_web_page_preview=True)
+        job.summary_sent = True
+        if job_queue:
+            # Recorded on the queued job, so a retry on another worker skips the summary
+            await asyncio.to_thread(job_queue.update_payload, f"generate:{job.user_id}", {'summary_sent': True})
     except Exception as e:
-        logger.error(f"Error generating podcast: {str(e)}")
-        await update.message.reply_text(ERROR_MESSAGE)
-        await status_message.delete()
+        logger.error(f"Error sending podcast summary: {str(e)}")
+
+async def build_summary_message(job: GenerationJob) -> str:
+    """Build the job's summary message, summarizing all items in parallel."""
+    user_id, content_queue = job.user_id, job.content_items
+    # Each summary is an independent LLM call; they run on the generation pool,
+    # which bounds the fan-out, and the LLM scheduler bounds the calls in flight
+    summaries = await asyncio.gather(*(
+        job.run_blocking(summarize_item, item) for item in content_queue
+    ))
+
+    # Generate content summaries with ADHD-friendly formatting
+    summary_message = "🎙️ PODCAST SUMMARY\n━━━━━━━━━━━━━━━\n\n"
+    for i, (item, summary) in enumerate(zip(content_queue, summaries), 1):
+        title = item.get('title', 'Untitled')
+        author = item.get('author', 'Unknown Author')
+        source_url = item.get('source_url', '')
+        message_id = item.get('message_id', '')
+
+        # Format the item link
+        if source_url:
+            link = source_url
+        elif message_id:
+            link = f"t.me/c/{abs(user_id)}/{message_id}"
+        else:
+            link = "No link available"
+
+        # Create visually structured item summary with emojis and clear sections
+        summary_message += f"📎 ITEM {i}\n"
+        summary_message += f"━━━━━━━━━━━━━━━\n"
+        summary_message += f"📗 Title: {title}\n"
+        summary_message += f"✍️ Author: {author}\n"
+        summary_message += f"💡 Insights: {summary}\n"
+        summary_message += f"🔗 Link: {link}\n\n"
+    return summary_message
+
+def summarize_item(item: dict) -> str:
+    """Generate a focused 1-2 sentence summary of one content item."""
+    pregenerated = pregenerator.get_summary(item.get('user_id'), item.get('id'))
+    if pregenerated:
+        return pregenerated
+
+    try:
+        return script_generator.generate_content_summary(item)
+    except Exception:
+        content = item.get('content', '')
+        return content[:200] + '...' if len(content) > 200 else content
 
 async def queue_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Show the user's content queue."""
     user_id = update.effective_user.id
     # Get unprocessed content
-    unprocessed_content = db.get_unprocessed_content(user_id)
+    unprocessed_content = await asyncio.to_thread(db.get_unprocessed_content, user_id)
     if not unprocessed_content:
         await update.message.reply_text(QUEUE_EMPTY_MESSAGE)
         return
@@ -254,11 +584,89 @@ async def clear_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
     """Clear the user's content queue."""
     user_id = update.effective_user.id
 
-    # Clear unprocessed content
-    db.clear_unprocessed_content(user_id)
+    # Clear unprocessed content and anything prepared for it in the background
+    await asyncio.to_thread(db.clear_unprocessed_content, user_id)
+    await asyncio.to_thread(pregenerator.cancel_user, user_id)
 
     await update.message.reply_text(QUEUE_CLEARED_MESSAGE)
 
+async def engine_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Show or change the user's TTS engine."""
+    user_id = update.effective_user.id
+    available = ', '.join(sorted(ENGINES))
+
+    if not context.args:
+        current = await asyncio.to_thread(db.get_user_tts_engine, user_id) or f"default ({tts_processor.engine.name})"
+        await update.message.reply_text(ENGINE_STATUS_MESSAGE.format(current=current, available=available))
+        return
+
+    engine_name = context.args[0].lower()
+    if engine_name == 'default':
+        await asyncio.to_thread(db.set_user_tts_engine, user_id, None)
+        await update.message.reply_text(ENGINE_SET_MESSAGE.format(engine=f"default ({tts_processor.engine.name})"))
+        return
+
+    if engine_name not in ENGINES:
+        await update.message.reply_text(ENGINE_UNKNOWN_MESSAGE.format(engine=engine_name, available=available))
+        return
+
+    await asyncio.to_thread(db.set_user_tts_engine, user_id, engine_name)
+    await update.message.reply_text(ENGINE_SET_MESSAGE.format(engine=engine_name))
+
+async def schedule_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Show or set the user's daily podcast time."""
+    user_id = update.effective_user.id
+    timezone = digest_scheduler.timezone.key
+
+    if not context.args:
+        digest = await asyncio.to_thread(db.get_user_digest, user_id)
+        if digest:
+            await update.message.reply_text(SCHEDULE_STATUS_MESSAGE.format(time=digest['time'], timezone=timezone))
+        else:
+            await update.message.reply_text(SCHEDULE_USAGE_MESSAGE.format(timezone=timezone))
+        return
+
+    try:
+        first = await digest_scheduler.subscribe(user_id, update.effective_chat.id, context.args[0])
+    except ValueError:
+        await update.message.reply_text(SCHEDULE_USAGE_MESSAGE.format(timezone=timezone))
+        return
+
+    when = "today" if first.date() == datetime.now(digest_scheduler.timezone).date() else "tomorrow"
+    await update.message.reply_text(
+        SCHEDULE_SET_MESSAGE.format(time=first.strftime('%H:%M'), timezone=timezone, when=when)
+    )
+
+async def unschedule_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Stop the user's daily podcast."""
+    user_id = update.effective_user.id
+    if await digest_scheduler.unsubscribe(user_id):
+        await update.message.reply_text(UNSCHEDULED_MESSAGE)
+    else:
+        await update.message.reply_text(NOT_SCHEDULED_MESSAGE)
+
+async def pregen_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Show or toggle background preparation of queued items."""
+    user_id = update.effective_user.id
+
+    if not context.args or context.args[0].lower() not in ('on', 'off'):
+        state = "on" if await asyncio.to_thread(db.get_user_pregenerate, user_id) else "off"
+        await update.message.reply_text(PREGEN_STATUS_MESSAGE.format(state=state))
+        return
+
+    enabled = context.args[0].lower() == 'on'
+    await asyncio.to_thread(db.set_user_pregenerate, user_id, enabled)
+    if enabled:
+        # Catch up on items that were queued before opting in
+        engine = await asyncio.to_thread(get_user_engine, user_id)
+        for index, item in enumerate(await asyncio.to_thread(db.get_unprocessed_content, user_id)):
+            pregenerator.schedule(user_id, item, index, engine=engine)
+    else:
+        await asyncio.to_thread(pregenerator.cancel_user, user_id)
+    await update.message.reply_text(PREGEN_SET_MESSAGE.format(state="on" if enabled else "off"))
+
+@timed('handle_message')
+@profiled('handle_message', lambda update, context: update.effective_user.id)
 async def process_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Process user message to extract and store content."""
     user_id = update.effective_user.id
@@ -273,23 +681,13 @@ async def process_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             await update.message.reply_text(COMMAND_CORRECTION_MESSAGE.format(command=lowercase_text))
             return
 
-    # Check for message properties to determine content type
-    content_item = None
-
     # Process text from the message, even if it has photos
-    if message.text or message.caption:
-        # Use caption if text is None (for messages with photos)
-        text_content = message.text if message.text else message.caption
-        if text_content:
-            logger.info(f"Processing text content: {text_content}")
-            # Check if it's a text-only message or contains a URL
-            content_item = content_processor.process_text(
-                text_content, 
-                user_id,
-                message_id=message.message_id,
-                is_forwarded=bool(message.forward_from or message.forward_from_chat)
-            )
-            logger.info(f"Content processing result: {content_item}")
+    # (use caption if text is None, for messages with photos)
+    text_content = message.text or message.caption
+    file_path = file_name = None
+
+    if text_content:
+        logger.info(f"Processing text content: {text_content}")
 
     # Process document
     elif message.document:
@@ -297,39 +695,132 @@ async def process_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         # Get file from Telegram
         file = await message.document.get_file()
         file_path = f"temp/{message.document.file_id}"
+        file_name = message.document.file_name
         await file.download_to_drive(file_path)
 
-        content_item = content_processor.process_document(
-            file_path, 
-            message.document.file_name, 
-            user_id
-        )
-
-        # Clean up temp file
-        os.remove(file_path)
-
     # Unknown content type
     else:
         logger.warning(f"Unknown content type for message: {message}")
         await message.reply_text(UNKNOWN_CONTENT_TYPE_MESSAGE)
         return
 
+    fetch = {
+        'user_id': user_id,
+        'chat_id': update.effective_chat.id,
+        'message_id': message.message_id,
+        'text': text_content,
+        'is_forwarded': bool(message.forward_from or message.forward_from_chat),
+        'file_path': file_path,
+        'file_name': file_name
+    }
+    if job_queue:
+        # A worker fetches and extracts the content and replies when it is queued
+        await asyncio.to_thread(job_queue.enqueue, 'fetch', fetch)
+        return
+
+    content_item = await asyncio.to_thread(profiling.in_session(extract_content), fetch)
+    await store_content(context.bot, fetch['chat_id'], user_id, content_item)
+
+def extract_content(fetch: dict):
+    """
+    Fetch and extract a message's content.
+
+    Args:
+        fetch (dict): user_id, message_id, text and is_forwarded, or file_path
+            and file_name of a downloaded document (removed afterwards)
+
+    Returns:
+        dict: Content item from the ContentProcessor, or None
+    """
+    user_id = fetch['user_id']
+    if fetch.get('text'):
+        # Check if it's a text-only message or contains a URL
+        content_item = content_processor.process_text(
+            fetch['text'],
+            user_id,
+            message_id=fetch.get('message_id'),
+            is_forwarded=fetch.get('is_forwarded', False)
+        )
+        logger.info(f"Content processing result: {content_item}")
+        return content_item
+
+    content_item = content_processor.process_document(
+        fetch['file_path'],
+        fetch['file_name'],
+        user_id
+    )
+
+    # Clean up temp file
+    os.remove(fetch['file_path'])
+    return content_item
+
+async def store_content(bot, chat_id, user_id, content_item) -> None:
+    """Add extracted content to the user's queue and tell them how it went."""
     # Handle content processing result
     if content_item and content_item.get('success'):
         logger.info(f"Successfully processed content: {content_item.get('title', 'No title')}")
-        # Store content in database
-        if db.add_content(content_item):
-            await message.reply_text(CONTENT_RECEIVED_MESSAGE)
+        # Store content in database; its flock is shared with other processes, so
+        # waiting for it must not hold up the event loop
+        if await asyncio.to_thread(db.add_content, content_item):
+            await bot.send_message(chat_id, CONTENT_RECEIVED_MESSAGE)
+
+            # Speculatively write and voice the item's section while the user keeps adding content
+            if await asyncio.to_thread(db.get_user_pregenerate, user_id):
+                item_index = len(await asyncio.to_thread(db.get_unprocessed_content, user_id)) - 1
+                engine = await asyncio.to_thread(get_user_engine, user_id)
+                pregenerator.schedule(user_id, content_item, item_index, engine=engine)
         else:
-            await message.reply_text("This content is already in your queue. I'll skip adding it again.")
+            await bot.send_message(chat_id, "This content is already in your queue. I'll skip adding it again.")
     elif content_item and content_item.get('unsupported'):
         logger.warning(f"Unsupported content: {content_item.get('message', 'No message')}")
-        await message.reply_text(
+        await bot.send_message(
+            chat_id,
             UNSUPPORTED_CONTENT_MESSAGE.format(message=content_item.get('message', 'this content type is not supported yet'))
         )
     else:
         logger.error(f"Failed to process content: {content_item}")
-        await message.reply_text(PROCESSING_ERROR_MESSAGE)
+        await bot.send_message(chat_id, PROCESSING_ERROR_MESSAGE)
+
+@timed('fetch_job')
+@profiled('fetch_job', lambda bot, fetch: fetch['user_id'])
+async def run_fetch_job(bot, fetch: dict) -> None:
+    """Worker handler for a queued message: extract its content and queue it."""
+    content_item = await asyncio.to_thread(profiling.in_session(extract_content), fetch)
+    await store_content(bot, fetch['chat_id'], fetch['user_id'], content_item)
+
+async def post_init(application: Application) -> None:
+    """Start background tasks once the bot's event loop is running."""
+    global metrics_server
+    janitor.start()
+    digest_scheduler.start(application.bot)
+    metrics_server = await metrics.start_server()
+
+async def post_shutdown(application: Application) -> None:
+    """Stop background tasks."""
+    await generation_jobs.shutdown()
+    await digest_scheduler.stop()
+    pregenerator.shutdown()
+    await janitor.stop()
+    if metrics_server:
+        await metrics_server.stop()
+
+def bot_api_urls() -> dict:
+    """Bot API endpoints when TELEGRAM_API_BASE_URL points at another server (a self-hosted one, or fake_telegram.py in tests)."""
+    api_base_url = os.getenv("TELEGRAM_API_BASE_URL")
+    if not api_base_url:
+        return {}
+    api_base_url = api_base_url.rstrip('/')
+    return {'base_url': f"{api_base_url}/bot", 'base_file_url': f"{api_base_url}/file/bot"}
+
+def prepare_storage() -> None:
+    """Create the working directories and database files."""
+    # Create temp directories if they don't exist
+    os.makedirs("temp", exist_ok=True)
+    os.makedirs("temp/audio", exist_ok=True)
+    os.makedirs("data", exist_ok=True)
+
+    # Initialize database
+    db.initialize()
 
 def main() -> None:
     """Start the bot."""
@@ -339,7 +830,14 @@ def main() -> None:
         logger.error("No TELEGRAM_BOT_TOKEN found in environment variables")
         return
 
-    application = Application.builder().token(token).build()
+    builder = Application.builder().token(token).post_init(post_init).post_shutdown(post_shutdown)
+
+    # Point the bot at another Bot API server
+    api_urls = bot_api_urls()
+    if api_urls:
+        builder = builder.base_url(api_urls['base_url']).base_file_url(api_urls['base_file_url'])
+
+    application = builder.build()
 
     # Add command handlers
     application.add_handler(CommandHandler("start", start))
@@ -347,6 +845,10 @@ def main() -> None:
     application.add_handler(CommandHandler("generate", generate_command))
     application.add_handler(CommandHandler("queue", queue_command))
     application.add_handler(CommandHandler("clear", clear_command))
+    application.add_handler(CommandHandler("engine", engine_command))
+    application.add_handler(CommandHandler("pregen", pregen_command))
+    application.add_handler(CommandHandler("schedule", schedule_command))
+    application.add_handler(CommandHandler("unschedule", unschedule_command))
 
     # Add message handler for content - including photos and all types that might have captions
     application.add_handler(MessageHandler(
@@ -354,21 +856,20 @@ def main() -> None:
         process_message
     ))
 
-    # Start the Bot
-    application.run_polling()
+    # Start the Bot: long polling (default) or webhook updates behind a load balancer
+    bot_mode = os.getenv("BOT_MODE", "polling").lower()
+    if bot_mode == "webhook":
+        asyncio.run(run_webhook(application))
+    elif bot_mode == "polling":
+        application.run_polling()
+    else:
+        logger.error(f"Unknown BOT_MODE '{bot_mode}'; use 'polling' or 'webhook'")
 
 if __name__ == "__main__":
-    # Create temp directories if they don't exist
-    os.makedirs("temp", exist_ok=True)
-    os.makedirs("temp/audio", exist_ok=True)
-    os.makedirs("data", exist_ok=True)
-
-    # Initialize database
-    db.initialize()
+    prepare_storage()
 
-    # Clean up old audio files on startup
-    tts_processor = TTSProcessor()
-    tts_processor.cleanup_old_files()
+    # Old audio, downloads, scripts and checkpoints are cleaned up by the janitor,
+    # which sweeps once on startup and then every JANITOR_INTERVAL_SECONDS
 
     # Start the bot
     main()
\ No newline at end of file
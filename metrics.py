@@ -0,0 +1,340 @@
+"""
+Metrics Module
+
+Latency histograms, counters and gauges for the whole pipeline, served in the
+Prometheus text format on METRICS_HOST:METRICS_PORT (off unless METRICS_PORT is
+set):
+
+- leaf stages marked with stage_timer.stage() (fetch, extract, db_load, db_save,
+  llm_wait, llm_call, synthesize, decode, stretch, filter, normalize, cache,
+  assemble, encode) are recorded in triagefm_stage_seconds
+- larger operations that contain stages (message handling, a /generate job,
+  the Telegram upload) are timed with span() in triagefm_span_seconds
+- gauges registered with gauge() are read when the endpoint is scraped, on a
+  worker thread, so their callbacks may block (the job queue gauge reads SQLite)
+
+A trace() collects the stages of one job, including those run on worker
+threads, and logs where its time went when it ends:
+
+    with trace('generate', user_id=user_id):
+        ...
+"""
+import os
+import time
+import asyncio
+import bisect
+import functools
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import stage_timer
+from http_server import HTTPServer, HTTPRequest, HTTPResponse
+
+logger = logging.getLogger(__name__)
+
+# Seconds; stages range from sub-millisecond cache hits to multi-minute jobs
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = '') -> str:
+    pairs = [f'{name}="{str(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    """A monotonically increasing value per label set."""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, help_text: str, labels: tuple = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def samples(self) -> list:
+        with self._lock:
+            return [(self.name, _format_labels(self.labels, key), value) for key, value in sorted(self._values.items())]
+
+
+class Histogram:
+    """Bucketed observations per label set."""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [bucket counts..., +Inf count, sum]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def samples(self) -> list:
+        samples = []
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float('inf'),), series[:-1]):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else _format_value(bound)
+                    samples.append((f"{self.name}_bucket", _format_labels(self.labels, key, f'le="{le}"'), cumulative))
+                samples.append((f"{self.name}_sum", _format_labels(self.labels, key), series[-1]))
+                samples.append((f"{self.name}_count", _format_labels(self.labels, key), cumulative))
+        return samples
+
+
+class Gauge:
+    """A value read from a callback at scrape time."""
+
+    kind = 'gauge'
+
+    def __init__(self, name: str, help_text: str, labels: tuple, callback):
+        """
+        Args:
+            callback (callable): Returns a number, or {label values tuple: number} with labels
+        """
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.callback = callback
+
+    def samples(self) -> list:
+        try:
+            values = self.callback()
+        except Exception as e:
+            logger.warning(f"Could not read gauge {self.name}: {str(e)}")
+            return []
+        if not isinstance(values, dict):
+            values = {(): values}
+        return [(self.name, _format_labels(self.labels, key), value) for key, value in sorted(values.items())]
+
+
+class MetricsRegistry:
+    """All metrics of the process."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            # Re-registering (e.g. a second Janitor) replaces the previous metric
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, labels: tuple = ()) -> Counter:
+        return self._register(Counter(name, help_text, labels))
+
+    def histogram(self, name: str, help_text: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, labels, buckets))
+
+    def gauge(self, name: str, help_text: str, callback, labels: tuple = ()) -> Gauge:
+        return self._register(Gauge(name, help_text, labels, callback))
+
+    def render(self) -> str:
+        """The Prometheus text exposition of every metric."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram('triagefm_stage_seconds', 'Wall time of leaf pipeline stages', ('stage',))
+STAGE_CPU_SECONDS = REGISTRY.counter(
+    'triagefm_stage_cpu_seconds_total', 'CPU time of the thread running each stage', ('stage',)
+)
+SPAN_SECONDS = REGISTRY.histogram('triagefm_span_seconds', 'Wall time of operations spanning several stages', ('span',))
+SPAN_ERRORS = REGISTRY.counter('triagefm_span_errors_total', 'Operations that raised', ('span',))
+
+
+class Trace:
+    """Stage totals of one job."""
+
+    def __init__(self, name: str, attributes: dict):
+        self.name = name
+        self.attributes = attributes
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+        # stage -> [calls, wall seconds]
+        self.stages = {}
+
+    def record(self, stage: str, wall: float) -> None:
+        with self._lock:
+            totals = self.stages.setdefault(stage, [0, 0.0])
+            totals[0] += 1
+            totals[1] += wall
+
+    def summary(self) -> str:
+        """e.g. 'llm_call 8.12s (5), synthesize 3.40s (30), ...', slowest first."""
+        with self._lock:
+            stages = sorted(self.stages.items(), key=lambda item: item[1][1], reverse=True)
+        return ', '.join(f"{stage} {wall:.2f}s ({calls})" for stage, (calls, wall) in stages)
+
+
+_current_trace = contextvars.ContextVar('current_trace', default=None)
+
+
+class _StageCollector:
+    """Feeds stage_timer.stage() measurements into the metrics and the current trace."""
+
+    def record(self, name: str, wall: float, cpu: float) -> None:
+        STAGE_SECONDS.observe(wall, name)
+        STAGE_CPU_SECONDS.inc(name, amount=cpu)
+        current = _current_trace.get()
+        if current is not None:
+            current.record(name, wall)
+
+
+stage_timer.register_collector(_StageCollector())
+
+
+@contextmanager
+def span(name: str):
+    """
+    Time an operation that may contain stages or other spans.
+
+    Args:
+        name (str): Span name, e.g. 'handle_message' or 'upload'
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        SPAN_ERRORS.inc(name)
+        raise
+    finally:
+        wall = time.perf_counter() - start
+        SPAN_SECONDS.observe(wall, name)
+        current = _current_trace.get()
+        if current is not None:
+            current.record(name, wall)
+
+
+def timed(name: str):
+    """Decorator timing every call of an async function as a span."""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with span(name):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def trace(name: str, **attributes):
+    """
+    Time a job as a span and log the breakdown of its stages when it ends.
+
+    Stages on threads started through ContextThreadPoolExecutor or asyncio.to_thread
+    inside the trace count towards it. Parallel stages add up, so the breakdown
+    can exceed the job's wall time.
+
+    Args:
+        name (str): Span name, e.g. 'generate'
+        **attributes: Logged with the breakdown (e.g. user_id, job_id)
+    """
+    current = Trace(name, attributes)
+    token = _current_trace.set(current)
+    try:
+        yield current
+    except BaseException:
+        SPAN_ERRORS.inc(name)
+        raise
+    finally:
+        _current_trace.reset(token)
+        SPAN_SECONDS.observe(time.perf_counter() - current.started, name)
+        details = ' '.join(f"{key}={value}" for key, value in attributes.items())
+        logger.info(
+            f"Trace {name} {details}: {time.perf_counter() - current.started:.2f}s total; "
+            f"{current.summary() or 'no stages'}"
+        )
+
+
+# Applied to every ContextThreadPoolExecutor task (see register_task_wrapper)
+_task_wrappers = []
+
+
+def register_task_wrapper(wrapper) -> None:
+    """
+    Wrap every task submitted to a ContextThreadPoolExecutor from now on.
+
+    Args:
+        wrapper (callable): wrapper(fn) -> callable run on the worker thread in place of fn,
+            in the submitter's context
+    """
+    _task_wrappers.append(wrapper)
+
+
+class ContextThreadPoolExecutor(ThreadPoolExecutor):
+    """ThreadPoolExecutor that runs tasks in the submitter's context, so stages reach its trace."""
+
+    def submit(self, fn, *args, **kwargs):
+        for wrapper in _task_wrappers:
+            fn = wrapper(fn)
+        return super().submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def gauge(name: str, help_text: str, callback, labels: tuple = ()) -> Gauge:
+    """Register a gauge read from `callback` at scrape time (see Gauge)."""
+    return REGISTRY.gauge(name, help_text, callback, labels)
+
+
+async def handle_metrics(request: HTTPRequest) -> HTTPResponse:
+    body = await asyncio.to_thread(REGISTRY.render)
+    return HTTPResponse(200, body.encode('utf-8'), "text/plain; version=0.0.4; charset=utf-8")
+
+
+async def start_server(port: Optional[int] = None, host: Optional[str] = None) -> Optional[HTTPServer]:
+    """
+    Serve GET /metrics.
+
+    Args:
+        port (int, optional): Port (defaults to METRICS_PORT; no server if unset)
+        host (str, optional): Interface (defaults to METRICS_HOST, then 127.0.0.1)
+
+    Returns:
+        HTTPServer: The running server, or None if metrics are not served
+    """
+    if port is None:
+        if not os.getenv("METRICS_PORT"):
+            return None
+        port = int(os.getenv("METRICS_PORT"))
+    server = HTTPServer(host or os.getenv("METRICS_HOST", "127.0.0.1"), port)
+    server.route("GET", "/metrics", handle_metrics)
+    await server.start()
+    logger.info(f"Serving metrics on http://{server.host}:{server.port}/metrics")
+    return server
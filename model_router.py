@@ -0,0 +1,191 @@
+"""
+Model Router Module
+
+This module picks which OpenRouter model serves each LLM request. Each task has a
+configured fallback chain; the router skips models whose context is too small for
+the input, deprioritizes models that are currently slow or failing, and keeps live
+latency and error statistics per model.
+"""
+import os
+import time
+import logging
+import threading
+from collections import deque
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Default fallback chains per task: (model, max input characters)
+DEFAULT_CHAINS = {
+    'dialogue': [
+        ("meta-llama/llama-3-8b-instruct", 24000),
+        ("mistralai/mistral-7b-instruct", 96000),
+    ],
+    'summary': [
+        ("mistralai/mistral-7b-instruct", 96000),
+        ("meta-llama/llama-3-8b-instruct", 24000),
+    ],
+}
+
+
+class ModelStats:
+    """Rolling latency and error statistics for one model."""
+
+    def __init__(self, window=50, max_age=900):
+        """
+        Args:
+            window (int): Number of recent calls to keep
+            max_age (float): Ignore calls older than this many seconds
+        """
+        self.max_age = max_age
+        self.calls = deque(maxlen=window)  # (timestamp, latency, ok)
+        # Calls are recorded and summarized from several threads at once
+        self._lock = threading.Lock()
+
+    def record(self, latency, ok):
+        with self._lock:
+            self.calls.append((time.monotonic(), latency, ok))
+
+    def _recent(self):
+        cutoff = time.monotonic() - self.max_age
+        with self._lock:
+            calls = list(self.calls)
+        return [call for call in calls if call[0] >= cutoff]
+
+    def summary(self):
+        """
+        Summarize recent calls.
+
+        Returns:
+            dict: {'calls', 'error_rate', 'p50', 'p95'} (latencies in seconds, None without data)
+        """
+        recent = self._recent()
+        latencies = sorted(latency for _, latency, ok in recent if ok)
+        errors = sum(1 for _, _, ok in recent if not ok)
+
+        def percentile(p):
+            if not latencies:
+                return None
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))]
+
+        return {
+            'calls': len(recent),
+            'error_rate': errors / len(recent) if recent else 0.0,
+            'p50': percentile(0.50),
+            'p95': percentile(0.95)
+        }
+
+
+class ModelRouter:
+    """Choose models per request from input size and live health, with failover."""
+
+    def __init__(self, chains=None, p95_target=20.0, max_error_rate=0.3, min_calls=5):
+        """
+        Initialize the router.
+
+        Args:
+            chains (dict): task -> list of (model, max_input_chars) in preference order
+            p95_target (float): Per-call p95 latency target in seconds
+            max_error_rate (float): Error rate above which a model is considered failing
+            min_calls (int): Calls needed before a model's stats are trusted
+        """
+        self.chains = chains or DEFAULT_CHAINS
+        self.p95_target = p95_target
+        self.max_error_rate = max_error_rate
+        self.min_calls = min_calls
+        self.stats = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """
+        Build a router from environment variables.
+
+        LLM_DIALOGUE_MODELS / LLM_SUMMARY_MODELS are comma-separated "model:max_chars"
+        lists; LLM_P95_TARGET_SECONDS sets the latency target.
+        """
+        chains = {}
+        for task, variable in (('dialogue', 'LLM_DIALOGUE_MODELS'), ('summary', 'LLM_SUMMARY_MODELS')):
+            value = os.getenv(variable)
+            if not value:
+                chains[task] = DEFAULT_CHAINS[task]
+                continue
+            chain = []
+            for entry in value.split(','):
+                model, _, max_chars = entry.strip().rpartition(':')
+                if not model:
+                    model, max_chars = max_chars, "24000"
+                chain.append((model, int(max_chars)))
+            chains[task] = chain
+        return cls(chains=chains, p95_target=float(os.getenv("LLM_P95_TARGET_SECONDS", "20")))
+
+    def _stats_for(self, model):
+        with self._lock:
+            return self.stats.setdefault(model, ModelStats())
+
+    def _is_healthy(self, model):
+        summary = self._stats_for(model).summary()
+        if summary['calls'] < self.min_calls:
+            return True
+        if summary['error_rate'] > self.max_error_rate:
+            return False
+        return summary['p95'] is None or summary['p95'] <= self.p95_target
+
+    def candidates(self, task, input_chars):
+        """
+        Order the task's models for a request.
+
+        Models that can fit the input come first, healthy ones in chain order,
+        then unhealthy ones as a last resort. If nothing fits, the model with the
+        largest context is tried alone (the caller's input will be truncated).
+
+        Args:
+            task (str): 'dialogue' or 'summary'
+            input_chars (int): Size of the prompt content in characters
+
+        Returns:
+            list: Model names to try in order
+        """
+        chain = self.chains[task]
+        fitting = [model for model, max_chars in chain if max_chars >= input_chars]
+        if not fitting:
+            return [max(chain, key=lambda entry: entry[1])[0]]
+
+        healthy = [model for model in fitting if self._is_healthy(model)]
+        unhealthy = [model for model in fitting if model not in healthy]
+        # Among failing models, try the one with the lowest error rate first
+        unhealthy.sort(key=lambda model: self._stats_for(model).summary()['error_rate'])
+        return healthy + unhealthy
+
+    def max_input_chars(self, model):
+        """Largest input any chain allows for `model`."""
+        return max(max_chars for chain in self.chains.values() for name, max_chars in chain if name == model)
+
+    def attempt_deadline(self):
+        """Seconds one model gets before the router fails over to the next."""
+        return self.p95_target * 2
+
+    def record(self, model, latency, ok):
+        """
+        Record the outcome of a call.
+
+        Args:
+            model (str): Model that served the call
+            latency (float): Seconds the call took
+            ok (bool): Whether it succeeded
+        """
+        self._stats_for(model).record(latency, ok)
+        if not ok:
+            logger.warning(f"LLM model {model} failed after {latency:.1f}s")
+
+    def get_stats(self):
+        """
+        Get live statistics per model.
+
+        Returns:
+            dict: model -> {'calls', 'error_rate', 'p50', 'p95', 'healthy'}
+        """
+        with self._lock:
+            models = list(self.stats)
+        return {model: dict(self._stats_for(model).summary(), healthy=self._is_healthy(model)) for model in models}
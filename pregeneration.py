@@ -0,0 +1,291 @@
+"""
+Pre-generation Module
+
+Opt-in speculative work done while content items trickle in: as soon as an item
+is added, a low-priority background task writes the item's dialogue section,
+its one-line insight summary and the section's processed audio, and stores them
+under
+
+    data/pregen/{user_id}/{item_id}/section.json
+    data/pregen/{user_id}/{item_id}/section.wav
+
+/generate then picks them up (EpisodeBuilder seeds its checkpoints from them),
+leaving only assembly and upload. The work runs on its own small executor and
+synthesizes turns one at a time, and its LLM calls share a single low-weight
+scheduler key, so it never competes with interactive requests for more than a
+sliver of capacity. Clearing a user's queue cancels their pending work and
+frees its storage. Cancellation is recorded on disk as a per-user generation
+counter (data/pregen/.cancelled/{user_id}), so it also reaches tasks running in
+worker processes (worker.py) when JOB_BACKEND=queue.
+"""
+import os
+import json
+import uuid
+import wave
+import shutil
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+from typing import Optional
+
+from audio_assembler import AudioAssembler
+from audio_cache import read_wav, write_wav
+from episode_builder import section_audio_key
+from script_model import Turn
+from tts_engines import TTSEngine
+
+logger = logging.getLogger(__name__)
+
+# All speculative LLM calls share one fair-share key, so they do not push back
+# the user's own place in the scheduler queue
+SCHEDULER_KEY = "pregen"
+
+# Per-user cancellation counters live here, outside the user directories that /clear deletes
+CANCEL_DIR = ".cancelled"
+
+
+class PreGenerationCancelled(Exception):
+    """Raised inside a pre-generation task when its user cleared the queue."""
+
+
+class PreGenerator:
+    """Compute item sections ahead of /generate."""
+
+    def __init__(self, script_generator, tts_processor, pregen_dir: Optional[str] = None,
+                 max_workers: Optional[int] = None, weight: Optional[float] = None):
+        """
+        Args:
+            script_generator (ScriptGenerator): Writes the dialogue and summaries
+            tts_processor (TTSProcessor): Synthesizes the turns
+            pregen_dir (str, optional): Storage root (defaults to PREGEN_DIR, then data/pregen)
+            max_workers (int, optional): Items pre-generated at once (defaults to PREGEN_MAX_WORKERS, then 1)
+            weight (float, optional): LLM scheduler weight (defaults to PREGEN_WEIGHT, then 0.1)
+        """
+        self.script_generator = script_generator
+        self.tts_processor = tts_processor
+        self.pregen_dir = pregen_dir or os.getenv("PREGEN_DIR", "data/pregen")
+        self.weight = weight or float(os.getenv("PREGEN_WEIGHT", "0.1"))
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers or int(os.getenv("PREGEN_MAX_WORKERS", "1")),
+            thread_name_prefix="pregen"
+        )
+        self._lock = threading.Lock()
+        # user_id -> {item_id: Future}
+        self._tasks = {}
+        # user_id -> Event set when the user's work is cancelled
+        self._cancelled = {}
+
+    def _item_dir(self, user_id, item_id) -> str:
+        return os.path.join(self.pregen_dir, str(user_id), str(item_id))
+
+    def _cancel_path(self, user_id) -> str:
+        return os.path.join(self.pregen_dir, CANCEL_DIR, str(user_id))
+
+    def _cancel_generation(self, user_id) -> int:
+        """How many times the user's work has been cancelled, as seen by every process."""
+        try:
+            with open(self._cancel_path(user_id), 'r') as f:
+                return int(f.read().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def _bump_cancel_generation(self, user_id) -> None:
+        """Invalidate every task scheduled for the user so far, in this and other processes."""
+        path = self._cancel_path(user_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(temp_path, 'w') as f:
+            f.write(str(self._cancel_generation(user_id) + 1))
+        os.replace(temp_path, path)
+
+    def schedule(self, user_id, content_item: dict, item_index: int, engine: Optional[TTSEngine] = None) -> None:
+        """
+        Queue an item for pre-generation.
+
+        Args:
+            user_id: Telegram user ID
+            content_item (dict): The stored content item (must have an 'id')
+            item_index (int): Expected position in the next episode (decides who speaks first)
+            engine (TTSEngine, optional): Engine the user's episode will use
+        """
+        item_id = content_item.get('id')
+        if item_id is None:
+            return
+
+        with self._lock:
+            cancelled = self._cancelled.setdefault(user_id, threading.Event())
+            user_tasks = self._tasks.setdefault(user_id, {})
+            if item_id in user_tasks:
+                return
+            generation = self._cancel_generation(user_id)
+            future = self.executor.submit(
+                self._run, user_id, content_item, item_index, engine, cancelled, generation
+            )
+            user_tasks[item_id] = future
+
+        def forget(_):
+            with self._lock:
+                if self._tasks.get(user_id, {}).get(item_id) is future:
+                    del self._tasks[user_id][item_id]
+
+        future.add_done_callback(forget)
+
+    def _run(self, user_id, content_item: dict, item_index: int, engine, cancelled: threading.Event,
+             generation: int) -> None:
+        item_id = content_item['id']
+        try:
+            self._pregenerate(
+                user_id, content_item, item_index, engine or self.tts_processor.engine, cancelled, generation
+            )
+        except PreGenerationCancelled:
+            logger.info(f"Cancelled pre-generation of item {item_id} for user {user_id}")
+            shutil.rmtree(self._item_dir(user_id, item_id), ignore_errors=True)
+        except Exception as e:
+            logger.error(f"Pre-generation of item {item_id} for user {user_id} failed: {str(e)}")
+
+    def _pregenerate(self, user_id, content_item: dict, item_index: int, engine: TTSEngine,
+                     cancelled: threading.Event, generation: int) -> None:
+        """Write, summarize and synthesize one item."""
+        def check_cancelled():
+            # The event covers this process; the counter covers /clear sent to another one
+            if cancelled.is_set() or self._cancel_generation(user_id) != generation:
+                raise PreGenerationCancelled()
+
+        # Tasks that were still queued when the user cleared their queue never start
+        check_cancelled()
+        turns = []
+        ok = self.script_generator.generate_section(
+            SCHEDULER_KEY, content_item, item_index, turns.append, stream=False, weight=self.weight
+        )
+        if not ok:
+            # A fallback section is not worth keeping; /generate will try the model again
+            logger.info(f"Pre-generation of item {content_item['id']} got no dialogue; leaving it to /generate")
+            return
+        check_cancelled()
+
+        summary = self.script_generator.generate_content_summary(
+            content_item, user_id=SCHEDULER_KEY, weight=self.weight
+        )
+        check_cancelled()
+
+        # Synthesize one turn at a time on this thread rather than on the shared TTS pool
+        assembler = AudioAssembler(gap_ms=self.tts_processor.segment_silence_ms)
+        complete = True
+        for turn in turns:
+            text = turn.to_tts()
+            if not text:
+                continue
+            audio = self.tts_processor._synthesize_segment(turn.speaker, text, engine)
+            complete = complete and audio is not None
+            assembler.add(audio)
+            check_cancelled()
+        section_audio = assembler.build()
+
+        item_dir = self._item_dir(user_id, content_item['id'])
+        os.makedirs(item_dir, exist_ok=True)
+        entry = {
+            'item_id': str(content_item['id']),
+            'turns': [turn.to_dict() for turn in turns],
+            'summary': summary,
+            'audio_key': None
+        }
+        if complete and section_audio is not None:
+            write_wav(os.path.join(item_dir, "section.wav"), section_audio)
+            entry['audio_key'] = section_audio_key(self.tts_processor, engine, turns)
+
+        check_cancelled()
+        manifest_path = os.path.join(item_dir, "section.json")
+        temp_path = f"{manifest_path}.{uuid.uuid4().hex}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(entry, f)
+        os.replace(temp_path, manifest_path)
+        # cancel_user may have deleted the directory between the check above and the
+        # replace, which would bring the item back; look again now that it is visible
+        check_cancelled()
+        logger.info(f"Pre-generated item {content_item['id']} for user {user_id} ({len(turns)} turns)")
+
+    def _load(self, user_id, item_id) -> Optional[dict]:
+        try:
+            with open(os.path.join(self._item_dir(user_id, item_id), "section.json"), 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable pre-generated item {item_id}: {str(e)}")
+            return None
+
+    def get_turns(self, user_id, item_id, item_index: int) -> Optional[list]:
+        """
+        Get an item's pre-generated dialogue section.
+
+        Args:
+            user_id: Telegram user ID
+            item_id: Content item ID
+            item_index (int): The item's actual position in the episode
+
+        Returns:
+            list of Turn, or None if the item has not been pre-generated
+        """
+        entry = self._load(user_id, item_id)
+        if entry is None:
+            return None
+        turns = [Turn.from_dict(turn) for turn in entry['turns']]
+        if turns and turns[0].section is not None:
+            # The position guessed when the item arrived may differ from the real one
+            section = replace(turns[0].section, index=item_index)
+            for turn in turns:
+                turn.section = section
+        return turns
+
+    def get_audio(self, user_id, item_id, audio_key: str):
+        """
+        Get an item's pre-generated section audio.
+
+        Args:
+            audio_key (str): Fingerprint of the turns, engine and processing the audio must match
+
+        Returns:
+            AudioSegment or None if missing or synthesized with other settings
+        """
+        entry = self._load(user_id, item_id)
+        if entry is None or entry.get('audio_key') != audio_key:
+            return None
+        try:
+            return read_wav(os.path.join(self._item_dir(user_id, item_id), "section.wav"))
+        except (OSError, EOFError, wave.Error) as e:
+            logger.warning(f"Ignoring unreadable pre-generated audio of item {item_id}: {str(e)}")
+            return None
+
+    def get_summary(self, user_id, item_id) -> Optional[str]:
+        """Get an item's pre-generated insight summary, or None."""
+        entry = self._load(user_id, item_id)
+        return entry.get('summary') if entry else None
+
+    def cancel_user(self, user_id) -> None:
+        """Cancel a user's pending work and delete everything pre-generated for them."""
+        with self._lock:
+            cancelled = self._cancelled.pop(user_id, None)
+            user_tasks = self._tasks.pop(user_id, {})
+        # Bumped before deleting, so a task that publishes afterwards sees it and removes its item
+        self._bump_cancel_generation(user_id)
+        if cancelled is not None:
+            # Running tasks stop at their next checkpoint and clean up after themselves
+            cancelled.set()
+        for future in user_tasks.values():
+            future.cancel()
+        shutil.rmtree(os.path.join(self.pregen_dir, str(user_id)), ignore_errors=True)
+        if user_tasks:
+            logger.info(f"Cancelled {len(user_tasks)} pre-generation tasks for user {user_id}")
+
+    def discard(self, user_id, item_ids: list) -> None:
+        """Delete pre-generated items once their episode has been delivered."""
+        for item_id in item_ids:
+            shutil.rmtree(self._item_dir(user_id, item_id), ignore_errors=True)
+
+    def shutdown(self) -> None:
+        """Stop the background workers, dropping queued work."""
+        with self._lock:
+            for cancelled in self._cancelled.values():
+                cancelled.set()
+        self.executor.shutdown(wait=False, cancel_futures=True)
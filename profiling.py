@@ -0,0 +1,306 @@
+"""
+Profiling Module
+
+Opt-in CPU and allocation profiles of individual jobs, for finding hot spots in
+the content and TTS pipelines on real traffic. Jobs of users listed in
+PROFILE_USER_IDS (comma-separated), plus a PROFILE_SAMPLE_RATE fraction of all
+other jobs (default 0), run under cProfile and tracemalloc:
+
+    with profile('generate', user_id, job_id=job_id):
+        ...
+
+Blocking stages run on worker threads are profiled too when they are started
+through metrics.ContextThreadPoolExecutor or wrapped with in_session() (e.g. for
+asyncio.to_thread). Each profiled job leaves two files next to the user's script
+archives, under data/scripts/{user_id}/profiles/:
+
+- {timestamp}_{name}_{job_id}.prof: pstats dump for snakeviz, `python -m pstats`, ...
+- {timestamp}_{name}_{job_id}.txt: top functions by cumulative and own time, the
+  allocation sites that grew the most and the peak traced memory
+
+Only the newest PROFILE_MAX_REPORTS jobs (default 10) are kept per user.
+
+The event loop thread is shared, so its profile also includes whatever else the
+loop ran meanwhile, and allocation figures cover the whole process. Profile on a
+quiet instance or a dedicated worker for clean numbers.
+"""
+import io
+import os
+import time
+import uuid
+import pstats
+import random
+import cProfile
+import logging
+import threading
+import functools
+import tracemalloc
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Optional
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+PROFILE_USER_IDS = {user_id.strip() for user_id in os.getenv("PROFILE_USER_IDS", "").split(",") if user_id.strip()}
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_MAX_REPORTS = int(os.getenv("PROFILE_MAX_REPORTS", "10"))
+# Rows per table in the text report
+REPORT_ROWS = 25
+
+_current_session = contextvars.ContextVar('current_profile_session', default=None)
+# Whether the current thread is already being profiled (by any session)
+_thread_state = threading.local()
+
+# tracemalloc is process-wide; it runs while any session is open
+_tracemalloc_lock = threading.Lock()
+_tracemalloc_users = 0
+# Whether this module turned tracemalloc on (rather than PYTHONTRACEMALLOC or -X tracemalloc)
+_tracemalloc_owned = False
+
+
+def should_profile(user_id) -> bool:
+    """Whether a job of this user should be profiled."""
+    if str(user_id) in PROFILE_USER_IDS:
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+def _start_tracemalloc() -> bool:
+    """
+    Make sure tracemalloc runs for a new session.
+
+    Returns:
+        bool: True if the session is the only one open, in which case the peak was
+            reset and covers just this session
+    """
+    global _tracemalloc_users, _tracemalloc_owned
+    with _tracemalloc_lock:
+        if _tracemalloc_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracemalloc_owned = True
+        _tracemalloc_users += 1
+        # Resetting under an open session would corrupt the peak it reports
+        sole = _tracemalloc_users == 1
+        if sole:
+            tracemalloc.reset_peak()
+        return sole
+
+
+def _stop_tracemalloc() -> None:
+    global _tracemalloc_users, _tracemalloc_owned
+    with _tracemalloc_lock:
+        _tracemalloc_users -= 1
+        # Tracing started outside this module is left running
+        if _tracemalloc_users == 0 and _tracemalloc_owned:
+            tracemalloc.stop()
+            _tracemalloc_owned = False
+
+
+def _take_snapshot() -> tracemalloc.Snapshot:
+    return tracemalloc.take_snapshot().filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<unknown>"),
+    ])
+
+
+class ProfileSession:
+    """CPU profiles and an allocation diff of one job, across the threads it uses."""
+
+    def __init__(self, name: str, user_id, job_id: Optional[str] = None):
+        self.name = name
+        self.user_id = user_id
+        self.job_id = job_id or uuid.uuid4().hex[:12]
+        self.closed = False
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+        self._profilers = []
+        self._threads = set()
+
+    @contextmanager
+    def profile_thread(self):
+        """Profile the current thread unless another session already does."""
+        if getattr(_thread_state, 'active', False) or self.closed:
+            yield
+            return
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Python 3.12+ allows only one active profiler per process
+            yield
+            return
+        _thread_state.active = True
+        try:
+            yield
+        finally:
+            profiler.disable()
+            _thread_state.active = False
+            with self._lock:
+                self._profilers.append(profiler)
+                self._threads.add(threading.current_thread().name)
+
+    def run(self, fn, *args, **kwargs):
+        """Run fn on the current thread under this session's profiler."""
+        with self.profile_thread():
+            return fn(*args, **kwargs)
+
+    def start(self) -> None:
+        self.started = time.perf_counter()
+        # With other sessions open the peak cannot be reset, so it is reported as process-wide
+        self.peak_is_own = _start_tracemalloc()
+        self._start_snapshot = _take_snapshot()
+
+    def finish(self) -> None:
+        """Stop collecting and write the reports."""
+        self.closed = True
+        self.wall = time.perf_counter() - self.started
+        try:
+            self._end_snapshot = _take_snapshot()
+            self.peak_bytes = tracemalloc.get_traced_memory()[1]
+        finally:
+            _stop_tracemalloc()
+        self.write_reports()
+
+    def _stats(self) -> Optional[pstats.Stats]:
+        with self._lock:
+            profilers = list(self._profilers)
+        if not profilers:
+            return None
+        stats = pstats.Stats(profilers[0], stream=io.StringIO())
+        for profiler in profilers[1:]:
+            stats.add(profiler)
+        return stats
+
+    def _format_stats(self, stats: pstats.Stats, sort: str) -> str:
+        stream = io.StringIO()
+        stats.stream = stream
+        stats.sort_stats(sort).print_stats(REPORT_ROWS)
+        return stream.getvalue()
+
+    def write_reports(self) -> None:
+        """Write the .prof and .txt reports and prune the user's old ones."""
+        directory = f"data/scripts/{self.user_id}/profiles"
+        os.makedirs(directory, exist_ok=True)
+        base = f"{directory}/{datetime.now().strftime('%Y%m%d_%H%M%S')}_{self.name}_{self.job_id}"
+
+        stats = self._stats()
+        if stats is not None:
+            stats.dump_stats(f"{base}.prof")
+
+        growth = self._end_snapshot.compare_to(self._start_snapshot, 'lineno')
+        lines = [
+            f"Profile of {self.name} job {self.job_id} for user {self.user_id}",
+            f"Wall time: {self.wall:.2f}s",
+            f"Threads profiled: {', '.join(sorted(self._threads)) or 'none'}",
+            f"Peak traced memory: {self.peak_bytes / 1024 / 1024:.1f} MiB"
+            + ("" if self.peak_is_own else " (process-wide; other profiled jobs were running)"),
+            "",
+        ]
+        if stats is not None:
+            lines += ["== Top functions by cumulative time ==", self._format_stats(stats, 'cumulative')]
+            lines += ["== Top functions by own time ==", self._format_stats(stats, 'tottime')]
+        lines.append("== Top allocation growth by line ==")
+        lines += [str(stat) for stat in growth[:REPORT_ROWS]]
+        with open(f"{base}.txt", 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+
+        logger.info(f"Wrote {self.name} profile for user {self.user_id} to {base}.txt ({self.wall:.2f}s)")
+        prune_reports(directory)
+
+
+def prune_reports(directory: str, keep: Optional[int] = None) -> int:
+    """
+    Keep the reports of the newest `keep` jobs in a profiles directory.
+
+    Args:
+        directory (str): data/scripts/{user_id}/profiles
+        keep (int, optional): Jobs to keep (defaults to PROFILE_MAX_REPORTS)
+
+    Returns:
+        int: Number of files removed
+    """
+    keep = PROFILE_MAX_REPORTS if keep is None else keep
+    try:
+        filenames = os.listdir(directory)
+    except FileNotFoundError:
+        return 0
+    # Report names start with their timestamp, so they sort oldest first
+    jobs = sorted({os.path.splitext(filename)[0] for filename in filenames})
+    removed = 0
+    for job in jobs[:max(len(jobs) - keep, 0)]:
+        for extension in ('.prof', '.txt'):
+            try:
+                os.remove(os.path.join(directory, job + extension))
+                removed += 1
+            except FileNotFoundError:
+                pass
+    return removed
+
+
+@contextmanager
+def profile(name: str, user_id, job_id: Optional[str] = None):
+    """
+    Profile a job if its user is flagged or it is sampled; a no-op otherwise.
+
+    Args:
+        name (str): Job name used in the report file names, e.g. 'generate'
+        user_id: Telegram user ID; reports go under the user's script directory
+        job_id (str, optional): Included in the report names (defaults to a random ID)
+
+    Yields:
+        ProfileSession or None if the job is not profiled
+    """
+    if _current_session.get() is not None or not should_profile(user_id):
+        yield None
+        return
+
+    session = ProfileSession(name, user_id, job_id)
+    session.start()
+    token = _current_session.set(session)
+    try:
+        with session.profile_thread():
+            yield session
+    finally:
+        _current_session.reset(token)
+        try:
+            session.finish()
+        except Exception as e:
+            # A broken report must not fail the job
+            logger.warning(f"Could not write {name} profile for user {user_id}: {str(e)}")
+
+
+def profiled(name: str, user_id_of):
+    """
+    Decorator profiling calls of an async function (see profile).
+
+    Args:
+        name (str): Job name
+        user_id_of (callable): Returns the user ID from the function's arguments
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with profile(name, user_id_of(*args, **kwargs)):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def in_session(fn):
+    """
+    Bind fn to the current profile session, so it is profiled on whichever thread runs it.
+
+    Returns fn unchanged outside a session.
+    """
+    session = _current_session.get()
+    if session is None or session.closed:
+        return fn
+    return functools.partial(session.run, fn)
+
+
+# Threads started through ContextThreadPoolExecutor join the submitter's session
+metrics.register_task_wrapper(in_session)
@@ -6,12 +6,21 @@ It interacts with the OpenRouter API to create summaries with specific, compelli
 """
 import os
 import json
+import time
+import queue
 import logging
 import re
+import threading
 from datetime import datetime
-import requests
 from dotenv import load_dotenv
 
+from llm_client import LLMClient, LLMError, CircuitOpenError
+from model_router import ModelRouter
+from llm_scheduler import LLMScheduler, estimate_tokens
+from stage_timer import stage
+from metrics import ContextThreadPoolExecutor
+from script_model import HOST, COHOST, Script, Section, Span, Turn, parse_dialogue, parse_spans, split_dialogue
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -19,10 +28,15 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
+
+class _StreamAbandoned(Exception):
+    """Raised on a stream thread when the consumer stopped reading."""
+
+
 class ScriptGenerator:
     """Generate podcast scripts from processed content using AI."""
 
-    def __init__(self):
+    def __init__(self, llm_client=None, scheduler=None, router=None):
         # Get API key from environment variable or use the one from the spec if not set
         self.api_key = os.getenv(
             "OPENROUTER_API_KEY", 
@@ -30,6 +44,26 @@ class ScriptGenerator:
         )
         self.api_url = "https://openrouter.ai/api/v1/chat/completions"
 
+        # Shared pooled client with timeouts, retries and a circuit breaker
+        hedge_after = os.getenv("LLM_HEDGE_AFTER_SECONDS")
+        self.llm_client = llm_client or LLMClient(
+            api_key=self.api_key,
+            api_url=self.api_url,
+            hedge_after=float(hedge_after) if hedge_after else None
+        )
+
+        # Provider-wide fair-share budget shared by every user's LLM calls
+        self.scheduler = scheduler or LLMScheduler(
+            requests_per_minute=int(os.getenv("LLM_REQUESTS_PER_MINUTE", "60")),
+            tokens_per_minute=int(os.getenv("LLM_TOKENS_PER_MINUTE", "200000")),
+            max_concurrent=int(os.getenv("LLM_MAX_CONCURRENT", "4"))
+        )
+        # Streamed responses are read on these threads, so a scheduler slot is held only
+        # while the provider is sending, never while the consumer handles a delta
+        self._stream_pool = ContextThreadPoolExecutor(
+            max_workers=int(os.getenv("LLM_STREAM_THREADS", "16")), thread_name_prefix="llm-stream"
+        )
+
         # Intro with HTML formatting - shorter and more direct
         self.intro = (
             "<b>Host:</b> Welcome to <b>triage.fm</b>, your personal podcast delivery service! I'm Donna, your host to dive into your notes and read-it-laters to zero your inbox.\n\n"
@@ -42,16 +76,17 @@ class ScriptGenerator:
             "<b>Co-host:</b> We hope this helped you decide what's worth your full attention. Stay tuned to triage.fm!"
         )
 
-        # Section header template - using normal string without curly braces
-        # We'll use str.format() method to insert values later
-        self.section_header = "\n<b>Host:</b> Let's look at \"<b>{0}</b>\" by <i>{1}</i>:"
+        # Parse the fixed parts once; every episode reuses the same turns
+        self.intro_turns = parse_dialogue(self.intro, Section(kind='intro'))
+        self.outro_turns = parse_dialogue(self.outro, Section(kind='outro'))
 
         # Speaker names
         self.host = "Host"
         self.cohost = "Co-host"
+        self.speaker_labels = {HOST: self.host, COHOST: self.cohost}
 
-        # Use a more cost-effective model
-        self.model = "meta-llama/llama-3-8b-instruct"  # Much cheaper than Claude
+        # Models are chosen per request from input size and live latency/error stats
+        self.router = router or ModelRouter.from_env()
 
     def generate_script(self, user_id, content_items, language="english"):
         """
@@ -63,95 +98,28 @@ class ScriptGenerator:
             language (str): Script language (only english supported in this version)
 
         Returns:
-            tuple: (formatted_script, plain_script, tts_script) where:
-                - formatted_script has HTML formatting for display
-                - plain_script has no formatting for general use
-                - tts_script has no speaker names or formatting for TTS
+            Script: Structured script; render it with to_html(), to_plain()
+                or to_tts_segments(), or pass it to TTSProcessor directly
         """
-        script_parts = [self.intro, ""]  # Empty line after intro
-
-        # Process each content item
-        for index, item in enumerate(content_items):
-            # Generate a summary for the item
-            summary = self._generate_summary(item, index)
-
-            # Ensure proper HTML format
-            summary = self._ensure_html_format(summary)
-
-            # Format the item section
-            title = item.get('title', 'Untitled Content')
-            author = item.get('author', 'Unknown Author')
-
-            # Create a section header with HTML formatting
-            # Use the .format() method to insert title and author
-            section_header = self.section_header.format(title, author)
+        return self.generate_script_streaming(user_id, content_items, on_turn=None, language=language, stream=False)
 
-            # Add the section to the script
-            script_parts.append(section_header)
-            script_parts.append(summary)
-            script_parts.append("")  # Empty line for separation
-
-        # Add outro
-        script_parts.append(self.outro)
-
-        # Combine all parts to create the formatted script (with HTML formatting)
-        formatted_script = "\n".join(script_parts)
-
-        # Create a plain text version by removing formatting markers
-        plain_script = self._remove_html_formatting(formatted_script)
-
-        # Create a TTS version by removing speaker names and formatting
-        tts_script = self._create_tts_script(formatted_script)
-
-        return formatted_script, plain_script, tts_script
-
-    def _remove_html_formatting(self, text):
-        """
-        Remove HTML formatting markers from text.
-
-        Args:
-            text (str): Text with HTML formatting
-
-        Returns:
-            str: Plain text without formatting markers
+    def _section_header(self, section):
         """
-        # Remove HTML tags
-        plain_text = re.sub(r'<[^>]+>', '', text)
-        return plain_text
-
-    def _create_tts_script(self, text):
-        """
-        Create a script suitable for TTS by removing speaker names and formatting.
+        Build the host's spoken introduction to an item section.
 
         Args:
-            text (str): Original script with HTML formatting
+            section (Section): The item's section metadata
 
         Returns:
-            str: Script ready for TTS
+            Turn: 'Let's look at "<title>" by <author>:'
         """
-        # Create patterns to match the speaker prefixes with HTML tags
-        host_pattern = re.compile(rf'<b>{self.host}:</b>\s*')
-        cohost_pattern = re.compile(rf'<b>{self.cohost}:</b>\s*')
-
-        # Remove speaker names
-        text_without_speakers = text
-        text_without_speakers = host_pattern.sub('### HOST: ', text_without_speakers)
-        text_without_speakers = cohost_pattern.sub('### COHOST: ', text_without_speakers)
-
-        # Remove all HTML tags but keep the speaker markers
-        tts_script = re.sub(r'<[^>]+>', '', text_without_speakers)
-
-        # Add proper punctuation for better TTS pacing
-        # Add periods at the end of lines that don't end with punctuation
-        lines = tts_script.split('\n')
-        for i, line in enumerate(lines):
-            line = line.strip()
-            if line and not line[-1] in '.!?":;,':
-                lines[i] = line + '.'
-
-        tts_script = '\n'.join(lines)
-
-        return tts_script
+        return Turn(HOST, [
+            Span("Let's look at \""),
+            Span(section.title, bold=True),
+            Span("\" by "),
+            Span(section.author, italic=True),
+            Span(":")
+        ], section)
 
     def _ensure_html_format(self, text):
         """
@@ -186,16 +154,16 @@ class ScriptGenerator:
 
         return text
 
-    def _generate_summary(self, content_item, item_index):
+    def _build_summary_request(self, content_item, item_index):
         """
-        Generate a summary of a content item using OpenRouter API.
+        Build the OpenRouter request for an item's dialogue segment.
 
         Args:
             content_item (dict): Content item dictionary
             item_index (int): Index of the item in the content list
 
         Returns:
-            str: Generated summary
+            tuple: (data, first_speaker, second_speaker)
         """
         content = content_item.get('content', '')
         content_type = content_item.get('content_type', 'unknown')
@@ -273,69 +241,238 @@ class ScriptGenerator:
             f"\n\nContent: {content}"
         )
 
-        try:
-            # Call the OpenRouter API
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
+        data = {
+            "messages": [
+                {"role": "system", "content": system_message},
+                {"role": "user", "content": user_message}
+            ],
+            "max_tokens": 300,  # Reduced token count for shorter summaries
+            "temperature": 0.7  # Add temperature control (0.7 is a good balance between creativity and consistency)
+        }
 
-            data = {
-                "messages": [
-                    {"role": "system", "content": system_message},
-                    {"role": "user", "content": user_message}
-                ],
-                "model": self.model,
-                "max_tokens": 300,  # Reduced token count for shorter summaries
-                "temperature": 0.7  # Add temperature control (0.7 is a good balance between creativity and consistency)
-            }
+        return data, first_speaker, second_speaker
+
+    def _fallback_summary(self, content_item, first_speaker, second_speaker):
+        """Create fallback summary with proper HTML formatting - very short version."""
+        title = content_item.get('title', 'Untitled Content')
+        return (
+            f"<b>{first_speaker}:</b> This content is about {title}.\n\n"
+            f"<b>{second_speaker}:</b> Due to technical issues, we couldn't analyze it fully, but you might want to check it out when you have time."
+        )
+
+    def _generate_summary(self, content_item, item_index, user_id=None, weight=1.0):
+        """
+        Generate a summary of a content item using OpenRouter API.
+
+        Args:
+            content_item (dict): Content item dictionary
+            item_index (int): Index of the item in the content list
+            user_id (int): Telegram user ID, used for fair scheduling
+            weight (float): Scheduler weight; lower values give lower priority
+
+        Returns:
+            tuple: (summary, ok) where ok is False if the fallback summary was used
+        """
+        data, first_speaker, second_speaker = self._build_summary_request(content_item, item_index)
 
-            response = requests.post(self.api_url, headers=headers, json=data)
-            response.raise_for_status()
+        try:
+            # Call the OpenRouter API
+            if user_id is None:
+                user_id = content_item.get('user_id')
+            response_data = self._complete('dialogue', data, user_id, weight)
 
             # Extract the summary from the response
-            response_data = response.json()
             summary = response_data['choices'][0]['message']['content']
 
-            return summary
+            return summary, True
 
         except Exception as e:
             logger.error(f"Error generating summary with OpenRouter: {str(e)}")
+            return self._fallback_summary(content_item, first_speaker, second_speaker), False
+
+    def _stream_summary(self, content_item, item_index, user_id, section, on_turn, weight=1.0):
+        """
+        Stream a summary from OpenRouter, handing each finished speaker turn to `on_turn`.
+
+        Args:
+            content_item (dict): Content item dictionary
+            item_index (int): Index of the item in the content list
+            user_id (int): Telegram user ID, used for fair scheduling
+            section (Section): Section metadata attached to the turns
+            on_turn (callable): Called with every completed Turn
+            weight (float): Scheduler weight; lower values give lower priority
+
+        Returns:
+            bool: True if the whole dialogue came from the model, False if it was
+                cut short or replaced by the fallback summary
+        """
+        data, first_speaker, second_speaker = self._build_summary_request(content_item, item_index)
+        first_code = HOST if first_speaker == self.host else COHOST
+        received = ""
+        # Raw offset where the first turn not yet handed to on_turn begins; only the
+        # text after it is ever scanned or formatted again
+        start = 0
+        emitted = 0
+
+        # Speaker labels as the model writes them, before Markdown is converted to HTML
+        alternatives = '|'.join(re.escape(label) for label in self.speaker_labels.values())
+        label_pattern = re.compile(rf'<b>(?:{alternatives}):</b>|\*(?:{alternatives}):\*')
+        max_label_length = max(len(label) for label in self.speaker_labels.values()) + len('<b>:</b>')
+
+        def split_turns(text):
+            return split_dialogue(self._ensure_html_format(text), self.speaker_labels, first_code)
+
+        if user_id is None:
+            user_id = content_item.get('user_id')
+        deltas = self._stream_completion('dialogue', data, user_id, weight)
+        error = None
+        try:
+            while True:
+                # Only failures of the stream itself lead to the fallback; errors raised
+                # by on_turn propagate to the caller
+                try:
+                    delta = next(deltas)
+                except StopIteration:
+                    break
+                except Exception as e:
+                    error = e
+                    break
+
+                # A label may straddle the previous delta, so look back by one label length
+                search_from = max(start + 1, len(received) - max_label_length)
+                received += delta
+                boundary = None
+                for match in label_pattern.finditer(received, search_from):
+                    boundary = match.start()
+                if boundary is None:
+                    continue
+                # Everything before the newest label is finished turns
+                for speaker, text in split_turns(received[start:boundary]):
+                    on_turn(Turn(speaker, parse_spans(text), section))
+                    emitted += 1
+                start = boundary
+        finally:
+            deltas.close()
+
+        if error is None and not received.strip():
+            error = Exception("Empty response from OpenRouter")
+
+        if error is not None:
+            logger.error(f"Error streaming summary with OpenRouter: {str(error)}")
+            if emitted:
+                # Part of the dialogue was already spoken; drop the unfinished turn
+                return False
+            tail = self._fallback_summary(content_item, first_speaker, second_speaker)
+            ok = False
+        else:
+            tail = received[start:]
+            ok = True
+
+        for speaker, text in split_turns(tail):
+            on_turn(Turn(speaker, parse_spans(text), section))
+        return ok
+
+    def generate_script_streaming(self, user_id, content_items, on_turn, language="english", stream=True):
+        """
+        Generate a podcast script while handing each finished speaker turn to `on_turn`.
 
-            # Create fallback summary with proper HTML formatting - very short version
-            fallback_summary = (
-                f"<b>{first_speaker}:</b> This content is about {title}.\n\n"
-                f"<b>{second_speaker}:</b> Due to technical issues, we couldn't analyze it fully, but you might want to check it out when you have time."
-            )
+        The caller can start speech synthesis for a turn as soon as it is complete,
+        so TTS runs concurrently with the remaining LLM calls.
 
-            return fallback_summary
+        Args:
+            user_id (int): Telegram user ID
+            content_items (list): List of content item dictionaries
+            on_turn (callable): Called with each completed Turn (may be None)
+            language (str): Script language (only english supported in this version)
+            stream (bool): Stream LLM responses; if False each summary is requested in one call
+
+        Returns:
+            Script: The complete structured script
+        """
+        script = Script(labels=dict(self.speaker_labels))
 
-    def generate_content_summary(self, content_item):
-        """Generate a 1-2 sentence summary of content."""
+        def emit(turn):
+            script.turns.append(turn)
+            if on_turn is not None:
+                on_turn(turn)
+
+        for turn in self.intro_turns:
+            emit(turn)
+
+        # Process each content item
+        for index, item in enumerate(content_items):
+            self.generate_section(user_id, item, index, emit, stream=stream)
+
+        for turn in self.outro_turns:
+            emit(turn)
+
+        return script
+
+    def generate_section(self, user_id, content_item, item_index, on_turn, stream=True, weight=1.0):
+        """
+        Generate one item's section: the host's header turn, then the dialogue.
+
+        Args:
+            user_id (int): Telegram user ID
+            content_item (dict): Content item dictionary
+            item_index (int): Index of the item in the episode
+            on_turn (callable): Called with each completed Turn
+            stream (bool): Stream the LLM response
+            weight (float): Scheduler weight; lower values give lower priority
+
+        Returns:
+            bool: True if the dialogue came from the model, False if a fallback
+                (or a partial dialogue) was used and the section is worth retrying
+        """
+        section = Section(
+            kind='item',
+            index=item_index,
+            title=content_item.get('title', 'Untitled Content'),
+            author=content_item.get('author', 'Unknown Author'),
+            content_id=content_item.get('id')
+        )
+
+        # The section header is spoken before the summary arrives
+        on_turn(self._section_header(section))
+
+        if stream:
+            return self._stream_summary(content_item, item_index, user_id, section, on_turn, weight)
+
+        summary, ok = self._generate_summary(content_item, item_index, user_id, weight)
+        summary = self._ensure_html_format(summary)
+        first_speaker = HOST if item_index % 2 == 0 else COHOST
+        for turn in parse_dialogue(summary, section, self.speaker_labels, first_speaker):
+            on_turn(turn)
+        return ok
+
+    def generate_content_summary(self, content_item, user_id=None, weight=1.0):
+        """
+        Generate a 1-2 sentence summary of content.
+
+        Args:
+            content_item (dict): Content item dictionary
+            user_id: Fair-scheduling key (defaults to the item's user)
+            weight (float): Scheduler weight; lower values give lower priority
+        """
         logger.info("Generating content summary")
         try:
-            api_key = os.getenv('OPENROUTER_API_KEY')
-            if not api_key:
+            if not os.getenv('OPENROUTER_API_KEY'):
                 raise Exception("OpenRouter API key not found")
 
-            url = "https://openrouter.ai/api/v1/chat/completions"
-            headers = {
-                "Authorization": f"Bearer {api_key}",
-                "HTTP-Referer": os.getenv('OPENROUTER_SITE_URL', 'https://github.com'),
-                "Content-Type": "application/json"
-            }
+            # Never send more than the largest model in the chain can take
+            content = content_item.get('content', '')
+            content = content[:max(max_chars for _, max_chars in self.router.chains['summary'])]
 
             prompt = f"""Summarize this content in 1-2 concise sentences:
-{content_item.get('content', '')}"""
+{content}"""
 
             data = {
-                "model": "mistralai/mistral-7b-instruct",
                 "messages": [{"role": "user", "content": prompt}]
             }
 
-            response = requests.post(url, headers=headers, json=data)
-            response.raise_for_status()
-            result = response.json()
+            if user_id is None:
+                user_id = content_item.get('user_id')
+            result = self._complete('summary', data, user_id, weight)
 
             # Handle the response correctly
             if 'choices' in result and len(result['choices']) > 0:
@@ -350,6 +487,123 @@ class ScriptGenerator:
             logger.error(f"Error generating summary with OpenRouter: {str(e)}")
             return self._generate_basic_summary(content_item)
 
+    def _complete(self, task, data, user_id, weight=1.0):
+        """
+        Run a chat completion, failing over along the task's model chain.
+
+        Args:
+            task (str): 'dialogue' or 'summary'
+            data (dict): Request body without a model
+            user_id (int): Telegram user ID, used for fair scheduling
+            weight (float): Scheduler weight; lower values give lower priority
+
+        Returns:
+            dict: Parsed API response
+
+        Raises:
+            LLMError: If every model in the chain failed
+        """
+        last_error = None
+        prompt_chars = sum(len(message['content']) for message in data['messages'])
+        for model in self.router.candidates(task, prompt_chars):
+            payload = dict(data, model=model)
+            with self.scheduler.slot(user_id, estimate_tokens(payload), weight) as ticket:
+                start = time.monotonic()
+                try:
+                    with stage('llm_call'):
+                        result = self.llm_client.chat_completion(payload, deadline=self.router.attempt_deadline())
+                except CircuitOpenError as e:
+                    last_error = e
+                    continue
+                except LLMError as e:
+                    self.router.record(model, time.monotonic() - start, False)
+                    last_error = e
+                    continue
+                ticket.record_usage(result.get('usage'))
+            self.router.record(model, time.monotonic() - start, True)
+            return result
+
+        raise LLMError(f"All {task} models failed: {str(last_error)}")
+
+    def _stream_completion(self, task, data, user_id, weight=1.0):
+        """
+        Stream a chat completion, failing over along the model chain until output starts.
+
+        The response is read on a stream thread and handed over through a queue, so
+        the caller's work between deltas neither holds a scheduler slot nor counts
+        towards the model's latency or the 'llm_call' stage.
+
+        Args:
+            task (str): 'dialogue' or 'summary'
+            data (dict): Request body without a model
+            user_id (int): Telegram user ID, used for fair scheduling
+            weight (float): Scheduler weight; lower values give lower priority
+
+        Yields:
+            str: Completion text deltas
+
+        Raises:
+            LLMError: If every model failed, or the stream broke off after it started
+        """
+        deltas = queue.Queue()
+        abandoned = threading.Event()
+        finished = object()
+
+        def emit(delta):
+            if abandoned.is_set():
+                raise _StreamAbandoned()
+            deltas.put(delta)
+
+        def produce():
+            try:
+                self._read_stream(task, data, user_id, weight, emit)
+                deltas.put(finished)
+            except _StreamAbandoned:
+                pass
+            except Exception as e:
+                deltas.put(e)
+
+        self._stream_pool.submit(produce)
+        try:
+            while True:
+                item = deltas.get()
+                if item is finished:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            # Stops the reader at its next delta if the caller gave up early
+            abandoned.set()
+
+    def _read_stream(self, task, data, user_id, weight, emit):
+        """Read a streamed completion with failover, passing each delta to `emit`."""
+        last_error = None
+        prompt_chars = sum(len(message['content']) for message in data['messages'])
+        for model in self.router.candidates(task, prompt_chars):
+            payload = dict(data, model=model)
+            started = False
+            with self.scheduler.slot(user_id, estimate_tokens(payload), weight):
+                start = time.monotonic()
+                try:
+                    with stage('llm_call'):
+                        for delta in self.llm_client.stream_chat_completion(payload, deadline=self.router.attempt_deadline()):
+                            started = True
+                            emit(delta)
+                except CircuitOpenError as e:
+                    last_error = e
+                    continue
+                except LLMError as e:
+                    self.router.record(model, time.monotonic() - start, False)
+                    if started:
+                        raise
+                    last_error = e
+                    continue
+            self.router.record(model, time.monotonic() - start, True)
+            return
+
+        raise LLMError(f"All {task} models failed: {str(last_error)}")
+
     def _generate_basic_summary(self, content_item):
         """Generate a basic summary when OpenRouter fails."""
         content = content_item.get('content', '')
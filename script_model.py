@@ -0,0 +1,215 @@
+"""
+Script Model Module
+
+This module defines the structured podcast script: a list of speaker turns made of
+formatted text spans, each tagged with the section it belongs to. A script is built
+once and rendered to HTML, plain text and TTS segments without re-parsing strings.
+"""
+import re
+from dataclasses import asdict, dataclass, field
+from html import escape, unescape
+from typing import Dict, List, Optional
+
+# Speaker codes used throughout the pipeline
+HOST = 'HOST'
+COHOST = 'COHOST'
+
+DEFAULT_SPEAKER_LABELS = {HOST: 'Host', COHOST: 'Co-host'}
+
+# Matches the only formatting tags the script uses
+_TAG_PATTERN = re.compile(r'<(/?)([bi])>')
+_ANY_TAG_PATTERN = re.compile(r'<[^>]+>')
+
+# Characters that already end a line for TTS pacing
+_LINE_END_PUNCTUATION = '.!?":;,'
+
+
+@dataclass
+class Span:
+    """A run of text with uniform formatting."""
+    text: str
+    bold: bool = False
+    italic: bool = False
+
+    def to_html(self) -> str:
+        html = escape(self.text, quote=False)
+        if self.italic:
+            html = f"<i>{html}</i>"
+        if self.bold:
+            html = f"<b>{html}</b>"
+        return html
+
+
+@dataclass
+class Section:
+    """Where a turn belongs in the episode."""
+    kind: str  # 'intro', 'item' or 'outro'
+    index: Optional[int] = None
+    title: Optional[str] = None
+    author: Optional[str] = None
+    content_id: Optional[str] = None
+
+
+@dataclass
+class Turn:
+    """One speaker's uninterrupted contribution."""
+    speaker: str
+    spans: List[Span]
+    section: Optional[Section] = None
+
+    @property
+    def text(self) -> str:
+        """The turn's text without formatting."""
+        return ''.join(span.text for span in self.spans)
+
+    def to_html(self, labels: Dict[str, str] = DEFAULT_SPEAKER_LABELS) -> str:
+        body = ''.join(span.to_html() for span in self.spans)
+        return f"<b>{labels[self.speaker]}:</b> {body}"
+
+    def to_plain(self, labels: Dict[str, str] = DEFAULT_SPEAKER_LABELS) -> str:
+        return f"{labels[self.speaker]}: {self.text}"
+
+    def to_tts(self) -> str:
+        """
+        Render the turn as a single line for speech synthesis.
+
+        Lines that lack ending punctuation get a period so TTS pauses naturally.
+        """
+        lines = []
+        for line in self.text.split('\n'):
+            line = line.strip()
+            if line:
+                if line[-1] not in _LINE_END_PUNCTUATION:
+                    line += '.'
+                lines.append(line)
+        return ' '.join(lines)
+
+    def to_dict(self) -> dict:
+        """Serialize to plain data (for JSON checkpoints)."""
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Turn":
+        """Rebuild a turn serialized with to_dict."""
+        section = Section(**data['section']) if data.get('section') else None
+        return cls(data['speaker'], [Span(**span) for span in data['spans']], section)
+
+
+@dataclass
+class Script:
+    """A complete podcast script."""
+    turns: List[Turn] = field(default_factory=list)
+    labels: Dict[str, str] = field(default_factory=lambda: dict(DEFAULT_SPEAKER_LABELS))
+
+    def to_html(self) -> str:
+        """Render with HTML formatting for display."""
+        return '\n\n'.join(turn.to_html(self.labels) for turn in self.turns)
+
+    def to_plain(self) -> str:
+        """Render without formatting markers."""
+        return '\n\n'.join(turn.to_plain(self.labels) for turn in self.turns)
+
+    def to_tts_segments(self) -> List[dict]:
+        """
+        Render as TTS segments.
+
+        Returns:
+            list: [{'speaker': 'HOST'|'COHOST', 'text': str}, ...] for non-empty turns
+        """
+        segments = []
+        for turn in self.turns:
+            text = turn.to_tts()
+            if text:
+                segments.append({'speaker': turn.speaker, 'text': text})
+        return segments
+
+    def to_tts_text(self) -> str:
+        """Render the TTS segments with speaker markers, for archiving."""
+        return '\n'.join(f"### {segment['speaker']}: {segment['text']}" for segment in self.to_tts_segments())
+
+
+def parse_spans(html: str) -> List[Span]:
+    """
+    Parse text containing <b>/<i> tags into spans in a single scan.
+
+    Any other tags are dropped and entities are decoded, so the spans hold plain
+    text that to_html() escapes exactly once.
+
+    Args:
+        html (str): Formatted text
+
+    Returns:
+        list: Span objects in order
+    """
+    spans = []
+    bold = italic = False
+    position = 0
+
+    for match in _TAG_PATTERN.finditer(html):
+        if match.start() > position:
+            text = unescape(_ANY_TAG_PATTERN.sub('', html[position:match.start()]))
+            if text:
+                spans.append(Span(text, bold, italic))
+        opening = match.group(1) == ''
+        if match.group(2) == 'b':
+            bold = opening
+        else:
+            italic = opening
+        position = match.end()
+
+    text = unescape(_ANY_TAG_PATTERN.sub('', html[position:]))
+    if text:
+        spans.append(Span(text, bold, italic))
+    return spans
+
+
+def split_dialogue(html: str, labels: Dict[str, str], default_speaker: str) -> List[tuple]:
+    """
+    Split formatted dialogue at speaker labels such as "<b>Host:</b>".
+
+    Args:
+        html (str): Dialogue text
+        labels (dict): Speaker code -> display label
+        default_speaker (str): Speaker code for any text before the first label
+
+    Returns:
+        list: (speaker_code, html_text) tuples; when `html` is still being
+            streamed, the last one may be incomplete
+    """
+    codes = {label: code for code, label in labels.items()}
+    alternatives = '|'.join(re.escape(label) for label in labels.values())
+    label_pattern = re.compile(rf'<b>({alternatives}):</b>')
+
+    turns = []
+    matches = list(label_pattern.finditer(html))
+
+    preamble = html[:matches[0].start()] if matches else html
+    if preamble.strip():
+        turns.append((default_speaker, preamble.strip()))
+
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(html)
+        turns.append((codes[match.group(1)], html[match.end():end].strip()))
+
+    return turns
+
+
+def parse_dialogue(html: str, section: Optional[Section] = None,
+                   labels: Dict[str, str] = DEFAULT_SPEAKER_LABELS,
+                   default_speaker: str = HOST) -> List[Turn]:
+    """
+    Parse formatted dialogue into turns.
+
+    Args:
+        html (str): Dialogue text with speaker labels
+        section (Section, optional): Section the turns belong to
+        labels (dict): Speaker code -> display label
+        default_speaker (str): Speaker code for text before the first label
+
+    Returns:
+        list: Turn objects
+    """
+    return [
+        Turn(speaker, parse_spans(text), section)
+        for speaker, text in split_dialogue(html, labels, default_speaker)
+    ]
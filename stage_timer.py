@@ -0,0 +1,95 @@
+"""
+Stage Timer Module
+
+Lightweight per-stage timing for the audio pipeline. Code marks its stages with
+`stage(name)`; while a StageTimer is collecting, each stage's wall time and the
+CPU time of the thread running it are accumulated. With no timer collecting,
+`stage` costs one list check. Long-lived collectors (the metrics module) are
+added with `register_collector`.
+
+    with StageTimer() as timer:
+        processor.generate_audio(script)
+    print(timer.report())
+"""
+import time
+import threading
+from contextlib import contextmanager
+
+# Timers currently collecting
+_active = []
+
+
+def register_collector(collector) -> None:
+    """
+    Keep a collector receiving every stage from now on.
+
+    Args:
+        collector: Object with a record(name, wall, cpu) method, called from the stage's thread
+    """
+    _active.append(collector)
+
+
+@contextmanager
+def stage(name: str):
+    """
+    Mark a pipeline stage.
+
+    Stages should not nest, so that per-stage totals add up.
+
+    Args:
+        name (str): Stage name, e.g. 'synthesize' or 'encode'
+    """
+    if not _active:
+        yield
+        return
+
+    wall_start = time.perf_counter()
+    cpu_start = time.thread_time()
+    try:
+        yield
+    finally:
+        wall = time.perf_counter() - wall_start
+        cpu = time.thread_time() - cpu_start
+        for timer in list(_active):
+            timer.record(name, wall, cpu)
+
+
+class StageTimer:
+    """Accumulates stage timings while active (use as a context manager)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}
+
+    def __enter__(self):
+        _active.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        _active.remove(self)
+
+    def record(self, name: str, wall: float, cpu: float) -> None:
+        """Add one stage execution."""
+        with self._lock:
+            totals = self._stages.setdefault(name, {'calls': 0, 'wall_seconds': 0.0, 'cpu_seconds': 0.0})
+            totals['calls'] += 1
+            totals['wall_seconds'] += wall
+            totals['cpu_seconds'] += cpu
+
+    def report(self) -> dict:
+        """
+        Summarize the collected stages.
+
+        Returns:
+            dict: stage name -> {calls, wall_seconds, cpu_seconds}; wall time of
+                stages running on parallel workers adds up across threads
+        """
+        with self._lock:
+            return {
+                name: {
+                    'calls': totals['calls'],
+                    'wall_seconds': round(totals['wall_seconds'], 4),
+                    'cpu_seconds': round(totals['cpu_seconds'], 4)
+                }
+                for name, totals in sorted(self._stages.items())
+            }
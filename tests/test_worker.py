@@ -0,0 +1,105 @@
+"""
+Worker processes against a shared SQLite job queue (job_queue.py, worker.py).
+
+The workers are started with the spawn context, as in production, and run a
+sleep-bound handler that stands in for the LLM and TTS API calls.
+"""
+import os
+import signal
+import time
+import asyncio
+import multiprocessing
+
+from job_queue import JobQueue
+from worker import Worker
+
+LEASE_SECONDS = 1.0
+
+
+async def record_job(payload: dict) -> None:
+    """Wait like an API-bound job, then record that the job ran to completion."""
+    await asyncio.sleep(payload['seconds'])
+    # O_APPEND writes of one short line are atomic across processes
+    with open(payload['log'], 'a') as log:
+        log.write(f"{payload['n']}\n")
+
+
+def worker_process(queue_path: str) -> None:
+    queue = JobQueue(queue_path, lease_seconds=LEASE_SECONDS)
+    worker = Worker(queue, {'record': record_job}, poll_seconds=0.05)
+    asyncio.run(worker.run(exit_when_idle=True))
+    queue.close()
+
+
+def fill_queue(tmp_path, jobs: int, seconds: float) -> tuple:
+    queue_path = str(tmp_path / "jobs.sqlite3")
+    log_path = str(tmp_path / "completed.log")
+    queue = JobQueue(queue_path, lease_seconds=LEASE_SECONDS)
+    for n in range(jobs):
+        queue.enqueue('record', {'n': n, 'seconds': seconds, 'log': log_path})
+    return queue, queue_path, log_path
+
+
+def start_workers(queue_path: str, workers: int) -> list:
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=worker_process, args=(queue_path,)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    return processes
+
+
+def drain(queue: JobQueue, queue_path: str, workers: int, kill_one: bool = False) -> float:
+    """Run workers until every job is finished; returns the wall-clock seconds."""
+    start = time.perf_counter()
+    processes = start_workers(queue_path, workers)
+    if kill_one:
+        victim = f":{processes[0].pid}"
+        deadline = time.monotonic() + 30
+        while not any(job.worker_id.endswith(victim) for job in queue.jobs('leased')):
+            assert time.monotonic() < deadline, "the worker never leased a job"
+            time.sleep(0.01)
+        os.kill(processes[0].pid, signal.SIGKILL)
+    for process in processes:
+        process.join(timeout=60)
+        assert not process.is_alive()
+
+    # The survivors exit once nothing is available; a job whose lease has not
+    # run out yet is left to a fresh worker
+    deadline = time.monotonic() + 30
+    while queue.counts()['queued'] or queue.counts()['leased']:
+        assert time.monotonic() < deadline, "jobs were never finished"
+        time.sleep(LEASE_SECONDS / 4)
+        for process in start_workers(queue_path, 1):
+            process.join(timeout=60)
+    return time.perf_counter() - start
+
+
+def completed(log_path: str) -> list:
+    with open(log_path) as log:
+        return sorted(int(line) for line in log)
+
+
+def test_killed_worker_job_is_retried_and_every_job_finishes_once(tmp_path):
+    queue, queue_path, log_path = fill_queue(tmp_path, jobs=6, seconds=0.5)
+
+    drain(queue, queue_path, workers=3, kill_one=True)
+
+    assert queue.counts() == {'queued': 0, 'leased': 0, 'done': 6, 'failed': 0}
+    assert completed(log_path) == list(range(6))
+    retried = [job for job in queue.jobs() if job.attempts > 1]
+    assert len(retried) == 1
+    assert retried[0].state == 'done'
+    queue.close()
+
+
+def test_more_workers_finish_sleep_bound_jobs_faster(tmp_path):
+    one_queue, one_path, one_log = fill_queue(tmp_path / "one", jobs=8, seconds=0.25)
+    many_queue, many_path, many_log = fill_queue(tmp_path / "many", jobs=8, seconds=0.25)
+
+    one_seconds = drain(one_queue, one_path, workers=1)
+    many_seconds = drain(many_queue, many_path, workers=4)
+
+    assert completed(one_log) == completed(many_log) == list(range(8))
+    assert many_seconds < one_seconds * 0.7, (one_seconds, many_seconds)
+    one_queue.close()
+    many_queue.close()
@@ -0,0 +1,213 @@
+"""
+TTS Engines Module
+
+Speech synthesis backends behind one interface. Every engine turns text into
+PCM audio (an AudioSegment) for a voice and declares its capabilities and the
+longest text it accepts per call.
+
+- gtts: Google Translate TTS (needs network)
+- espeak: local espeak-ng binary (offline)
+- synthetic: deterministic tones, for tests and load testing (offline, no dependencies)
+"""
+import io
+import os
+import math
+import array
+import struct
+import random
+import shutil
+import hashlib
+import logging
+import subprocess
+from gtts import gTTS
+from pydub import AudioSegment
+
+from stage_timer import stage
+
+logger = logging.getLogger(__name__)
+
+
+class TTSEngine:
+    """Base class for speech synthesis engines."""
+
+    name = "base"
+    # Capability flags, e.g. 'network', 'offline', 'deterministic', 'multilingual'
+    capabilities = frozenset()
+    # Longest text accepted by a single synthesize() call, in characters
+    max_text_length = 5000
+
+    def synthesize(self, text: str, voice: str) -> AudioSegment:
+        """
+        Synthesize speech.
+
+        Args:
+            text (str): Text already cleaned for TTS
+            voice (str): Voice or language code (e.g. 'en')
+
+        Returns:
+            AudioSegment: Decoded PCM audio
+        """
+        raise NotImplementedError
+
+
+class GTTSEngine(TTSEngine):
+    """Google Translate TTS via gTTS."""
+
+    name = "gtts"
+    capabilities = frozenset({'network', 'multilingual'})
+    # gTTS sends one request per ~100 characters, one after another; capping the
+    # text per call lets the processor spread a long turn over parallel calls
+    max_text_length = 500
+
+    def synthesize(self, text: str, voice: str) -> AudioSegment:
+        # Generate TTS into memory (no temp files)
+        mp3_buffer = io.BytesIO()
+        with stage('synthesize'):
+            tts = gTTS(text=text, lang=voice, slow=False)
+            tts.write_to_fp(mp3_buffer)
+        mp3_buffer.seek(0)
+
+        # Decode from memory; naming the codec skips pydub's ffprobe call,
+        # leaving a single piped ffmpeg process per segment
+        with stage('decode'):
+            return AudioSegment.from_file(mp3_buffer, format="mp3", codec="mp3")
+
+
+def _pcm_from_wav_bytes(data: bytes) -> AudioSegment:
+    """
+    Read WAV bytes written to a pipe.
+
+    Streaming writers cannot seek back to fill in chunk sizes, so the declared
+    data size is ignored and everything after the data chunk header is audio.
+    """
+    if data[:4] != b'RIFF' or data[8:12] != b'WAVE':
+        raise ValueError("Not a WAV stream")
+
+    position = 12
+    channels = sample_rate = sample_width = None
+    while position + 8 <= len(data):
+        chunk_id = data[position:position + 4]
+        chunk_size = struct.unpack('<I', data[position + 4:position + 8])[0]
+        if chunk_id == b'fmt ':
+            channels, sample_rate = struct.unpack('<HI', data[position + 10:position + 16])
+            sample_width = struct.unpack('<H', data[position + 22:position + 24])[0] // 8
+        elif chunk_id == b'data':
+            if channels is None:
+                raise ValueError("WAV data chunk before format chunk")
+            pcm = data[position + 8:]
+            frame_width = channels * sample_width
+            pcm = pcm[:len(pcm) - len(pcm) % frame_width]
+            return AudioSegment(data=pcm, sample_width=sample_width, frame_rate=sample_rate, channels=channels)
+        position += 8 + chunk_size + (chunk_size % 2)
+
+    raise ValueError("WAV stream has no data chunk")
+
+
+class EspeakEngine(TTSEngine):
+    """Offline synthesis with the espeak-ng command line tool."""
+
+    name = "espeak"
+    capabilities = frozenset({'offline', 'multilingual'})
+    max_text_length = 10000
+
+    def __init__(self, binary: str = None, words_per_minute: int = 165):
+        """
+        Args:
+            binary (str): espeak-ng executable (defaults to ESPEAK_BINARY or espeak-ng on PATH)
+            words_per_minute (int): Speaking rate
+        """
+        self.binary = binary or os.getenv("ESPEAK_BINARY") or shutil.which("espeak-ng") or "espeak-ng"
+        self.words_per_minute = words_per_minute
+
+    def synthesize(self, text: str, voice: str) -> AudioSegment:
+        # WAV goes to stdout; text is passed on stdin so it never touches the command line
+        with stage('synthesize'):
+            result = subprocess.run(
+                [self.binary, "-v", voice, "-s", str(self.words_per_minute), "--stdout"],
+                input=text.encode('utf-8'),
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                timeout=120,
+                check=False
+            )
+        if result.returncode != 0 or not result.stdout:
+            raise RuntimeError(f"espeak-ng failed: {result.stderr.decode(errors='ignore').strip()}")
+        with stage('decode'):
+            return _pcm_from_wav_bytes(result.stdout)
+
+
+class SyntheticEngine(TTSEngine):
+    """
+    Deterministic stand-in that renders text as a tone or as noise.
+
+    The pitch (or noise pattern) is derived from the text and voice, and the
+    duration grows with the text length like speech would, so pipeline timings
+    stay realistic.
+    """
+
+    name = "synthetic"
+    capabilities = frozenset({'offline', 'deterministic'})
+    max_text_length = 5000
+
+    def __init__(self, frame_rate: int = 24000, ms_per_char: float = 65.0, waveform: str = "tone"):
+        """
+        Args:
+            frame_rate (int): Output sample rate
+            ms_per_char (float): Audio length per character of text
+            waveform (str): 'tone' (sine) or 'noise' (broadband, exercises the filters harder)
+        """
+        if waveform not in ("tone", "noise"):
+            raise ValueError(f"Unknown waveform '{waveform}'")
+        self.frame_rate = frame_rate
+        self.ms_per_char = ms_per_char
+        self.waveform = waveform
+
+    def synthesize(self, text: str, voice: str) -> AudioSegment:
+        with stage('synthesize'):
+            digest = hashlib.sha256(f"{voice}:{text}".encode('utf-8')).digest()
+            if self.waveform == "noise":
+                # One deterministic block of noise, repeated
+                generator = random.Random(digest)
+                period = 4096
+                one_period = array.array('h', (int(generator.gauss(0, 3000)) for _ in range(period))).tobytes()
+            else:
+                # A whole number of samples per period lets one period be repeated exactly
+                period = 60 + digest[0] % 60  # 200-400 Hz at 24 kHz
+                one_period = array.array('h', (
+                    int(8000 * math.sin(2 * math.pi * i / period)) for i in range(period)
+                )).tobytes()
+
+            frames = int(self.frame_rate * len(text) * self.ms_per_char / 1000)
+            periods = frames // period + 1
+            pcm = (one_period * periods)[:frames * 2]
+            return AudioSegment(data=pcm, sample_width=2, frame_rate=self.frame_rate, channels=1)
+
+
+ENGINES = {
+    GTTSEngine.name: GTTSEngine,
+    EspeakEngine.name: EspeakEngine,
+    SyntheticEngine.name: SyntheticEngine,
+}
+
+_instances = {}
+
+
+def get_engine(name: str = None) -> TTSEngine:
+    """
+    Get a shared engine instance by name.
+
+    Args:
+        name (str): Engine name; defaults to the TTS_ENGINE environment variable, then 'gtts'
+
+    Returns:
+        TTSEngine: The engine
+
+    Raises:
+        ValueError: If the name is unknown
+    """
+    name = (name or os.getenv("TTS_ENGINE", GTTSEngine.name)).lower()
+    if name not in ENGINES:
+        raise ValueError(f"Unknown TTS engine '{name}'. Available: {', '.join(sorted(ENGINES))}")
+    if name not in _instances:
+        _instances[name] = ENGINES[name]()
+    return _instances[name]
@@ -1,31 +1,53 @@
 """
-Text-to-Speech processor for converting podcast scripts to audio using Google TTS
+Text-to-Speech processor for converting podcast scripts to audio using a pluggable TTS engine
 With proper multi-voice support that properly distinguishes between speakers
 """
 import os
 import time
+import uuid
 import logging
-from typing import Optional
-from gtts import gTTS
+from typing import Optional, Union
 import re
-from pydub import AudioSegment
+import threading
+from concurrent.futures import Future, wait
 from pydub.effects import speedup
 
+import audio_dsp
+
+from audio_assembler import AudioAssembler
+from audio_cache import AudioCache
+from audio_output import StreamingEncoder, get_output_format
+from script_model import Script, Turn
+from tts_engines import TTSEngine, get_engine
+from stage_timer import stage
+from metrics import ContextThreadPoolExecutor
+
 logger = logging.getLogger(__name__)
 
 class TTSProcessor:
-    def __init__(self):
-        """Initialize the TTS processor"""
+    def __init__(self, engine: Optional[TTSEngine] = None):
+        """
+        Initialize the TTS processor
+
+        Args:
+            engine (TTSEngine, optional): Default synthesis engine (defaults to TTS_ENGINE, then gTTS)
+        """
         # Create a directory for audio files if it doesn't exist
         self.audio_dir = "temp/audio"
         os.makedirs(self.audio_dir, exist_ok=True)
         
         # Maximum size for each audio chunk (in characters)
-        # gTTS has limitations on text length
-        self.max_chunk_size = 4000
+        # TTS engines have limitations on text length; the engine's own limit applies if lower.
+        # Longer segments are split at sentence boundaries and the chunks synthesized in parallel.
+        self.max_chunk_size = int(os.getenv("TTS_MAX_CHUNK_CHARS", "4000"))
         
         # Ensure proper silence between segments
         self.segment_silence_ms = 500  # Slightly shorter pauses for better ADHD attention
+
+        # Short silences at the beginning and end of the episode
+        # In a more advanced implementation, you could add gentle tones or transitions
+        self.bookend_start_ms = 500
+        self.bookend_end_ms = 750
         
         # Voice settings for different speakers using non-deprecated codes
         self.voice_settings = {
@@ -37,82 +59,327 @@ class TTSProcessor:
         # Slightly faster pace helps retain ADHD attention
         self.speed_factor = 1.15
 
-    def generate_audio(self, script: str, language: str = "english", filename: Optional[str] = None) -> str:
-        """Convert text to speech using Google TTS with proper multi-voice support."""
+        # Voice processing backend: vectorized NumPy DSP, or the original pydub effects
+        default_backend = "numpy" if audio_dsp.NUMPY_AVAILABLE else "pydub"
+        self.dsp_backend = os.getenv("TTS_DSP_BACKEND", default_backend).lower()
+        if self.dsp_backend == "numpy" and not audio_dsp.NUMPY_AVAILABLE:
+            logger.warning("TTS_DSP_BACKEND=numpy but NumPy is not installed, using pydub")
+            self.dsp_backend = "pydub"
+
+        # Segments are synthesized concurrently on a bounded pool shared by all episodes
+        self.max_workers = int(os.getenv("TTS_MAX_WORKERS", "4"))
+        # Segments count towards the trace of the job that submitted them
+        self.executor = ContextThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="tts")
+
+        # Retries per segment for transient synthesis failures
+        self.segment_retries = 2
+        self.retry_backoff = 0.5  # seconds, doubled on every retry
+
+        # Processed audio for recurring phrases (intro, outro, fallback lines) is reused
+        self.audio_cache = AudioCache(
+            cache_dir=os.getenv("TTS_CACHE_DIR", "temp/audio_cache"),
+            max_bytes=int(os.getenv("TTS_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+        )
+
+        # Deployment-wide default engine; callers may pick another one per episode
+        self.engine = engine or get_engine()
+
+        # Episodes are stream-encoded; Opus/OGG voice notes by default, MP3 optionally
+        self.output_format = get_output_format()
+        self.output_bitrate = os.getenv("AUDIO_OUTPUT_BITRATE") or None
+
+    def generate_audio(self, script: Union[Script, str], language: str = "english", filename: Optional[str] = None,
+                       engine: Optional[TTSEngine] = None) -> str:
+        """
+        Convert text to speech with proper multi-voice support.
+
+        Args:
+            script: A structured Script, or text with '### HOST:' / '### COHOST:' markers
+            language (str): Script language
+            filename (str, optional): Output file name
+            engine (TTSEngine, optional): Engine for this episode (defaults to the processor's)
+
+        Returns:
+            str: Path to the generated audio file
+        """
         try:
-            # Generate a filename if not provided
-            if filename is None:
-                timestamp = int(time.time())
-                filename = f"podcast_{timestamp}.mp3"
-            
-            filepath = os.path.join(self.audio_dir, filename)
-            
-            # Split script by speaker markers
-            segments = self._split_by_speakers(script)
-            logger.info(f"Split script into {len(segments)} speaker segments")
+            filepath = self._output_path(filename)
+            engine = engine or self.engine
             
-            # Process each segment with the appropriate voice and combine them
-            combined_audio = None
-            
-            for segment in segments:
-                if not segment['text'].strip():
-                    continue  # Skip empty segments
-                
-                # Clean the text for TTS
-                cleaned_text = self._clean_for_tts(segment['text'])
-                if not cleaned_text.strip():
-                    continue  # Skip if cleaning removed all content
-                
-                # Process the segment with the appropriate voice
-                temp_path = os.path.join(self.audio_dir, f"temp_segment_{time.time()}.mp3")
-                
-                try:
-                    # Select voice based on speaker
-                    voice = self.voice_settings["host"] if segment['speaker'] == 'HOST' else self.voice_settings["cohost"]
-                    
-                    # Generate TTS for this segment
-                    tts = gTTS(text=cleaned_text, lang=voice, slow=False)
-                    tts.save(temp_path)
-                    
-                    # Load the audio segment
-                    segment_audio = AudioSegment.from_mp3(temp_path)
-                    
-                    # Apply ADHD-friendly audio processing
-                    segment_audio = self._process_audio_for_adhd(segment_audio, is_host=(segment['speaker'] == 'HOST'))
-                    
-                    # Add to combined audio
-                    if combined_audio is None:
-                        combined_audio = segment_audio
-                    else:
-                        # Add a small pause between segments for natural speech
-                        silence = AudioSegment.silent(duration=self.segment_silence_ms)
-                        combined_audio = combined_audio + silence + segment_audio
-                    
-                    # Clean up temp file
-                    os.remove(temp_path)
-                    
-                except Exception as e:
-                    logger.error(f"Error processing segment: {str(e)}")
-                    if os.path.exists(temp_path):
-                        os.remove(temp_path)
-                    continue  # Try next segment even if one fails
-            
-            # Save the final combined audio
-            if combined_audio:
-                # Add intro/outro effects
-                final_audio = self._add_bookend_effects(combined_audio)
-                
-                final_audio.export(filepath, format="mp3")
-                logger.info(f"Generated multi-voice audio file at {filepath}")
-                return filepath
+            # Structured scripts already know their speaker turns
+            if isinstance(script, Script):
+                segments = script.to_tts_segments()
             else:
-                logger.error("Failed to create combined audio - no segments were processed")
-                raise Exception("Failed to generate audio segments")
+                segments = self._split_by_speakers(script)
+            logger.info(f"Split script into {len(segments)} speaker segments")
             
+            # Synthesize all segments concurrently; they are encoded in script order as they complete
+            futures = [self._submit_segment(segment['speaker'], segment['text'], engine) for segment in segments]
+            encoder = self._new_encoder(filepath)
+            try:
+                output_path = self._combine(futures, sink=encoder)
+            except Exception:
+                encoder.abort()
+                raise
+
+            return self._finish_output(output_path)
+
         except Exception as e:
             logger.error(f"Error generating audio: {str(e)}")
             raise
-    
+
+    def start_session(self, filename: Optional[str] = None, engine: Optional[TTSEngine] = None) -> "AudioSession":
+        """
+        Start an incremental synthesis session.
+
+        Speaker turns can be added while the script is still being written; each
+        one is synthesized in the background as soon as it arrives.
+
+        Args:
+            filename (str, optional): Output file name
+            engine (TTSEngine, optional): Engine for this episode (defaults to the processor's)
+
+        Returns:
+            AudioSession: Session to feed turns into and finish
+        """
+        return AudioSession(self, filename, engine or self.engine)
+
+    def _output_path(self, filename: Optional[str] = None) -> str:
+        """Build the output path, generating a filename if not provided."""
+        if filename is None:
+            # Episodes can be generated concurrently, so the timestamp alone is not unique
+            timestamp = int(time.time())
+            filename = f"podcast_{timestamp}_{uuid.uuid4().hex[:8]}.{self.output_format.extension}"
+        return os.path.join(self.audio_dir, filename)
+
+    def _new_encoder(self, filepath: str) -> StreamingEncoder:
+        """Create a streaming encoder for the configured output format."""
+        return StreamingEncoder(filepath, self.output_format, self.output_bitrate)
+
+    def _new_assembler(self, sink=None) -> AudioAssembler:
+        """Create an assembler with the episode's pauses and bookend silences."""
+        return AudioAssembler(
+            gap_ms=self.segment_silence_ms,
+            lead_ms=self.bookend_start_ms,
+            tail_ms=self.bookend_end_ms,
+            sink=sink
+        )
+
+    def _finish_output(self, output_path: Optional[str]) -> str:
+        """Log cache effectiveness and check that the episode produced audio."""
+        cache_stats = self.audio_cache.stats()
+        logger.info(
+            f"Audio cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+            f"(hit ratio {cache_stats['hit_ratio']:.0%}), {cache_stats['bytes_saved']} bytes of audio reused"
+        )
+
+        if output_path:
+            logger.info(f"Generated multi-voice audio file at {output_path}")
+            return output_path
+        else:
+            logger.error("Failed to create combined audio - no segments were processed")
+            raise Exception("Failed to generate audio segments")
+
+    def _combine(self, futures: list, sink=None):
+        """
+        Join processed segments in script order, with pauses and bookend silences.
+
+        Each segment is copied once (into a single buffer, or into the sink) and its
+        future is released right after, so assembly is linear and memory stays near
+        one episode copy, or near one segment when streaming.
+
+        Args:
+            futures (list): Futures resolving to AudioSegment or None (failed/empty
+                segments are skipped); the list is cleared as it is consumed
+            sink (optional): Streaming encoder receiving the PCM
+
+        Returns:
+            AudioSegment (or the sink's output path when streaming); None if no
+            segment produced audio
+        """
+        assembler = self._new_assembler(sink)
+        for index, future in enumerate(futures):
+            assembler.add(future.result())
+            futures[index] = None
+        return assembler.build()
+
+    def _submit_segment(self, speaker: str, text: str, engine: Optional[TTSEngine] = None) -> Future:
+        """
+        Queue one speaker segment for synthesis on the worker pool.
+
+        Segments longer than the chunk limit are split at sentence boundaries. The
+        chunks are synthesized in parallel, joined back to back (no crossfade) and
+        processed once as a whole, so one long turn no longer waits on a single
+        slow, oversized request.
+
+        Args:
+            speaker (str): 'HOST' or 'COHOST'
+            text (str): Text spoken in the segment
+            engine (TTSEngine, optional): Engine to use (defaults to the processor's)
+
+        Returns:
+            Future: Resolves to the processed AudioSegment, or None if the segment was empty or failed
+        """
+        engine = engine or self.engine
+        cleaned_text = self._clean_for_tts(text)
+        chunks = self._chunk_text(cleaned_text, min(self.max_chunk_size, engine.max_text_length))
+        if len(chunks) <= 1:
+            return self.executor.submit(self._synthesize_segment, speaker, text, engine)
+
+        result = Future()
+        cache_key = self._cache_key(speaker, cleaned_text, engine)
+        with stage('cache'):
+            cached_audio = self.audio_cache.get(cache_key)
+        if cached_audio is not None:
+            result.set_result(cached_audio)
+            return result
+
+        logger.info(f"Splitting {len(cleaned_text)}-character segment into {len(chunks)} chunks")
+        chunk_futures = [self.executor.submit(self._synthesize_chunk, speaker, chunk, engine) for chunk in chunks]
+        remaining = [len(chunk_futures)]
+        lock = threading.Lock()
+
+        def on_chunk_done(_):
+            with lock:
+                remaining[0] -= 1
+                if remaining[0]:
+                    return
+            # Every chunk is done, so the join never blocks a worker waiting on another
+            self.executor.submit(self._join_chunks, speaker, chunk_futures, cache_key, result)
+
+        # Cancelling the segment drops chunks that have not started yet
+        result.add_done_callback(lambda future: future.cancelled() and [f.cancel() for f in chunk_futures])
+        for chunk_future in chunk_futures:
+            chunk_future.add_done_callback(on_chunk_done)
+        return result
+
+    def _join_chunks(self, speaker: str, chunk_futures: list, cache_key: str, result: Future) -> None:
+        """
+        Stitch synthesized chunks together, process the whole segment and resolve its future.
+
+        Args:
+            speaker (str): 'HOST' or 'COHOST'
+            chunk_futures (list): Completed futures with raw chunk audio (None for failed chunks)
+            cache_key (str): Audio cache key for the whole segment
+            result (Future): Future to resolve with the processed segment
+        """
+        if not result.set_running_or_notify_cancel():
+            return
+
+        try:
+            assembler = AudioAssembler(gap_ms=0)
+            for chunk_future in chunk_futures:
+                if not chunk_future.cancelled():
+                    assembler.add(chunk_future.result())
+            joined_audio = assembler.build()
+
+            processed_audio = None
+            if joined_audio is not None:
+                processed_audio = self._process_audio_for_adhd(joined_audio, is_host=(speaker == 'HOST'))
+                with stage('cache'):
+                    self.audio_cache.put(cache_key, processed_audio)
+            result.set_result(processed_audio)
+        except Exception as e:
+            logger.error(f"Error joining segment chunks: {str(e)}")
+            result.set_exception(e)
+
+    def _cache_key(self, speaker: str, cleaned_text: str, engine: TTSEngine) -> str:
+        """Audio cache key for processed speech."""
+        return AudioCache.make_key(
+            cleaned_text, f"{engine.name}:{self._voice_for(speaker)}", self._processing_settings(speaker)
+        )
+
+    def _with_retries(self, func, *args):
+        """
+        Call func, retrying transient failures with exponential backoff.
+
+        Returns:
+            func's result, or None if every attempt failed
+        """
+        for attempt in range(self.segment_retries + 1):
+            try:
+                return func(*args)
+            except Exception as e:
+                if attempt == self.segment_retries:
+                    logger.error(f"Error processing segment after {attempt + 1} attempts: {str(e)}")
+                    return None  # Skip this segment; the rest of the episode goes on
+                delay = self.retry_backoff * (2 ** attempt)
+                logger.warning(f"Error processing segment ({str(e)}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    def _synthesize_chunk(self, speaker: str, chunk: str, engine: Optional[TTSEngine] = None):
+        """
+        Synthesize one chunk of a long segment to raw PCM, retrying transient failures.
+
+        Returns:
+            AudioSegment or None if the chunk failed
+        """
+        return self._with_retries(self._synthesize_raw, speaker, chunk, engine)
+
+    def _synthesize_segment(self, speaker: str, text: str, engine: Optional[TTSEngine] = None):
+        """
+        Synthesize and process one speaker segment, retrying transient failures.
+
+        Args:
+            speaker (str): 'HOST' or 'COHOST'
+            text (str): Text spoken in the segment
+            engine (TTSEngine, optional): Engine to use (defaults to the processor's)
+
+        Returns:
+            AudioSegment or None if the segment was empty or failed
+        """
+        if not text.strip():
+            return None  # Skip empty segments
+
+        # Clean the text for TTS
+        cleaned_text = self._clean_for_tts(text)
+        if not cleaned_text.strip():
+            return None  # Skip if cleaning removed all content
+
+        engine = engine or self.engine
+        cache_key = self._cache_key(speaker, cleaned_text, engine)
+        with stage('cache'):
+            cached_audio = self.audio_cache.get(cache_key)
+        if cached_audio is not None:
+            return cached_audio
+
+        segment_audio = self._with_retries(self._synthesize_once, speaker, cleaned_text, engine)
+        if segment_audio is not None:
+            with stage('cache'):
+                self.audio_cache.put(cache_key, segment_audio)
+        return segment_audio
+
+    def _synthesize_once(self, speaker: str, cleaned_text: str, engine: Optional[TTSEngine] = None):
+        """
+        Synthesize and process cleaned text for one speaker (single attempt).
+
+        Args:
+            speaker (str): 'HOST' or 'COHOST'
+            cleaned_text (str): Text already cleaned for TTS
+            engine (TTSEngine, optional): Engine to use (defaults to the processor's)
+
+        Returns:
+            AudioSegment: The processed segment
+        """
+        segment_audio = self._synthesize_raw(speaker, cleaned_text, engine)
+
+        # Apply ADHD-friendly audio processing
+        return self._process_audio_for_adhd(segment_audio, is_host=(speaker == 'HOST'))
+
+    def _synthesize_raw(self, speaker: str, cleaned_text: str, engine: Optional[TTSEngine] = None):
+        """
+        Synthesize cleaned text to PCM, without any processing.
+
+        Args:
+            speaker (str): 'HOST' or 'COHOST'
+            cleaned_text (str): Text already cleaned for TTS
+            engine (TTSEngine, optional): Engine to use (defaults to the processor's)
+
+        Returns:
+            AudioSegment: The decoded speech
+        """
+        return (engine or self.engine).synthesize(cleaned_text, self._voice_for(speaker))
+
     def _split_by_speakers(self, text: str) -> list:
         """Split text into segments by speaker markers."""
         segments = []
@@ -153,6 +420,27 @@ class TTSProcessor:
 
         return segments
 
+    def _voice_for(self, speaker: str) -> str:
+        """Select voice based on speaker."""
+        return self.voice_settings["host"] if speaker == 'HOST' else self.voice_settings["cohost"]
+
+    def _processing_settings(self, speaker: str) -> dict:
+        """
+        Describe the post-synthesis processing for a speaker.
+
+        Anything that changes the processed audio must be listed here,
+        because these settings are part of the audio cache key.
+        """
+        if speaker == 'HOST':
+            # Host voice - slightly faster with a bit more bass
+            settings = {'speed': self.speed_factor, 'filter': 'low_pass', 'cutoff_hz': 2000, 'normalize': True}
+        else:
+            # Cohost voice - slightly slower with a bit more treble
+            settings = {'speed': self.speed_factor * 0.9, 'filter': 'high_pass', 'cutoff_hz': 1000, 'normalize': True}
+        # The backends stretch time differently, so their output is cached separately
+        settings['dsp'] = self.dsp_backend
+        return settings
+
     def _process_audio_for_adhd(self, segment, is_host=True):
         """
         Apply ADHD-friendly processing to an audio segment
@@ -165,92 +453,109 @@ class TTSProcessor:
             The processed AudioSegment
         """
         # Different processing for host vs cohost for more distinct voices
-        if is_host:
-            # Host voice - slightly faster with a bit more bass
-            segment = speedup(segment, self.speed_factor, 150)
-            # Add a slight bass boost to host voice
-            segment = segment.low_pass_filter(2000)
-        else:
-            # Cohost voice - slightly slower with a bit more treble
-            segment = speedup(segment, self.speed_factor * 0.9, 150)
-            # Add a slight treble boost to cohost voice
-            segment = segment.high_pass_filter(1000)
-        
-        # Normalize the volume for consistent listening experience
-        segment = segment.normalize()
-        
-        return segment
-    
-    def _add_bookend_effects(self, audio):
+        settings = self._processing_settings('HOST' if is_host else 'COHOST')
+        if settings['dsp'] == 'numpy':
+            # Stretch, EQ and normalize in a few vectorized passes
+            return audio_dsp.process_voice(
+                segment, settings['speed'], settings['filter'], settings['cutoff_hz'], settings['normalize']
+            )
+        return self._process_with_pydub(segment, settings)
+
+    def _process_with_pydub(self, segment, settings: dict):
         """
-        Add subtle attention-focusing effects at beginning and end
-        
+        Apply the processing settings with pydub's effects (one full pass per effect).
+
         Args:
-            audio: The main audio content
-            
+            segment: The AudioSegment to process
+            settings: Settings from _processing_settings
+
         Returns:
-            AudioSegment with added effects
+            The processed AudioSegment
         """
-        # For simplicity, we're just adding a short silence at the beginning and end
-        # In a more advanced implementation, you could add gentle tones or transitions
-        start_silence = AudioSegment.silent(duration=500)
-        end_silence = AudioSegment.silent(duration=750)
+        with stage('stretch'):
+            segment = speedup(segment, settings['speed'], 150)
+
+        # A slight bass boost for the host, a slight treble boost for the cohost
+        with stage('filter'):
+            if settings['filter'] == 'low_pass':
+                segment = segment.low_pass_filter(settings['cutoff_hz'])
+            else:
+                segment = segment.high_pass_filter(settings['cutoff_hz'])
+        
+        # Normalize the volume for consistent listening experience
+        if settings['normalize']:
+            with stage('normalize'):
+                segment = segment.normalize()
         
-        return start_silence + audio + end_silence
+        return segment
     
-    def _chunk_text(self, text: str) -> list:
+    def _chunk_text(self, text: str, max_size: Optional[int] = None) -> list:
         """
         Split text into chunks suitable for TTS.
         
         Args:
             text (str): Text to split
+            max_size (int, optional): Longest chunk in characters (defaults to max_chunk_size)
             
         Returns:
             list: List of text chunks
         """
+        max_size = max_size or self.max_chunk_size
+
         # Split by sentences for more natural breaks
-        sentences = re.split(r'(?<=[.!?])\s+', text)
+        sentences = re.split(r'(?<=[.!?])\s+', text.strip())
         
         chunks = []
         current_chunk = ""
         
         for sentence in sentences:
-            if len(current_chunk) + len(sentence) + 1 <= self.max_chunk_size:
-                if current_chunk:
-                    current_chunk += " " + sentence
+            if not sentence:
+                continue
+            # If the sentence itself is too long, break it into smaller pieces first
+            pieces = [sentence] if len(sentence) <= max_size else self._split_long_sentence(sentence, max_size)
+            for piece in pieces:
+                if not current_chunk:
+                    current_chunk = piece
+                elif len(current_chunk) + len(piece) + 1 <= max_size:
+                    current_chunk += " " + piece
                 else:
-                    current_chunk = sentence
-            else:
-                if current_chunk:
                     chunks.append(current_chunk)
-                    current_chunk = sentence
-                else:
-                    # If the sentence itself is too long, split it by commas
-                    phrase_parts = sentence.split(', ')
-                    if len(phrase_parts) > 1:
-                        current_phrase = ""
-                        for part in phrase_parts:
-                            if len(current_phrase) + len(part) + 2 <= self.max_chunk_size:
-                                if current_phrase:
-                                    current_phrase += ", " + part
-                                else:
-                                    current_phrase = part
-                            else:
-                                chunks.append(current_phrase)
-                                current_phrase = part
-                        
-                        if current_phrase:
-                            current_chunk = current_phrase
-                    else:
-                        # Last resort: split by words
-                        chunks.append(sentence[:self.max_chunk_size])
-                        if len(sentence) > self.max_chunk_size:
-                            current_chunk = sentence[self.max_chunk_size:]
+                    current_chunk = piece
         
         if current_chunk:
             chunks.append(current_chunk)
         
         return chunks
+
+    def _split_long_sentence(self, sentence: str, max_size: int) -> list:
+        """Split a sentence longer than max_size by commas, then by words."""
+        # (separator, text) pairs: comma-separated phrases, or words for phrases still too long
+        parts = []
+        for phrase in sentence.split(', '):
+            if len(phrase) <= max_size:
+                parts.append((", ", phrase))
+            else:
+                parts.extend((" ", word) for word in phrase.split())
+
+        pieces = []
+        current_piece = ""
+        for separator, part in parts:
+            if not current_piece:
+                current_piece = part
+            elif len(current_piece) + len(separator) + len(part) <= max_size:
+                current_piece += separator + part
+            else:
+                pieces.append(current_piece)
+                current_piece = part
+
+            # Last resort: a single word longer than the limit is cut
+            while len(current_piece) > max_size:
+                pieces.append(current_piece[:max_size])
+                current_piece = current_piece[max_size:]
+
+        if current_piece:
+            pieces.append(current_piece)
+        return pieces
     
     def _clean_for_tts(self, text: str) -> str:
         """Clean text to make it more suitable for TTS."""
@@ -298,3 +603,106 @@ class TTSProcessor:
                     logger.info(f"Removed old audio file: {filepath}")
         except Exception as e:
             logger.error(f"Error cleaning up old files: {str(e)}")
+
+
+class AudioSession:
+    """
+    Incremental synthesis session.
+
+    Turns passed to `add_segment` are submitted to the processor's worker pool as
+    soon as they arrive, so speech synthesis overlaps with script generation.
+    Finished segments are fed to the streaming encoder in script order as soon as
+    every earlier segment is done, so encoding overlaps with synthesis too.
+    `finish` waits for the remaining turns and finalizes the file.
+    """
+
+    def __init__(self, processor: TTSProcessor, filename: Optional[str] = None, engine: Optional[TTSEngine] = None):
+        self.processor = processor
+        self.filepath = processor._output_path(filename)
+        self.engine = engine or processor.engine
+        self._futures = []
+        self._next_index = 0  # first segment not yet handed to the encoder
+        self._lock = threading.Lock()
+        self._error = None
+        self._encoder = processor._new_encoder(self.filepath)
+        self._assembler = processor._new_assembler(sink=self._encoder)
+
+    def add_segment(self, speaker: str, text: str) -> None:
+        """
+        Submit a finished speaker turn for synthesis.
+
+        Args:
+            speaker (str): 'HOST' or 'COHOST'
+            text (str): Text spoken in the turn
+        """
+        self.add_future(self.processor._submit_segment(speaker, text, self.engine))
+
+    def add_future(self, future: Future) -> None:
+        """
+        Append audio produced elsewhere, such as a checkpointed or separately assembled section.
+
+        Args:
+            future (Future): Resolves to an AudioSegment, or None to skip it
+        """
+        with self._lock:
+            self._futures.append(future)
+        future.add_done_callback(lambda _: self._drain())
+
+    def add_turn(self, turn: Turn) -> None:
+        """
+        Submit a finished script Turn for synthesis.
+
+        Args:
+            turn (Turn): Turn from the script model
+        """
+        self.add_segment(turn.speaker, turn.to_tts())
+
+    def _drain(self) -> None:
+        """Encode the finished segments at the front of the queue, in script order."""
+        with self._lock:
+            while self._error is None and self._next_index < len(self._futures):
+                future = self._futures[self._next_index]
+                if not future.done():
+                    break
+                self._futures[self._next_index] = None
+                self._next_index += 1
+                if future.cancelled():
+                    continue
+                try:
+                    self._assembler.add(future.result())
+                except Exception as e:
+                    # Remembered and raised by finish(); callbacks cannot propagate errors
+                    logger.error(f"Error encoding audio segment: {str(e)}")
+                    self._error = e
+
+    def finish(self) -> str:
+        """
+        Wait for all submitted turns and finalize the episode.
+
+        Returns:
+            str: Path to the generated audio file
+        """
+        with self._lock:
+            pending = [future for future in self._futures if future is not None]
+        wait(pending)
+        self._drain()
+
+        if self._error is not None:
+            self._encoder.abort()
+            raise self._error
+        try:
+            output_path = self._assembler.build()
+        except Exception:
+            self._encoder.abort()
+            raise
+        return self.processor._finish_output(output_path)
+
+    def cancel(self) -> None:
+        """Stop synthesizing; turns that have not started yet are dropped."""
+        with self._lock:
+            futures = [future for future in self._futures if future is not None]
+            # Stops _drain from feeding (or restarting) the encoder
+            self._error = RuntimeError("Audio session cancelled")
+            self._encoder.abort()
+        for future in futures:
+            future.cancel()
@@ -0,0 +1,128 @@
+"""
+Webhook Module
+
+Webhook ingress: Telegram POSTs each update to an embedded HTTP server, which
+checks the secret token and puts the update on the Application's update queue.
+Unlike long polling, any number of bot instances can run behind a load
+balancer, each receiving a share of the updates.
+
+Configured through the environment:
+
+- WEBHOOK_URL: Public HTTPS URL registered with Telegram (e.g. https://bot.example.com/telegram)
+- WEBHOOK_SECRET_TOKEN: Shared secret Telegram sends in X-Telegram-Bot-Api-Secret-Token
+- WEBHOOK_LISTEN / WEBHOOK_PORT: Local address to listen on (default 0.0.0.0:8443)
+- WEBHOOK_PATH: Local path (defaults to the path of WEBHOOK_URL)
+- WEBHOOK_REGISTER: Set to 'false' on all but one instance to leave the registration alone
+"""
+import os
+import hmac
+import signal
+import asyncio
+import logging
+from urllib.parse import urlsplit
+from telegram import Update
+from telegram.ext import Application
+
+from http_server import HTTPServer, HTTPRequest, HTTPResponse
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = 'x-telegram-bot-api-secret-token'
+
+
+def make_update_handler(application: Application, secret_token: str):
+    """
+    Build the HTTP handler that feeds webhook updates to the application.
+
+    Args:
+        application (Application): The initialized bot application
+        secret_token (str): Expected value of the secret token header
+
+    Returns:
+        callable: async handler(HTTPRequest) -> HTTPResponse
+    """
+    expected_token = secret_token.encode('utf-8')
+
+    async def handle_update(request: HTTPRequest) -> HTTPResponse:
+        # Headers are decoded as latin-1, so this gets the raw bytes back; compare_digest
+        # raises TypeError on non-ASCII strings
+        received_token = request.headers.get(SECRET_HEADER, '').encode('latin-1')
+        if not hmac.compare_digest(received_token, expected_token):
+            logger.warning("Rejected webhook request with a wrong secret token")
+            return HTTPResponse(403, b"Forbidden")
+
+        try:
+            data = request.json()
+        except ValueError as e:
+            return HTTPResponse(400, f"Invalid update: {str(e)}".encode('utf-8'))
+        if not isinstance(data, dict):
+            return HTTPResponse(400, b"Invalid update: expected a JSON object")
+        try:
+            update = Update.de_json(data, application.bot)
+        except (ValueError, TypeError, KeyError) as e:
+            return HTTPResponse(400, f"Invalid update: {str(e)}".encode('utf-8'))
+        if update is None:
+            return HTTPResponse(400, b"Empty update")
+
+        # Handlers run from the queue; Telegram only needs a quick acknowledgement
+        await application.update_queue.put(update)
+        return HTTPResponse(200, b"OK")
+
+    return handle_update
+
+
+async def healthz(request: HTTPRequest) -> HTTPResponse:
+    """Liveness probe for load balancers."""
+    return HTTPResponse(200, b"OK")
+
+
+async def run_webhook(application: Application, server: HTTPServer = None) -> None:
+    """
+    Run the application on webhook updates until SIGINT/SIGTERM.
+
+    Mirrors Application.run_polling: initializes and starts the application, calls
+    its post_init and post_shutdown hooks, and registers the webhook with Telegram.
+
+    Args:
+        application (Application): Bot application with its handlers added
+        server (HTTPServer, optional): Server to add the webhook routes to (created from the environment otherwise)
+
+    Raises:
+        ValueError: If WEBHOOK_URL or WEBHOOK_SECRET_TOKEN is missing
+    """
+    url = os.getenv("WEBHOOK_URL")
+    secret_token = os.getenv("WEBHOOK_SECRET_TOKEN")
+    if not url or not secret_token:
+        raise ValueError("Webhook mode needs WEBHOOK_URL and WEBHOOK_SECRET_TOKEN")
+
+    path = os.getenv("WEBHOOK_PATH") or urlsplit(url).path or "/"
+    if server is None:
+        server = HTTPServer(os.getenv("WEBHOOK_LISTEN", "0.0.0.0"), int(os.getenv("WEBHOOK_PORT", "8443")))
+    server.route("POST", path, make_update_handler(application, secret_token))
+    server.route("GET", "/healthz", healthz)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    async with application:
+        if application.post_init:
+            await application.post_init(application)
+        await application.start()
+        await server.start()
+
+        if os.getenv("WEBHOOK_REGISTER", "true").lower() != "false":
+            await application.bot.set_webhook(
+                url=url, secret_token=secret_token, allowed_updates=Update.ALL_TYPES
+            )
+            logger.info(f"Registered webhook {url}")
+
+        logger.info(f"Receiving updates on {path}")
+        await stop.wait()
+
+        logger.info("Shutting down webhook server")
+        await server.stop()
+        await application.stop()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
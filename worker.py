@@ -0,0 +1,195 @@
+"""
+Worker Module
+
+Worker processes for the shared job queue (job_queue.py). With
+JOB_BACKEND=queue the Telegram front end (main.py) only answers commands and
+enqueues work; content fetching and podcast generation run here, in as many
+processes as the machine has room for:
+
+    python worker.py --workers 4
+
+Each process takes one job at a time, heartbeats its lease while it works and
+talks to Telegram with its own Bot client. Throughput scales with the number
+of processes (see `python benchmark.py queue`). With WORKER_METRICS_PORT set,
+worker i serves its metrics on WORKER_METRICS_PORT + i.
+"""
+import os
+import signal
+import socket
+import asyncio
+import logging
+import argparse
+import multiprocessing
+from typing import Optional
+
+from job_queue import JobQueue, QueuedJob
+
+logger = logging.getLogger(__name__)
+
+
+class Worker:
+    """Take jobs from the queue and run their handlers."""
+
+    def __init__(self, queue: JobQueue, handlers: dict, worker_id: Optional[str] = None,
+                 poll_seconds: Optional[float] = None, retention_hours: Optional[float] = None):
+        """
+        Args:
+            queue (JobQueue): The shared queue
+            handlers (dict): kind -> async handler(payload) run for each job of that kind
+            worker_id (str, optional): Name recorded on leased jobs (defaults to host:pid)
+            poll_seconds (float, optional): Wait between polls of an empty queue
+                (defaults to WORKER_POLL_SECONDS, then 1)
+            retention_hours (float, optional): How long finished jobs are kept
+                (defaults to JOB_RETENTION_HOURS, then 24)
+        """
+        self.queue = queue
+        self.handlers = handlers
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.poll_seconds = poll_seconds or float(os.getenv("WORKER_POLL_SECONDS", "1"))
+        self.retention_seconds = 3600 * (retention_hours or float(os.getenv("JOB_RETENTION_HOURS", "24")))
+        self.processed = 0
+        self._stopping = asyncio.Event()
+
+    def stop(self) -> None:
+        """Finish the current job, then exit."""
+        self._stopping.set()
+
+    async def run(self, max_jobs: Optional[int] = None, exit_when_idle: bool = False) -> None:
+        """
+        Process jobs until stopped.
+
+        Args:
+            max_jobs (int, optional): Exit after this many jobs
+            exit_when_idle (bool): Exit as soon as the queue is empty
+        """
+        logger.info(f"Worker {self.worker_id} taking {', '.join(sorted(self.handlers))} jobs")
+        last_purge = 0.0
+        loop = asyncio.get_running_loop()
+        while not self._stopping.is_set():
+            if max_jobs is not None and self.processed >= max_jobs:
+                break
+
+            # Queue calls can wait on SQLite's busy timeout, so they run off the event loop
+            if loop.time() - last_purge > 3600:
+                await asyncio.to_thread(self.queue.purge, self.retention_seconds)
+                last_purge = loop.time()
+
+            job = await asyncio.to_thread(self.queue.lease, self.worker_id, list(self.handlers))
+            if job is None:
+                if exit_when_idle:
+                    break
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self.process(job)
+            self.processed += 1
+
+    async def process(self, job: QueuedJob) -> None:
+        """Run one leased job while keeping its lease alive."""
+        logger.info(f"Worker {self.worker_id} running {job.kind} job {job.job_id} (attempt {job.attempts})")
+        task = asyncio.create_task(self.handlers[job.kind](job.payload))
+        heartbeat = asyncio.create_task(self._heartbeat(job, task))
+        try:
+            await task
+        except asyncio.CancelledError:
+            if not task.cancelled():
+                # The worker itself is being cancelled; let another worker redo the job
+                task.cancel()
+                await asyncio.to_thread(self.queue.release, job)
+                raise
+            logger.warning(f"Abandoned job {job.job_id}: its lease was lost")
+        except Exception as e:
+            # The handler has reported the failure to the user; retrying would repeat it
+            logger.error(f"Job {job.job_id} failed: {str(e)}")
+            await asyncio.to_thread(self.queue.fail, job, str(e))
+        else:
+            await asyncio.to_thread(self.queue.complete, job)
+        finally:
+            heartbeat.cancel()
+
+    async def _heartbeat(self, job: QueuedJob, task: asyncio.Task) -> None:
+        """Extend the lease every third of its length; cancel the job if the lease was lost."""
+        while True:
+            await asyncio.sleep(self.queue.lease_seconds / 3)
+            # Off the event loop, so lock contention cannot stall the job or this heartbeat
+            if not await asyncio.to_thread(self.queue.heartbeat, job):
+                task.cancel()
+                return
+
+
+async def run_bot_worker(index: int = 0) -> None:
+    """
+    Run one worker process with the bot's fetch and generate handlers.
+
+    Args:
+        index (int): Position of this process among the workers
+    """
+    from telegram import Bot
+    import main as bot_app
+    import metrics
+
+    bot_app.prepare_storage()
+    queue = JobQueue()
+    metrics_server = None
+    if os.getenv("WORKER_METRICS_PORT"):
+        metrics_server = await metrics.start_server(port=int(os.getenv("WORKER_METRICS_PORT")) + index)
+    async with Bot(os.environ["TELEGRAM_BOT_TOKEN"], **bot_app.bot_api_urls()) as bot:
+        worker = Worker(queue, {
+            'fetch': lambda payload: bot_app.run_fetch_job(bot, payload),
+            'generate': lambda payload: bot_app.run_generate_job(bot, payload),
+        })
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, worker.stop)
+        try:
+            await worker.run()
+        finally:
+            await bot_app.generation_jobs.shutdown()
+            bot_app.pregenerator.shutdown()
+            queue.close()
+            if metrics_server:
+                await metrics_server.stop()
+
+
+def _worker_process(index: int = 0) -> None:
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
+    asyncio.run(run_bot_worker(index))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="triage.fm job queue workers")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WORKER_PROCESSES", "1")),
+                        help="Worker processes to run")
+    args = parser.parse_args()
+
+    if args.workers <= 1:
+        _worker_process()
+        return
+
+    # Spawned (not forked) so each worker starts with fresh thread pools and connections
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(target=_worker_process, args=(i,), name=f"worker-{i}") for i in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+
+    def forward_sigterm(signum, frame):
+        for process in processes:
+            process.terminate()
+
+    # Ctrl+C reaches the whole process group; SIGTERM is passed on. Either way
+    # each worker finishes its current job before exiting.
+    signal.signal(signal.SIGTERM, forward_sigterm)
+    for process in processes:
+        try:
+            process.join()
+        except KeyboardInterrupt:
+            process.join()
+
+
+if __name__ == "__main__":
+    main()